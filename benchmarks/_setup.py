@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+
+def isolated_workdir() -> str:
+    """Switch into a fresh temporary directory so benchmarks never touch the real todo files."""
+    path = tempfile.mkdtemp(prefix="tbe_todo_bench_")
+    os.chdir(path)
+    return path
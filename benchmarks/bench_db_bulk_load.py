@@ -0,0 +1,72 @@
+"""
+Compares loading tasks with one subtask query per task against the single-scan bulk loader,
+for 1k to 100k subtasks.
+
+Run from the repository root:
+    python -m benchmarks.bench_db_bulk_load
+"""
+import time
+
+from benchmarks._setup import isolated_workdir
+
+isolated_workdir()
+
+from typing import List
+
+from models import MainTask, Task
+from services import db
+
+SUBTASKS_PER_TASK = 10
+SUBTASK_COUNTS = [1_000, 10_000, 100_000]
+
+
+def load_tasks_one_query_per_task() -> List[MainTask]:
+    """The previous load_tasks implementation: one subtasks query per task."""
+    cursor = db._connection().cursor()
+    cursor.execute(f"SELECT id, title, state, importance FROM tasks ORDER BY {db.TASK_ORDER}")
+    tasks = []
+    for row in cursor.fetchall():
+        main_task = MainTask(id=row[0], title=row[1], state=db.STATES_BY_CODE[row[2]],
+                             importance=db.IMPORTANCES_BY_CODE[row[3]])
+        main_task.subTasks = db.load_subtasks_for_task(main_task.id)
+        tasks.append(main_task)
+    return tasks
+
+
+def populate(subtask_count: int) -> None:
+    with db._connection() as conn:
+        conn.execute("DELETE FROM tasks")
+        conn.execute("DELETE FROM subtasks")
+
+    for i in range(subtask_count // SUBTASKS_PER_TASK):
+        task = MainTask(title=f"Task {i}")
+        task.subTasks = [Task(task_id=task.id, title=f"Subtask {i}.{j}") for j in range(SUBTASKS_PER_TASK)]
+        db.save_task(task)
+
+
+def snapshot(tasks: List[MainTask]) -> list:
+    return [
+        (t.id, t.title, t.state, t.importance, [(s.id, s.task_id, s.title, s.state) for s in t.subTasks])
+        for t in tasks
+    ]
+
+
+def main() -> None:
+    print(f"{'subtasks':>10} {'per-task queries':>18} {'bulk load':>12} {'speedup':>8}")
+    for subtask_count in SUBTASK_COUNTS:
+        populate(subtask_count)
+
+        start = time.perf_counter()
+        baseline_tasks = load_tasks_one_query_per_task()
+        baseline = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bulk_tasks = db.load_tasks()
+        bulk = time.perf_counter() - start
+
+        assert snapshot(baseline_tasks) == snapshot(bulk_tasks), "Bulk load differs from per-task load"
+        print(f"{subtask_count:>10} {baseline * 1000:>15.1f} ms {bulk * 1000:>9.1f} ms {baseline / bulk:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compares the pooled, long-lived SQLite connection against opening a connection per call.
+
+Run from the repository root:
+    python -m benchmarks.bench_db_connection [operations]
+"""
+import sqlite3
+import sys
+import time
+
+from benchmarks._setup import isolated_workdir
+
+isolated_workdir()
+
+from models import MainTask, Task
+from services import db
+from services.connection import close_connection
+
+
+def per_call_save_subtask(subtask: Task) -> None:
+    with sqlite3.connect(db.db_name) as conn:
+        conn.execute(db.SUBTASK_UPSERT, (subtask.id, subtask.task_id, subtask.title, db.STATE_CODES[subtask.state]))
+
+
+def per_call_load_subtasks(task_id: str) -> list:
+    with sqlite3.connect(db.db_name) as conn:
+        rows = conn.execute(f"SELECT {db.SUBTASK_COLUMNS} FROM {db.SUBTASKS_WITH_TASK} WHERE t.id=?", (task_id,)).fetchall()
+        return [Task(id=row[0], task_id=row[1], title=row[2], state=db.STATES_BY_CODE[row[3]]) for row in rows]
+
+
+def per_call_get_table_version(table_name: str) -> int:
+    with sqlite3.connect(db.db_name) as conn:
+        row = conn.execute("SELECT version FROM table_versions WHERE table_name=?", (table_name,)).fetchone()
+        return row[0] if row else 0
+
+
+def timed(label: str, operations: int, func) -> float:
+    start = time.perf_counter()
+    for i in range(operations):
+        func(i)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {elapsed * 1000:9.1f} ms  ({elapsed / operations * 1e6:7.1f} us/op)")
+    return elapsed
+
+
+def main(operations: int) -> None:
+    task = MainTask(title="Benchmark task")
+    db.save_task(task)
+    subtasks = [Task(task_id=task.id, title=f"Subtask {i}") for i in range(operations)]
+
+    print(f"{operations} operations per run")
+    for name, per_call, pooled in [
+        ("save_subtask", lambda i: per_call_save_subtask(subtasks[i]), lambda i: db.save_subtask(subtasks[i])),
+        ("load_subtasks_for_task", lambda i: per_call_load_subtasks(task.id), lambda i: db.load_subtasks_for_task(task.id)),
+        ("get_table_version", lambda i: per_call_get_table_version("tasks"), lambda i: db.get_table_version("tasks")),
+    ]:
+        print(name)
+        baseline = timed("per-call connection", operations, per_call)
+        improved = timed("pooled connection", operations, pooled)
+        print(f"  speedup: {baseline / improved:.1f}x")
+
+    close_connection(db.db_name)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
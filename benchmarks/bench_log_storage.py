@@ -0,0 +1,133 @@
+"""
+Compares the JSON backend, which rewrites the whole file on every write, with the operation log backend, which
+appends one record per write and compacts the log into a snapshot now and then. Reports the bytes written and
+the time per edit, the time to recover at startup (snapshot plus replayed log), and checks that a record cut
+short by a crash is dropped without losing the records before it.
+
+Run from the repository root:
+    python -m benchmarks.bench_log_storage [tasks] [edits]
+"""
+import os
+import random
+import sys
+import time
+
+from benchmarks._setup import isolated_workdir
+
+isolated_workdir()
+
+from models import ChangeSet, MainTask, Task
+from models.enums import TaskState
+from services.JsonTaskRepository import JsonTaskRepository
+from services.LogTaskRepository import LogTaskRepository
+
+TASK_COUNT = 2_000
+EDIT_COUNT = 200
+SUBTASKS_PER_TASK = 4
+
+
+def make_tasks(task_count: int) -> list:
+    tasks = []
+    for i in range(task_count):
+        task = MainTask(title=f"Task {i}")
+        task.subTasks = [Task(task_id=task.id, title=f"Subtask {i}.{j}") for j in range(SUBTASKS_PER_TASK)]
+        tasks.append(task)
+
+    return tasks
+
+
+def edits(tasks: list, edit_count: int) -> list:
+    """One ChangeSet per app action: state changes, renames, new subtasks and deletions."""
+    rng = random.Random(1)
+    changes = []
+    for i in range(edit_count):
+        task = tasks[rng.randrange(len(tasks))]
+        match i % 4:
+            case 0:
+                changes.append(ChangeSet(modified_tasks=[MainTask(id=task.id, title=task.title, state=TaskState.STARTED)]))
+            case 1:
+                changes.append(ChangeSet(modified_tasks=[MainTask(id=task.id, title=f"{task.title} renamed")]))
+            case 2:
+                changes.append(ChangeSet(created_subtasks=[Task(task_id=task.id, title=f"New subtask {i}")]))
+            case 3:
+                changes.append(ChangeSet(deleted_subtask_ids=[task.subTasks[0].id]))
+
+    return changes
+
+
+def file_bytes(*paths: str) -> int:
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+def measure_edits(label: str, repository, changes: list, paths: tuple, rewrites: bool) -> None:
+    written = 0
+    start = time.perf_counter()
+    for change in changes:
+        before = file_bytes(*paths)
+        repository.save_changes(change)
+        after = file_bytes(*paths)
+        # A rewritten file costs its whole size; an appended log costs what it grew by
+        written += after if rewrites or after < before else after - before
+    elapsed = time.perf_counter() - start
+
+    print(f"  {label:<26} {written / len(changes):12.0f} B {elapsed / len(changes) * 1000:10.2f} ms")
+
+
+def measure_open(label: str, open_repository):
+    start = time.perf_counter()
+    repository = open_repository()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<40} {elapsed * 1000:10.1f} ms")
+    return repository
+
+
+def snapshot(repository) -> list:
+    return [(t.id, t.title, t.state, [(s.id, s.title, s.state) for s in t.subTasks]) for t in repository.load_tasks()]
+
+
+def main() -> None:
+    task_count = int(sys.argv[1]) if len(sys.argv) > 1 else TASK_COUNT
+    edit_count = int(sys.argv[2]) if len(sys.argv) > 2 else EDIT_COUNT
+    tasks = make_tasks(task_count)
+    changes = edits(tasks, edit_count)
+    print(f"{task_count} tasks, {task_count * SUBTASKS_PER_TASK} subtasks, {edit_count} edits")
+
+    json_repository = JsonTaskRepository("todo_list.json")
+    log_repository = LogTaskRepository("todo_list.log", fsync_interval=0)
+    batched_repository = LogTaskRepository("batched.log")
+    json_repository.save_tasks(tasks)
+    for repository in (log_repository, batched_repository):
+        repository.save_tasks(tasks)
+        # Start from a snapshot, as a log that has been in use for a while would
+        repository.compact()
+
+    print(f"  {'per edit':<26} {'written':>14} {'time':>13}")
+    measure_edits("json (rewrite + fsync)", json_repository, changes, ("todo_list.json",), True)
+    measure_edits("log (fsync every write)", log_repository, changes, ("todo_list.log", "todo_list.log.snapshot"), False)
+    measure_edits("log (batched fsync)", batched_repository, changes, ("batched.log", "batched.log.snapshot"), False)
+    log_repository.close()
+    batched_repository.close()
+
+    print("recovery")
+    measure_open("json (read file)", lambda: JsonTaskRepository("todo_list.json"))
+    recovered = measure_open(f"log (snapshot + {edit_count} records)", lambda: LogTaskRepository("todo_list.log"))
+    assert snapshot(recovered) == snapshot(json_repository), "The log recovered other tasks than the JSON file holds"
+
+    recovered.compact()
+    recovered.close()
+    measure_open("log (snapshot only)", lambda: LogTaskRepository("todo_list.log")).close()
+
+    # A crash in the middle of appending a record leaves part of its line behind
+    expected = snapshot(json_repository)
+    with open("todo_list.log", "ab") as f:
+        f.write(b'[["t","unfinished","Torn task","new"')
+    crashed = LogTaskRepository("todo_list.log")
+    assert snapshot(crashed) == expected, "Recovering after a torn write changed the tasks"
+    crashed.save_changes(ChangeSet(created_tasks=[MainTask(title="After the crash")]))
+    crashed.close()
+    assert len(LogTaskRepository("todo_list.log").load_tasks()) == task_count + 1, "A record after the torn one was lost"
+    print("The log recovered the same tasks as the JSON file, also after a torn write.")
+
+
+if __name__ == "__main__":
+    main()
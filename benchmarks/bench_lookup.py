@@ -0,0 +1,55 @@
+"""
+Compares finding tasks and subtasks by id through the id indexes of SortedTaskList and MainTask with scanning
+the lists, as the app and its list widgets did on every highlight change.
+
+Run from the repository root:
+    python -m benchmarks.bench_lookup [tasks] [lookups]
+"""
+import random
+import sys
+import time
+
+from models import MainTask, SortedTaskList, Task
+
+TASK_COUNT = 100_000
+LOOKUP_COUNT = 1000
+SUBTASKS_PER_TASK = 100
+
+
+def measure(label: str, lookup, ids) -> None:
+    start = time.perf_counter()
+    for task_id in ids:
+        assert lookup(task_id) is not None
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<24} {elapsed / len(ids) * 1e6:10.2f} us per lookup")
+
+
+def scan(tasks, task_id: str):
+    for task in tasks:
+        if task.id == task_id:
+            return task
+
+    return None
+
+
+def main() -> None:
+    task_count = int(sys.argv[1]) if len(sys.argv) > 1 else TASK_COUNT
+    lookup_count = int(sys.argv[2]) if len(sys.argv) > 2 else LOOKUP_COUNT
+    rng = random.Random(1)
+
+    tasks = SortedTaskList(MainTask(title=f"Task {i}") for i in range(task_count))
+    ids = [tasks[rng.randrange(task_count)].id for _ in range(lookup_count)]
+    print(f"{task_count} tasks")
+    measure("scan", lambda task_id: scan(tasks, task_id), ids)
+    measure("index", tasks.get, ids)
+
+    task = tasks[0]
+    task.subTasks = [Task(task_id=task.id, title=f"Subtask {i}") for i in range(SUBTASKS_PER_TASK)]
+    subtask_ids = [task.subTasks[rng.randrange(SUBTASKS_PER_TASK)].id for _ in range(lookup_count)]
+    print(f"{SUBTASKS_PER_TASK} subtasks")
+    measure("scan", lambda subtask_id: scan(task.subTasks, subtask_id), subtask_ids)
+    measure("index", task.get_subtask, subtask_ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Runs the same workload against every TaskRepository backend, checks that they all return the same
+results and times each operation.
+
+Run from the repository root:
+    python -m benchmarks.bench_repositories [tasks]
+"""
+import random
+import sys
+import time
+
+from benchmarks._setup import isolated_workdir
+
+isolated_workdir()
+
+from typing import Callable, Dict, List
+
+from models import ChangeSet, MainTask, Task
+from models.enums import TaskImportance, TaskState
+from services import BACKENDS, create_repository
+from services.TaskRepository import TaskRepository
+
+DEFAULT_TASK_COUNT = 10_000
+SUBTASKS_PER_TASK = 4
+PAGE_SIZE = 200
+WORDS = ["report", "review", "invoice", "deploy", "meeting", "budget", "draft", "release", "customer", "backup"]
+QUERIES = ["report", "rep", '"report 1"', "zzz"]
+
+
+def build_tasks(task_count: int) -> List[MainTask]:
+    rng = random.Random(42)
+    tasks = []
+    for i in range(task_count):
+        task = MainTask(title=f"{rng.choice(WORDS)} {i}",
+                        state=rng.choice(list(TaskState)),
+                        importance=rng.choice(list(TaskImportance)))
+        task.subTasks = [Task(task_id=task.id, title=f"{rng.choice(WORDS)} {i}.{j}", state=rng.choice(list(TaskState)))
+                         for j in range(SUBTASKS_PER_TASK)]
+        tasks.append(task)
+    return tasks
+
+
+def build_changes(tasks: List[MainTask]) -> ChangeSet:
+    """Edit every 10th task, delete every 25th and move a subtask of every 50th to the task after it."""
+    changes = ChangeSet()
+    for i, task in enumerate(tasks):
+        if i % 25 == 0:
+            changes.deleted_task_ids.append(task.id)
+        elif i % 10 == 0:
+            changes.modified_tasks.append(MainTask(id=task.id, title=f"edited {task.title}", state=TaskState.COMPLETED,
+                                                   importance=task.importance))
+            changes.deleted_subtask_ids.append(task.subTasks[0].id)
+
+        if i % 50 == 1 and i + 1 < len(tasks):
+            subtask = task.subTasks[1]
+            changes.modified_subtasks.append(Task(id=subtask.id, task_id=tasks[i + 1].id, title=subtask.title,
+                                                  state=TaskState.COMPLETED))
+    return changes
+
+
+def fingerprint(tasks: List[MainTask]) -> list:
+    return [
+        (t.id, t.title, t.state, t.importance, t.completed_subtask_count, t.subtask_count,
+         [(s.id, s.task_id, s.title, s.state) for s in t.subTasks])
+        for t in tasks
+    ]
+
+
+def load_all_pages(repository: TaskRepository, **filters) -> List[MainTask]:
+    tasks = []
+    key = None
+    while True:
+        page = repository.load_tasks_page(key, PAGE_SIZE, **filters)
+        tasks.extend(page.tasks)
+        if page.next_key is None:
+            return tasks
+        key = page.next_key
+
+
+def run(repository: TaskRepository, tasks: List[MainTask], timings: Dict[str, float]) -> Dict[str, object]:
+    def timed(label: str, func: Callable):
+        start = time.perf_counter()
+        result = func()
+        timings[label] = time.perf_counter() - start
+        return result
+
+    results = {}
+    task_count = len(tasks)
+    timed("save_tasks", lambda: repository.save_tasks(tasks))
+    results["load_tasks"] = fingerprint(timed("load_tasks", repository.load_tasks))
+    results["pages"] = fingerprint(timed("load_tasks_page (all)", lambda: load_all_pages(repository)))
+    results["filtered pages"] = fingerprint(load_all_pages(repository, states=[TaskState.NEW],
+                                                           importances=[TaskImportance.HIGH, TaskImportance.LOW],
+                                                           include_subtasks=False))
+    results["open subtasks"] = fingerprint(load_all_pages(repository, include_subtasks=False, with_open_subtasks=True))
+    results["load_task"] = fingerprint([repository.load_task(tasks[1].id)])
+    # Ranks differ between backends, so only the set of matches is compared
+    results["search"] = []
+    for query in QUERIES:
+        matches = timed(f"search {query!r}", lambda: repository.search(query, task_count * (1 + SUBTASKS_PER_TASK)))
+        results["search"].append(sorted((r.task_id, r.subtask_id or "") for r in matches))
+
+    version = repository.get_change_version()
+    timed("save_changes", lambda: repository.save_changes(build_changes(tasks)))
+    changed = timed("load_changes", lambda: repository.load_changes(version))
+    results["load_changes"] = (sorted(t.id for t in changed.tasks), sorted(s.id for s in changed.subtasks),
+                               sorted(changed.deleted_task_ids), sorted(changed.deleted_subtasks.items()))
+    results["after changes"] = fingerprint(repository.load_tasks())
+    results["moved subtasks"] = [(s.id, s.task_id) for s in repository.load_subtasks_for_task(tasks[2].id)]
+
+    repository.close()
+    return results
+
+
+def main() -> None:
+    task_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TASK_COUNT
+    tasks = build_tasks(task_count)
+
+    all_results = {}
+    all_timings = {}
+    for backend in BACKENDS:
+        all_timings[backend] = {}
+        all_results[backend] = run(create_repository(backend), tasks, all_timings[backend])
+
+    expected = all_results[BACKENDS[0]]
+    failures = [f"{backend}: {check}"
+                for backend in BACKENDS[1:]
+                for check, result in all_results[backend].items()
+                if result != expected[check]]
+
+    print(f"{task_count} tasks, {task_count * SUBTASKS_PER_TASK} subtasks")
+    print(f"{'operation':<24}" + "".join(f"{backend:>12}" for backend in BACKENDS))
+    for label in all_timings[BACKENDS[0]]:
+        print(f"{label:<24}" + "".join(f"{all_timings[backend][label] * 1000:10.1f}ms" for backend in BACKENDS))
+
+    if failures:
+        print("Backends disagree on: " + ", ".join(failures))
+        sys.exit(1)
+
+    print("All backends returned the same results.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Builds the same database of 1M rows (tasks plus subtasks) with the schema before integer keys (migration 8:
+UUID primary keys, subtasks pointing at their task's UUID, states and importances as text) and migrates a copy
+of it to the current schema. Compares the file sizes and the time to load everything and to load the subtasks
+of single tasks, with the loaders of each schema.
+
+Run from the repository root:
+    python -m benchmarks.bench_schema [rows]
+"""
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import time
+import uuid
+
+from benchmarks._setup import isolated_workdir
+
+isolated_workdir()
+
+from models import MainTask, Task
+from models.enums import TaskImportance, TaskState
+from services import db, migrations
+
+ROW_COUNT = 1_000_000
+SUBTASKS_PER_TASK = 9
+LOOKUP_COUNT = 1000
+OLD_DB = "text_keys.db"
+
+
+def build_old_database(row_count: int) -> list:
+    """Write the rows with the schema of migration 8; return the task ids."""
+    rng = random.Random(1)
+    states = list(TaskState)
+    importances = list(TaskImportance)
+    task_ids = []
+
+    conn = sqlite3.connect(OLD_DB)
+    migrations.run_migrations(conn, target=8)
+    with conn:
+        for i in range(row_count // (SUBTASKS_PER_TASK + 1)):
+            task_id = str(uuid.uuid4())
+            task_ids.append(task_id)
+            conn.execute("INSERT INTO tasks (id, title, state, importance) VALUES (?, ?, ?, ?)",
+                         (task_id, f"Task {i}", rng.choice(states), rng.choice(importances)))
+            conn.executemany("INSERT INTO subtasks (id, task_id, title, state) VALUES (?, ?, ?, ?)",
+                             [(str(uuid.uuid4()), task_id, f"Subtask {i}.{j}", rng.choice(states))
+                              for j in range(SUBTASKS_PER_TASK)])
+    conn.execute("VACUUM")
+    conn.close()
+    return task_ids
+
+
+def old_load_tasks(conn: sqlite3.Connection) -> list:
+    """load_tasks as it was before integer keys."""
+    tasks = []
+    for row in conn.execute("""
+        SELECT id, title, state, importance, subtask_count, completed_subtask_count FROM tasks
+        ORDER BY completed, importance_rank, title, rowid
+    """):
+        task = MainTask(id=row[0], title=row[1], state=TaskState(row[2]), importance=TaskImportance(row[3]))
+        task.set_subtask_counts(row[5], row[4])
+        tasks.append(task)
+
+    subtasks_by_task_id = {task.id: [] for task in tasks}
+    for row in conn.execute("SELECT id, task_id, title, state FROM subtasks ORDER BY task_id, completed, title, rowid"):
+        subtasks = subtasks_by_task_id.get(row[1])
+        if subtasks is not None:
+            subtasks.append(Task(id=row[0], task_id=row[1], title=row[2], state=TaskState(row[3])))
+    for task in tasks:
+        task.subTasks = subtasks_by_task_id[task.id]
+
+    return tasks
+
+
+def old_load_subtasks_for_task(conn: sqlite3.Connection, task_id: str) -> list:
+    rows = conn.execute("SELECT id, task_id, title, state FROM subtasks WHERE task_id=? ORDER BY completed, title, rowid",
+                        (task_id,))
+    return [Task(id=row[0], task_id=task_id, title=row[2], state=TaskState(row[3])) for row in rows]
+
+
+def timed(load):
+    start = time.perf_counter()
+    result = load()
+    return result, time.perf_counter() - start
+
+
+def snapshot(tasks: list) -> list:
+    return [(t.id, t.title, t.state, t.importance, t.subtask_count, t.completed_subtask_count,
+             [(s.id, s.task_id, s.title, s.state) for s in t.subTasks]) for t in tasks]
+
+
+def main() -> None:
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else ROW_COUNT
+    task_ids = build_old_database(row_count)
+    lookups = random.Random(2).choices(task_ids, k=LOOKUP_COUNT)
+    print(f"{len(task_ids)} tasks, {len(task_ids) * SUBTASKS_PER_TASK} subtasks")
+
+    conn = sqlite3.connect(OLD_DB)
+    old_tasks, old_load = timed(lambda: old_load_tasks(conn))
+    old_subtasks, old_lookup = timed(lambda: [old_load_subtasks_for_task(conn, i) for i in lookups])
+    conn.close()
+
+    shutil.copy(OLD_DB, db.db_name)
+    _, migration = timed(db.get_generation)
+    db._connection().execute("VACUUM")
+    new_tasks, new_load = timed(db.load_tasks)
+    new_subtasks, new_lookup = timed(lambda: [db.load_subtasks_for_task(i) for i in lookups])
+
+    assert snapshot(old_tasks) == snapshot(new_tasks), "The schemas loaded different tasks"
+    assert [[s.id for s in subtasks] for subtasks in old_subtasks] == [[s.id for s in subtasks] for subtasks in new_subtasks]
+
+    old_size = os.path.getsize(OLD_DB)
+    new_size = os.path.getsize(db.db_name)
+    print(f"  {'':<26} {'text keys':>12} {'integer keys':>14}")
+    print(f"  {'file size':<26} {old_size / 1e6:9.1f} MB {new_size / 1e6:11.1f} MB")
+    print(f"  {'load_tasks':<26} {old_load:10.2f} s {new_load:12.2f} s")
+    print(f"  {f'{LOOKUP_COUNT} x subtasks of a task':<26} {old_lookup * 1000:9.1f} ms {new_lookup * 1000:11.1f} ms")
+    print(f"Migrating took {migration:.1f} s; both schemas loaded the same tasks.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Times services.db.search on a corpus of 100k tasks and 400k subtasks.
+
+Run from the repository root:
+    python -m benchmarks.bench_search
+"""
+import random
+import time
+import uuid
+
+from benchmarks._setup import isolated_workdir
+
+isolated_workdir()
+
+from services import db
+
+TASK_COUNT = 100_000
+SUBTASKS_PER_TASK = 4
+COMMON_WORDS = ["report", "review", "invoice", "deploy", "meeting", "budget", "draft", "release", "customer", "backup",
+                "server", "design", "email", "plan", "quarterly", "annual", "team", "update", "fix", "test"]
+# Titles mostly use a long tail of rarer words, like real task lists
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "ze", "po", "da", "fe"]
+RARE_WORDS = [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES]
+QUERIES = ["report", "rep", "report kalomi", '"report kalomi"', "kalomi", "kalo", "zzz"]
+
+
+def title(rng: random.Random) -> str:
+    words = [rng.choice(COMMON_WORDS)] + [rng.choice(RARE_WORDS) for _ in range(3)]
+    return " ".join(words) + f" {rng.randrange(1_000_000)}"
+
+
+def populate() -> None:
+    rng = random.Random(42)
+    with db._connection() as conn:
+        for _ in range(TASK_COUNT // 1000):
+            task_rows = [db._task_row(str(uuid.uuid4()), title(rng), "new", "medium") for _ in range(1000)]
+            subtask_rows = [db._subtask_row(str(uuid.uuid4()), task[0], title(rng), "new")
+                            for task in task_rows for _ in range(SUBTASKS_PER_TASK)]
+            conn.executemany(db.TASK_UPSERT, task_rows)
+            conn.executemany(db.SUBTASK_UPSERT, subtask_rows)
+
+
+def main() -> None:
+    start = time.perf_counter()
+    populate()
+    print(f"Indexed {TASK_COUNT * (1 + SUBTASKS_PER_TASK)} rows in {time.perf_counter() - start:.1f} s")
+
+    for query in QUERIES:
+        runs = 20
+        start = time.perf_counter()
+        for _ in range(runs):
+            results = db.search(query, 50)
+        elapsed = (time.perf_counter() - start) / runs
+        print(f"  {query!r:<22} {elapsed * 1000:7.2f} ms  ({len(results)} results)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Compares keeping the task list in display order by sorting it again after every state change with moving only
+the changed task in a SortedTaskList, and sorting by comparisons with sorting by the tasks' cached keys.
+
+Run from the repository root:
+    python -m benchmarks.bench_sorting [tasks] [changes]
+"""
+import random
+import sys
+import time
+
+from models import MainTask, SortedTaskList
+from models.enums import TaskImportance, TaskState
+from tbe_todo_utils import sort_tasks
+
+TASK_COUNT = 100_000
+CHANGE_COUNT = 100
+
+
+def make_tasks(task_count: int) -> list:
+    rng = random.Random(1)
+    return [MainTask(title=f"Task {rng.randrange(task_count)}", importance=rng.choice(list(TaskImportance)),
+                     state=rng.choice(list(TaskState))) for _ in range(task_count)]
+
+
+def measure(label: str, run) -> float:
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<34} {elapsed * 1000:10.1f} ms")
+    return elapsed
+
+
+def change_states(tasks, change_count: int, after_change) -> None:
+    rng = random.Random(2)
+    for _ in range(change_count):
+        task = tasks[rng.randrange(len(tasks))]
+        task.state = rng.choice(list(TaskState))
+        after_change(task)
+
+
+def main() -> None:
+    task_count = int(sys.argv[1]) if len(sys.argv) > 1 else TASK_COUNT
+    change_count = int(sys.argv[2]) if len(sys.argv) > 2 else CHANGE_COUNT
+    print(f"{task_count} tasks, {change_count} state changes")
+
+    tasks = make_tasks(task_count)
+    measure("sort by comparisons", lambda: sorted(tasks))
+    measure("sort by keys (first time)", lambda: sort_tasks(tasks))
+    measure("sort by keys (cached)", lambda: sort_tasks(tasks))
+
+    resorted = sort_tasks(make_tasks(task_count))
+
+    def sort_again(_task) -> None:
+        resorted[:] = sort_tasks(resorted)
+
+    measure("re-sort after each change", lambda: change_states(resorted, change_count, sort_again))
+
+    sorted_list = SortedTaskList(make_tasks(task_count))
+    measure("reposition after each change", lambda: change_states(sorted_list, change_count, sorted_list.reposition))
+
+    assert [task.sort_key() for task in sorted_list] == [task.sort_key() for task in resorted], "Orders differ"
+    print("Both lists ended in the same order.")
+
+
+if __name__ == "__main__":
+    main()
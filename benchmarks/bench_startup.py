@@ -0,0 +1,155 @@
+"""
+Measures startup against a budget: the import time of the main modules, each in a fresh interpreter, and how
+long `tbe_todo.py --profile-startup` takes to paint the first tasks and to load all of them, with and without a
+current snapshot (without one, the app pages through the database to the end). Importing a module must not create files either (e.g. open the database at import time).
+
+Writes a JSON report and exits with status 1 when a measurement is over its budget.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup [--tasks N] [--repeat R] [--report FILE] [--budget NAME=LIMIT ...]
+"""
+import argparse
+import json
+import os
+import pathlib
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks._setup import isolated_workdir
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+# Relative --report and --budgets paths are taken from here, not from the temporary working directory
+INVOKED_FROM = pathlib.Path.cwd()
+
+isolated_workdir()
+
+from models import MainTask
+from services import db, snapshot
+
+MODULES = ["models", "services.db", "components", "tbe_todo"]
+
+# Seconds, except for the file counts. Generous enough for a loaded CI machine; tighten them as startup improves.
+BUDGETS = {
+    "import.models.s": 0.15,
+    "import.services.db.s": 0.3,
+    "import.components.s": 1.0,
+    "import.tbe_todo.s": 1.5,
+    "import.files_created": 0,
+    "database.first_paint.s": 2.5,
+    "database.loaded.s": 10.0,
+    "snapshot.first_paint.s": 2.5,
+    "snapshot.loaded.s": 8.0,
+}
+
+TASK_COUNT = 1000
+REPEAT = 5
+
+
+def measure_import(module: str, repeat: int) -> tuple:
+    """Import a module in fresh interpreters, in an empty directory: median seconds and the files it left behind."""
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    env = dict(os.environ, PYTHONPATH=str(REPO_ROOT))
+    times = []
+    files_created = 0
+
+    for _ in range(repeat):
+        workdir = tempfile.mkdtemp(prefix="tbe_todo_import_")
+        try:
+            output = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=env, check=True,
+                                    capture_output=True, text=True).stdout
+            times.append(float(output))
+            files_created = max(files_created, len(os.listdir(workdir)))
+        finally:
+            shutil.rmtree(workdir)
+
+    return statistics.median(times), files_created
+
+
+def measure_app(repeat: int, with_snapshot: bool) -> dict:
+    """Run the app's startup profile in the populated working directory: median seconds of each milestone."""
+    runs = []
+
+    for _ in range(repeat):
+        if with_snapshot:
+            # What the app writes on quitting with every task loaded
+            snapshot.write_snapshot(db.load_tasks(include_subtasks=False), db.get_generation(), include_subtasks=False)
+        else:
+            pathlib.Path(snapshot.SNAPSHOT_FILE).unlink(missing_ok=True)
+
+        output = subprocess.run([sys.executable, str(REPO_ROOT / "tbe_todo.py"), "--profile-startup"],
+                                check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    return {key: statistics.median(run[key] for run in runs) for key in runs[0] if key.endswith("_s")}
+
+
+def populate(task_count: int) -> None:
+    db.save_tasks(MainTask(title=f"Task {i}") for i in range(task_count))
+
+
+def parse_budget(text: str) -> tuple:
+    name, _, limit = text.partition("=")
+    if name not in BUDGETS or not limit:
+        raise argparse.ArgumentTypeError(f"expected NAME=LIMIT with NAME one of: {', '.join(BUDGETS)}")
+    return name, float(limit)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=TASK_COUNT, help="Tasks in the database")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="Runs per measurement; the median counts")
+    parser.add_argument("--report", help="Also write the JSON report to this file")
+    parser.add_argument("--budget", type=parse_budget, action="append", default=[],
+                        help="Override a budget, e.g. import.tbe_todo.s=0.8; repeatable")
+    parser.add_argument("--budgets", help="JSON file with budgets overriding the defaults")
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS)
+    if args.budgets:
+        with open(INVOKED_FROM / args.budgets, encoding="utf-8") as f:
+            budgets.update(json.load(f))
+    budgets.update(args.budget)
+
+    measurements = {}
+    files_created = 0
+    for module in MODULES:
+        seconds, created = measure_import(module, args.repeat)
+        measurements[f"import.{module}.s"] = seconds
+        files_created = max(files_created, created)
+    measurements["import.files_created"] = files_created
+
+    populate(args.tasks)
+    for label, with_snapshot in [("database", False), ("snapshot", True)]:
+        times = measure_app(args.repeat, with_snapshot)
+        measurements[f"{label}.first_paint.s"] = times["first_paint_s"]
+        measurements[f"{label}.loaded.s"] = times["all_loaded_s"]
+
+    over_budget = sorted(name for name, limit in budgets.items()
+                         if name in measurements and measurements[name] > limit)
+    report = {
+        "tasks": args.tasks,
+        "repeat": args.repeat,
+        "python": sys.version.split()[0],
+        "measurements": {name: round(value, 4) for name, value in measurements.items()},
+        "budgets": budgets,
+        "over_budget": over_budget,
+    }
+
+    for name, value in measurements.items():
+        limit = budgets.get(name)
+        status = "" if limit is None else ("  OVER BUDGET" if name in over_budget else f"  (budget {limit:g})")
+        print(f"  {name:<26} {value:10.4f}{status}", file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(INVOKED_FROM / args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Compares cold-start load times of the JSON file, the SQLite database and the msgpack snapshot.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup_formats
+"""
+import os
+import time
+
+from benchmarks._setup import isolated_workdir
+
+isolated_workdir()
+
+import tbe_todo_utils
+
+from models import MainTask, Task
+from models.enums import TaskImportance, TaskState
+from services import db, snapshot
+
+TASK_COUNTS = [10_000, 100_000]
+SUBTASKS_PER_TASK = 3
+
+
+def make_tasks(count: int) -> list:
+    importances = list(TaskImportance)
+    states = list(TaskState)
+    tasks = []
+    for i in range(count):
+        task = MainTask(title=f"Task {i}", state=states[i % len(states)], importance=importances[i % len(importances)])
+        task.subTasks = [Task(task_id=task.id, title=f"Subtask {i}.{j}", state=states[j % len(states)])
+                         for j in range(SUBTASKS_PER_TASK)]
+        tasks.append(task)
+    return tasks
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    print(f"{'tasks':>8} {'format':<10} {'load':>10} {'file size':>12}")
+    for count in TASK_COUNTS:
+        tbe_todo_utils.TODO_FILE = f"todo_list_{count}.json"
+        db.db_name = f"todo_list_{count}.db"
+        snapshot_file = f"todo_list_{count}.snapshot"
+
+        tasks = make_tasks(count)
+        tbe_todo_utils.save_tasks(tasks)
+        generation = db.get_generation()  # Imports the JSON file
+        snapshot.write_snapshot(tasks, generation, snapshot_file)
+        del tasks
+
+        results = [
+            ("json", timed(tbe_todo_utils.load_tasks), tbe_todo_utils.TODO_FILE),
+            ("sqlite", timed(db.load_tasks), db.db_name),
+            ("msgpack", timed(lambda: snapshot.read_snapshot(snapshot_file, generation)), snapshot_file),
+        ]
+        for name, elapsed, path in results:
+            print(f"{count:>8} {name:<10} {elapsed * 1000:>7.0f} ms {os.path.getsize(path) / 1e6:>9.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Compares the memory held by the task list with every subtask loaded against the app's TaskStore, which loads
+only the tasks and their counts and keeps the subtasks of the most recently selected tasks in its SubtaskCache.
+
+Run from the repository root:
+    python -m benchmarks.bench_subtask_memory
+"""
+import asyncio
+import gc
+import time
+import tracemalloc
+
+from benchmarks._setup import isolated_workdir
+
+isolated_workdir()
+
+from models import MainTask, Task
+from services import db
+from services.SqliteTaskRepository import SqliteTaskRepository
+from services.TaskStore import TaskStore
+
+TASK_COUNT = 10_000
+SUBTASKS_PER_TASK = 10
+CACHE_SIZE = TaskStore.SUBTASK_CACHE_SIZE
+
+
+class BrowsingView:
+    """Stands in for a session: waits for the subtasks it asked the store for."""
+
+    def __init__(self):
+        self.shown = asyncio.Event()
+
+    def show_tasks(self, moved, deleted_ids) -> None:
+        pass
+
+    def show_subtasks(self, task_ids) -> None:
+        self.shown.set()
+
+    def show_error(self, error: Exception) -> None:
+        raise error
+
+
+def populate() -> None:
+    tasks = []
+    for i in range(TASK_COUNT):
+        task = MainTask(title=f"Task {i}")
+        task.subTasks = [Task(task_id=task.id, title=f"Subtask {i}.{j}") for j in range(SUBTASKS_PER_TASK)]
+        tasks.append(task)
+    db.save_tasks(tasks)
+
+
+def measure(load) -> tuple:
+    """Return the bytes still allocated by what load() returns, and how long it took."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size, elapsed
+
+
+async def browse() -> TaskStore:
+    store = TaskStore(SqliteTaskRepository())
+    view = BrowsingView()
+    store.add_view(view)
+    store.start()
+    store.mark_painted()
+
+    while not store.fully_loaded:
+        store.load_more()
+        await asyncio.sleep(0)
+
+    # Select more tasks than the cache holds, one after another
+    for task in list(store.tasks)[:CACHE_SIZE * 4]:
+        view.shown.clear()
+        store.fetch_subtasks(task.id, view)
+        await view.shown.wait()
+
+    store.close()
+    return store
+
+
+def load_lazily() -> TaskStore:
+    # The closed store still holds its tasks and cached subtasks
+    return asyncio.run(browse())
+
+
+def main() -> None:
+    populate()
+    print(f"{TASK_COUNT} tasks, {TASK_COUNT * SUBTASKS_PER_TASK} subtasks")
+
+    for label, load in [("all subtasks", db.load_tasks), (f"lazy, {CACHE_SIZE}-task cache", load_lazily)]:
+        size, elapsed = measure(load)
+        print(f"  {label:<24} {size / 1e6:8.1f} MB {elapsed * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
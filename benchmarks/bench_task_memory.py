@@ -0,0 +1,60 @@
+"""
+Reports the memory held per task and per subtask once loaded from the database, as traced by tracemalloc.
+Run it before and after a change to the models to see what it costs or saves.
+
+Run from the repository root:
+    python -m benchmarks.bench_task_memory [tasks]
+"""
+import gc
+import sys
+import tracemalloc
+
+from benchmarks._setup import isolated_workdir
+
+isolated_workdir()
+
+from models import MainTask, Task
+from services import db
+
+TASK_COUNT = 20_000
+SUBTASKS_PER_TASK = 10
+
+
+def populate(task_count: int) -> None:
+    def tasks():
+        for i in range(task_count):
+            task = MainTask(title=f"Task {i}")
+            task.subTasks = [Task(task_id=task.id, title=f"Subtask {i}.{j}") for j in range(SUBTASKS_PER_TASK)]
+            yield task
+
+    db.save_tasks(tasks())
+
+
+def traced_size(load) -> int:
+    """Return the bytes still allocated by what load() returns."""
+    gc.collect()
+    tracemalloc.start()
+    result = load()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main() -> None:
+    task_count = int(sys.argv[1]) if len(sys.argv) > 1 else TASK_COUNT
+    subtask_count = task_count * SUBTASKS_PER_TASK
+    populate(task_count)
+
+    tasks_only = traced_size(lambda: db.load_tasks(include_subtasks=False))
+    with_subtasks = traced_size(db.load_tasks)
+
+    print(f"{task_count} tasks, {subtask_count} subtasks")
+    print(f"  per task     {tasks_only / task_count:8.0f} bytes")
+    print(f"  per subtask  {(with_subtasks - tasks_only) / subtask_count:8.0f} bytes")
+    print(f"  total        {with_subtasks / 1e6:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
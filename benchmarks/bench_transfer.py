@@ -0,0 +1,79 @@
+"""
+Round-trips a database of 1M rows (tasks plus subtasks) through the streaming export and import, in both
+formats, and reports the time and peak Python memory of each step.
+
+Run from the repository root:
+    python -m benchmarks.bench_transfer [rows]
+"""
+import filecmp
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+from benchmarks._setup import isolated_workdir
+
+isolated_workdir()
+
+from services import db, transfer
+
+ROW_COUNT = 1_000_000
+SUBTASKS_PER_TASK = 9
+
+
+def generate(row_count: int):
+    for i in range(row_count // (SUBTASKS_PER_TASK + 1)):
+        task_id = str(uuid.uuid4())
+        yield "task", (task_id, f"Task {i}", "new", "medium")
+        for j in range(SUBTASKS_PER_TASK):
+            yield "subtask", (str(uuid.uuid4()), task_id, f"Subtask {i}.{j}", "completed" if j % 3 == 0 else "new")
+
+
+def measure(label: str, run) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<16} {elapsed:8.1f} s {peak / 1e6:8.1f} MB peak")
+    return result
+
+
+def export_to(path: str, fmt: str) -> tuple:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        return transfer.export_tasks(f, fmt)
+
+
+def import_from(path: str, fmt: str) -> tuple:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return transfer.import_tasks(f, fmt)
+
+
+def main() -> None:
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else ROW_COUNT
+    db.import_rows(generate(row_count))
+    counts = db._connection().execute("SELECT (SELECT COUNT(*) FROM tasks), (SELECT COUNT(*) FROM subtasks)").fetchone()
+    print(f"{counts[0]} tasks, {counts[1]} subtasks")
+
+    source_db = db.db_name
+    for fmt in transfer.FORMATS:
+        print(fmt)
+        db.db_name = source_db
+        path = f"export.{fmt}"
+        exported = measure("export", lambda: export_to(path, fmt))
+        print(f"  {'file size':<16} {os.path.getsize(path) / 1e6:8.1f} MB")
+
+        db.db_name = f"import_{fmt}.db"
+        imported = measure("import", lambda: import_from(path, fmt))
+        assert exported == imported == counts, (exported, imported, counts)
+
+        export_to(f"again.{fmt}", fmt)
+        assert filecmp.cmp(path, f"again.{fmt}", shallow=False), "Round trip changed the data"
+
+    print("Round trips matched.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+from textual.app import ComposeResult
+from textual.containers import Vertical
+from textual.screen import ModalScreen
+from textual.widgets import Label, OptionList
+from textual.widgets.option_list import Option
+
+from models.enums import TaskImportance
+
+class ImportanceScreen(ModalScreen[TaskImportance | None]):
+    """Screen with a dialog to choose an importance for one or more tasks."""
+
+    BINDINGS = [("escape", "escape", "Close")]
+
+    def __init__(self, task_count: int = 1, **kwargs):
+        super().__init__(**kwargs)
+        self._task_count = task_count
+
+    def compose(self) -> ComposeResult:
+        title = "Set importance" if self._task_count == 1 else f"Set importance of {self._task_count} tasks"
+        yield Vertical(
+            Label(title, id="importance_title"),
+            OptionList(*[Option(importance.value.capitalize(), id=importance.value) for importance in TaskImportance],
+                       id="importance_options"),
+            id="importance_screen",
+        )
+
+    def on_mount(self):
+        self.query_one("#importance_options", OptionList).focus()
+
+    def on_option_list_option_selected(self, event: OptionList.OptionSelected) -> None:
+        event.stop()
+        self.dismiss(TaskImportance(event.option.id))
+
+    def action_escape(self):
+        self.dismiss(None)
@@ -0,0 +1,261 @@
+from typing import Dict, Iterable, List, Optional, Set
+
+from textual.binding import Binding
+from textual.widgets import ListView, ListItem, Label
+
+from models import Task
+from tbe_todo_utils import id_to_uuid, uuid_to_id, format_task_title
+
+
+class MultiSelectMixin:
+    """
+    Behaviour shared by the task lists, to be listed before ListView in their bases: the tasks shown with their
+    rows, a highlight that survives refreshes, and marking tasks for bulk actions.
+
+    Marks are kept as task ids. Toggling a mark or extending a range only restyles the items whose mark
+    changed, and new items are created with their mark, so no change to the marks walks the whole list.
+    """
+
+    # Textual only merges the BINDINGS of widget classes, so each list adds these to its own
+    SELECTION_BINDINGS = [
+        ("space", "toggle_mark", "Select"),
+        Binding("shift+up", "extend_selection(-1)", "Select Up", show=False),
+        Binding("shift+down", "extend_selection(1)", "Select Down", show=False),
+        Binding("escape", "clear_marks", "Clear Selection", show=False),
+    ]
+
+    def __init__(self, tasks: Optional[List[Task]] = None, **kwargs):
+        super().__init__(**kwargs)
+        self._tasks: List[Task] = []
+        self._tasks_waiting = tasks or []
+        self._presorted = False
+        # Tasks in the order they are shown
+        self._sorted_tasks: List[Task] = []
+        # The tasks by id, and the row of each item by its id, so the highlight is found without a scan
+        self._tasks_by_id: Dict[str, Task] = {}
+        self._rows: Dict[str, int] = {}
+        # Ids of the tasks marked for bulk actions, and the row a shift-selected range starts from
+        self._marked_ids: Set[str] = set()
+        self._range_anchor: Optional[int] = None
+
+    async def on_mount(self):
+        await self.set_tasks(self._tasks_waiting)
+        self._tasks_waiting = []
+
+    def action_toggle_mark(self) -> None:
+        selected_task = self.get_selected_task()
+        if selected_task is None:
+            return
+
+        self._range_anchor = self.index
+        self._set_marks(self._marked_ids ^ {selected_task.id})
+
+    def action_extend_selection(self, step: int) -> None:
+        if self.index is None or not self._sorted_tasks:
+            return
+
+        if self._range_anchor is None:
+            self._range_anchor = self.index
+
+        self.index = max(0, min(len(self._sorted_tasks) - 1, self.index + step))
+
+        # The rows from the anchor to the highlight become the marked set
+        start, end = sorted((self._range_anchor, self.index))
+        self._set_marks({task.id for task in self._sorted_tasks[start:end + 1]})
+
+    def action_clear_marks(self) -> None:
+        self._range_anchor = None
+        self._set_marks(set())
+
+    # ----- Public API -----
+
+    async def set_tasks(self, tasks: List[Task], presorted: bool = False) -> None:
+        """Replace the entire list of tasks (already in display order if presorted) and refresh the view, preserving selection."""
+        self._tasks = list(tasks)
+        self._tasks_by_id = {task.id: task for task in self._tasks}
+        self._presorted = presorted
+        await self._refresh_items_preserving_selection()
+
+    async def add_task(self, task: Task) -> None:
+        """Add a task and refresh the view with sorting and selection preservation."""
+        self._tasks.append(task)
+        self._tasks_by_id[task.id] = task
+        self._presorted = False
+        await self._refresh_items_preserving_selection()
+
+    async def update_task(self, updated_task: Task) -> None:
+        """Upsert a task (matched by id) and refresh the view with sorting and selection preservation."""
+        current = self._tasks_by_id.get(updated_task.id)
+        if current is None:
+            self._tasks.append(updated_task)
+        elif current is not updated_task:
+            self._tasks[self._tasks.index(current)] = updated_task
+        self._tasks_by_id[updated_task.id] = updated_task
+
+        self._presorted = False
+        await self._refresh_items_preserving_selection()
+
+    async def remove_task_by_id(self, task_id: str) -> None:
+        """Remove a task by UUID string and refresh the view, preserving selection when possible."""
+        if self._tasks_by_id.pop(task_id, None) is not None:
+            self._tasks = [t for t in self._tasks if t.id != task_id]
+        await self._refresh_items_preserving_selection()
+
+    async def move_task(self, task: Task, index: int) -> bool:
+        """
+        Show a task at index in display order, moving its item there or adding one, and leave the other items
+        alone; for a presorted list in which only this task moved or was added, e.g. at the index that
+        SortedTaskList reported for it.
+        :return: False, having changed nothing, if the list is not presorted or index is out of range
+        """
+        item_id = uuid_to_id(task.id)
+        old_row = self._rows.get(item_id)
+        rows = len(self._sorted_tasks) - (old_row is not None)
+        if not self._presorted or not 0 <= index <= rows or len(self.children) != len(self._sorted_tasks):
+            return False
+
+        highlighted_id = self._get_current_highlighted_id()
+
+        # _tasks is _sorted_tasks while presorted
+        self._tasks_by_id[task.id] = task
+        if old_row is None:
+            self._sorted_tasks.insert(index, task)
+            await self.insert(index, [self._make_item(task)])
+            first, last = index, len(self._sorted_tasks) - 1
+        else:
+            self._sorted_tasks.pop(old_row)
+            self._sorted_tasks.insert(index, task)
+            self._update_label(self.children[old_row], task)
+            if index < old_row:
+                self.move_child(old_row, before=index)
+            elif index > old_row:
+                self.move_child(old_row, after=index)
+            first, last = min(old_row, index), max(old_row, index)
+
+        # Only the rows between the old and the new place shift
+        for row in range(first, last + 1):
+            self._rows[uuid_to_id(self._sorted_tasks[row].id)] = row
+        if first != last:
+            self._range_anchor = None
+
+        self._restore_highlight(highlighted_id)
+        return True
+
+    def select_task_by_id(self, task_id: str) -> None:
+        """Highlight the task with the given UUID string, if it is in the list."""
+        self._set_highlight_by_id(uuid_to_id(task_id))
+
+    def get_marked_tasks(self) -> List[Task]:
+        """Return the tasks marked for a bulk action in display order, or else the selected task alone."""
+        if self._marked_ids:
+            return [task for task in self._sorted_tasks if task.id in self._marked_ids]
+
+        selected_task = self.get_selected_task()
+        return [selected_task] if selected_task is not None else []
+
+    def get_selected_task(self) -> Optional[Task]:
+        """Return the currently selected task, or None if no task is selected."""
+        selected_item_id = self._get_current_highlighted_id()
+        if selected_item_id is None:
+            return None
+
+        return self._tasks_by_id.get(id_to_uuid(selected_item_id))
+
+    # ----- Internal helpers -----
+
+    def _sort(self, tasks: Iterable[Task]) -> List[Task]:
+        """Put tasks in display order; each list sorts its own kind of task."""
+        raise NotImplementedError
+
+    def _make_item(self, task: Task) -> ListItem:
+        item = ListItem(Label(format_task_title(task)), id=uuid_to_id(task.id))
+        item.set_class(task.id in self._marked_ids, "-marked")
+        return item
+
+    def _set_marks(self, marked_ids: Set[str]) -> None:
+        # Only the items whose mark changed are restyled
+        for task_id in self._marked_ids ^ marked_ids:
+            row = self._rows.get(uuid_to_id(task_id))
+            if row is not None:
+                self.children[row].set_class(task_id in marked_ids, "-marked")
+
+        self._marked_ids = marked_ids
+
+    def _get_current_highlighted_id(self) -> Optional[str]:
+        # The highlighted item's id, if any; highlighted_child indexes the items rather than copying them
+        current_item = self.highlighted_child
+        return getattr(current_item, "id", None) if current_item is not None else None
+
+    def _set_highlight_by_id(self, target_id: str) -> None:
+        # Find the new index for the id and set it as the highlighted index
+        new_index = self._rows.get(target_id)
+        if new_index is not None:
+            try:
+                self.index = new_index  # Programmatically set the highlight
+            except Exception:
+                # If direct assignment isn't supported in your Textual version, we leave as-is.
+                pass
+
+    async def _refresh_items_preserving_selection(self) -> None:
+        # Save the currently highlighted item's id
+        highlighted_id = self._get_current_highlighted_id()
+
+        sorted_tasks = self._tasks if self._presorted else self._sort(self._tasks)
+        desired_ids = [uuid_to_id(t.id) for t in sorted_tasks]
+        self._sorted_tasks = sorted_tasks
+        self._rows = {item_id: row for row, item_id in enumerate(desired_ids)}
+
+        # Forget marks of tasks that are gone; their items go with them
+        if self._marked_ids:
+            self._marked_ids &= self._tasks_by_id.keys()
+
+        # If the structure already matches, do an in-place label update; else rebuild
+        existing_items = list(self.children)
+        existing_ids = [getattr(it, "id", None) for it in existing_items]
+
+        rebuild = existing_ids != desired_ids or len(existing_items) != len(desired_ids)
+        # Rows only added at the end (e.g. a page loaded on demand) keep the existing items
+        append_only = rebuild and desired_ids[:len(existing_ids)] == existing_ids
+
+        if rebuild and not append_only:
+            # Rebuild entirely, in one removal and one mount; row numbers change, so a pending range starts over
+            self._range_anchor = None
+            await self.clear()
+            await self.extend([self._make_item(task) for task in sorted_tasks])
+        else:
+            if append_only:
+                await self.extend([self._make_item(task) for task in sorted_tasks[len(existing_items):]])
+
+            # Same structure for the existing items; only update labels if the text changed
+            for it, task in zip(existing_items, sorted_tasks):
+                self._update_label(it, task)
+
+        self._restore_highlight(highlighted_id)
+
+    def _update_label(self, item: ListItem, task: Task) -> None:
+        desired_text = format_task_title(task)
+
+        # ListItem(Label(...)) -> its first child should be our Label
+        if item.children:
+            label = item.children[0]
+            # Label has update(str) to change content
+            try:
+                # Only update if content differs to avoid unnecessary renders
+                if getattr(label, "renderable", None) != desired_text:
+                    label.update(desired_text)
+            except Exception:
+                # Fallback: try direct update
+                label.update(desired_text)
+
+    def _restore_highlight(self, highlighted_id: Optional[str]) -> None:
+        # Restore highlight if possible; if nothing was highlighted or it no longer exists, leave as-is.
+        if highlighted_id:
+            self._set_highlight_by_id(highlighted_id)
+        else:
+            # If nothing is highlighted and we have items, ensure we highlight the first one
+            if self.children:
+                try:
+                    self.index = 0
+                    self.mutate_reactive(ListView.index)
+                except Exception:
+                    pass
@@ -0,0 +1,85 @@
+import time
+
+from typing import List
+
+from textual import work
+from textual.app import ComposeResult
+from textual.containers import Vertical
+from textual.screen import ModalScreen
+from textual.widgets import Input, OptionList
+from textual.widgets.option_list import Option
+from textual.worker import Worker, get_current_worker
+
+from services.TaskStore import TaskStore
+from services.db import SearchResult
+
+class SearchScreen(ModalScreen[str | None]):
+    """Screen with a dialog to search task and subtask titles. Returns the id of the task owning the chosen match."""
+
+    BINDINGS = [("escape", "escape", "Close")]
+
+    # Number of matches listed
+    RESULT_LIMIT = 50
+    # Seconds without typing before the titles are searched
+    SEARCH_DELAY = 0.15
+
+    def __init__(self, store: TaskStore, **kwargs):
+        super().__init__(**kwargs)
+        self._store = store
+
+    def compose(self) -> ComposeResult:
+        yield Vertical(
+            Input(id="search_input", placeholder='Search titles (use "quotes" for phrases)'),
+            OptionList(id="search_results"),
+            id="search_screen",
+        )
+
+    def on_mount(self):
+        self.query_one("#search_input", Input).focus()
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        event.stop()
+        self._search(event.value)
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        event.stop()
+
+        results = self.query_one("#search_results", OptionList)
+        if results.option_count > 0:
+            results.focus()
+            results.highlighted = 0
+
+    def on_option_list_option_selected(self, event: OptionList.OptionSelected) -> None:
+        event.stop()
+        self.dismiss(event.option.id.split(":", 1)[1])
+
+    def action_escape(self):
+        self.dismiss(None)
+
+    # ----- Internal helpers -----
+
+    @work(thread=True, exclusive=True, group="search")
+    def _search(self, query: str) -> None:
+        """Runs on a worker thread, which the next keystroke cancels: search once typing pauses."""
+        worker = get_current_worker()
+        time.sleep(self.SEARCH_DELAY)
+        if worker.is_cancelled:
+            return
+
+        # Recent edits are only searchable once written
+        self._store.flush()
+        results = self._store.search(query, self.RESULT_LIMIT)
+        if not worker.is_cancelled:
+            self.app.call_from_thread(self._show_results, worker, results)
+
+    def _show_results(self, worker: Worker, results: List[SearchResult]) -> None:
+        if worker.is_cancelled:
+            # A newer search is on its way
+            return
+
+        options = self.query_one("#search_results", OptionList)
+        options.clear_options()
+        # Ids must be unique while a task can match more than once, so the index is prepended
+        options.add_options(Option(result.title if result.subtask_id is None else f"  ↳ {result.title}",
+                                   id=f"{index}:{result.task_id}")
+                            for index, result in enumerate(results))
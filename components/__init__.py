@@ -1,15 +1,19 @@
 from .AddSubtaskScreen import AddSubtaskScreen
 from .AddTaskScreen import AddTaskScreen
+from .ImportanceScreen import ImportanceScreen
 from .MainTodoList import MainTodoList
 from .DeleteScreen import DeleteScreen
+from .SearchScreen import SearchScreen
 from .SubTasksScreen import SubTasksScreen
 from .SubTodoList import SubTodoList
 
 __all__ = [
     "AddSubtaskScreen",
     "AddTaskScreen",
+    "ImportanceScreen",
     "MainTodoList",
     "DeleteScreen",
+    "SearchScreen",
     "SubTasksScreen",
     "SubTodoList",
 ]
\ No newline at end of file
@@ -0,0 +1,117 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List
+
+from .MainTask import MainTask
+from .Task import Task
+
+
+@dataclass
+class ChangeSet:
+    """Entities created, modified or deleted between two flushes of a ChangeTracker."""
+    created_tasks: List[MainTask] = field(default_factory=list)
+    modified_tasks: List[MainTask] = field(default_factory=list)
+    deleted_task_ids: List[str] = field(default_factory=list)
+    created_subtasks: List[Task] = field(default_factory=list)
+    modified_subtasks: List[Task] = field(default_factory=list)
+    deleted_subtask_ids: List[str] = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        return not (self.created_tasks or self.modified_tasks or self.deleted_task_ids
+                    or self.created_subtasks or self.modified_subtasks or self.deleted_subtask_ids)
+
+
+class ChangeTracker:
+    """
+    Records which tasks and subtasks changed since the last flush.
+
+    Tracked entities report their own field changes; creations and deletions are reported by the caller.
+    """
+
+    def __init__(self):
+        self._created: Dict[str, Task] = {}
+        self._modified: Dict[str, Task] = {}
+        self._deleted: Dict[str, Task] = {}
+        self._paused = False
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        """Ignore field changes inside the block, e.g. while applying changes that are already stored."""
+        self._paused = True
+        try:
+            yield
+        finally:
+            self._paused = False
+
+    def track(self, task: Task) -> None:
+        """Start receiving field changes from a task (and the subtasks of a MainTask)."""
+        task.attach_tracker(self)
+
+        if isinstance(task, MainTask):
+            for subtask in task.subTasks:
+                subtask.attach_tracker(self)
+
+    def track_all(self, tasks: Iterable[Task]) -> None:
+        for task in tasks:
+            self.track(task)
+
+    def mark_created(self, task: Task) -> None:
+        self.track(task)
+        self._deleted.pop(task.id, None)
+        self._created[task.id] = task
+
+        if isinstance(task, MainTask):
+            for subtask in task.subTasks:
+                self._created[subtask.id] = subtask
+
+    def mark_modified(self, task: Task) -> None:
+        if self._paused or task.id in self._created or task.id in self._deleted:
+            return
+
+        self._modified[task.id] = task
+
+    def mark_deleted(self, task: Task) -> None:
+        task.attach_tracker(None)
+        self._modified.pop(task.id, None)
+
+        if self._created.pop(task.id, None) is None:
+            self._deleted[task.id] = task
+
+        if isinstance(task, MainTask):
+            # Removing the task removes its subtasks with it, so they need no rows of their own
+            for subtask in task.subTasks:
+                subtask.attach_tracker(None)
+                self._created.pop(subtask.id, None)
+                self._modified.pop(subtask.id, None)
+                self._deleted.pop(subtask.id, None)
+
+    def has_changes(self) -> bool:
+        return bool(self._created or self._modified or self._deleted)
+
+    def flush(self) -> ChangeSet:
+        """Return everything recorded since the last flush and start over."""
+        changes = ChangeSet()
+
+        for task in self._created.values():
+            if isinstance(task, MainTask):
+                changes.created_tasks.append(task)
+            else:
+                changes.created_subtasks.append(task)
+
+        for task in self._modified.values():
+            if isinstance(task, MainTask):
+                changes.modified_tasks.append(task)
+            else:
+                changes.modified_subtasks.append(task)
+
+        for task in self._deleted.values():
+            if isinstance(task, MainTask):
+                changes.deleted_task_ids.append(task.id)
+            else:
+                changes.deleted_subtask_ids.append(task.id)
+
+        self._created = {}
+        self._modified = {}
+        self._deleted = {}
+
+        return changes
@@ -1,17 +1,117 @@
+import bisect
+
 from dataclasses import dataclass, field
-from typing import List
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from .Task import Task
 from models.enums import TaskState, TaskImportance
 
-@dataclass
+# Position of each importance in display order, most important first
+IMPORTANCE_RANKS = {importance: rank for rank, importance in enumerate(TaskImportance)}
+
+@dataclass(slots=True)
 class MainTask(Task):
+    # Always a TaskImportance member, so every task shares the same few objects
     importance: TaskImportance = TaskImportance.MEDIUM
+    # Progress counters; declared before subTasks, whose assignment in __init__ sets them
+    _subtask_count: int = field(default=0, init=False, repr=False, compare=False)
+    _completed_subtask_count: int = field(default=0, init=False, repr=False, compare=False)
+    # subTasks by id, kept alongside them; None while there are none, to save a dict per task
+    _subtasks_by_id: Optional[Dict[str, Task]] = field(default=None, init=False, repr=False, compare=False)
     subTasks: List[Task] = field(default_factory=list)
 
+    def __setattr__(self, name, value):
+        Task.__setattr__(self, name, value)
+
+        if name == "subTasks":
+            self._adopt_subtasks()
+
+    @property
+    def subtask_count(self) -> int:
+        return self._subtask_count
+
+    @property
+    def completed_subtask_count(self) -> int:
+        return self._completed_subtask_count
+
+    def set_subtask_counts(self, completed: int, total: int) -> None:
+        """Set the progress counters of a task whose subtasks are not loaded (e.g. from the database's counters)."""
+        object.__setattr__(self, "_completed_subtask_count", completed)
+        object.__setattr__(self, "_subtask_count", total)
+
+    def get_subtask(self, subtask_id: str) -> Optional[Task]:
+        """Return the loaded subtask with the given id, or None."""
+        if self._subtasks_by_id is None:
+            return None
+
+        return self._subtasks_by_id.get(subtask_id)
+
+    def add_subtask(self, subtask: Task) -> None:
+        """Insert a subtask, keeping subTasks in display order."""
+        bisect.insort(self.subTasks, subtask, key=Task.sort_key)
+        if self._subtasks_by_id is None:
+            object.__setattr__(self, "_subtasks_by_id", {})
+        self._subtasks_by_id[subtask.id] = subtask
+        object.__setattr__(subtask, "_parent", self)
+        self._count_subtask(subtask, 1)
+
+    def remove_subtask(self, subtask: Task) -> None:
+        self.subTasks.remove(subtask)
+        self._subtasks_by_id.pop(subtask.id, None)
+        object.__setattr__(subtask, "_parent", None)
+        self._count_subtask(subtask, -1)
+
+    def remove_subtasks(self, subtask_ids: Iterable[str]) -> List[Task]:
+        """
+        Remove several subtasks in one pass over subTasks
+        :return: The removed subtasks
+        """
+        subtask_ids = set(subtask_ids)
+        kept = []
+        removed = []
+        for subtask in self.subTasks:
+            if subtask.id in subtask_ids:
+                object.__setattr__(subtask, "_parent", None)
+                removed.append(subtask)
+            else:
+                kept.append(subtask)
+
+        self.subTasks = kept
+        return removed
+
+    def _adopt_subtasks(self) -> None:
+        # A new list was assigned: link its subtasks back to this task, index and count them once
+        completed = 0
+        subtasks_by_id = {}
+        for subtask in self.subTasks:
+            object.__setattr__(subtask, "_parent", self)
+            subtasks_by_id[subtask.id] = subtask
+            if subtask.state == TaskState.COMPLETED:
+                completed += 1
+
+        object.__setattr__(self, "_subtasks_by_id", subtasks_by_id or None)
+        self.set_subtask_counts(completed, len(self.subTasks))
+
+    def _count_subtask(self, subtask: Task, delta: int) -> None:
+        object.__setattr__(self, "_subtask_count", self._subtask_count + delta)
+        if subtask.state == TaskState.COMPLETED:
+            object.__setattr__(self, "_completed_subtask_count", self._completed_subtask_count + delta)
+
+    def _subtask_state_changed(self, old_state: TaskState, new_state: TaskState) -> None:
+        completed = self._completed_subtask_count
+        if old_state == TaskState.COMPLETED:
+            completed -= 1
+        if new_state == TaskState.COMPLETED:
+            completed += 1
+        object.__setattr__(self, "_completed_subtask_count", completed)
+
+    def _make_sort_key(self) -> Tuple:
+        # Open before completed, then by importance, then by title
+        return self.state is TaskState.COMPLETED, IMPORTANCE_RANKS[self.importance], self.title
+
     def to_dict(self):
         return {
-            **super().to_dict(),
+            **Task.to_dict(self),
             "importance": self.importance.value,
             "subTasks": [item.to_dict() for item in self.subTasks]
         }
@@ -27,16 +127,7 @@ class MainTask(Task):
         )
 
     def __lt__(self, other):
-        if not isinstance(other, MainTask):
-            if isinstance(other, Task):
-                return super().__lt__(other)
-            return False
-
-        if self.is_completed() != other.is_completed():
-            return other.is_completed()
-
-        if self.importance != other.importance:
-            importance_order = list(TaskImportance)
-            return importance_order.index(self.importance) < importance_order.index(other.importance)
+        if isinstance(other, MainTask):
+            return self.sort_key() < other.sort_key()
 
-        return self.title < other.title
+        return Task.__lt__(self, other)
@@ -0,0 +1,148 @@
+import bisect
+
+from collections.abc import Sequence
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .Task import Task
+
+
+class SortedTaskList(Sequence):
+    """
+    Tasks (or subtasks) kept in display order as they are added, removed and changed.
+
+    Every task is placed by its cached sort key with a binary search, so a single task finds its place in
+    O(log n) comparisons instead of the whole list being sorted again. The list remembers the key each task was
+    placed by: after changing a task's title, state or importance, call reposition() to move it. Tasks are also
+    indexed by id, so get() and membership tests take constant time.
+    """
+
+    def __init__(self, tasks: Iterable[Task] = (), presorted: bool = False):
+        """
+        :param tasks: Initial tasks
+        :param presorted: The tasks are already in display order and need not be sorted
+        """
+        self._tasks: List[Task] = []
+        # Key of each task when it was placed, in the same order as _tasks, and by task id; the tasks by id
+        self._keys: List[Tuple] = []
+        self._placed: Dict[str, Tuple] = {}
+        self._by_id: Dict[str, Task] = {}
+        self._reset(tasks if presorted else sorted(tasks, key=Task.sort_key))
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def __getitem__(self, index):
+        return self._tasks[index]
+
+    def __iter__(self) -> Iterator[Task]:
+        return iter(self._tasks)
+
+    def __contains__(self, task) -> bool:
+        return isinstance(task, Task) and task.id in self._placed
+
+    def __eq__(self, other):
+        if isinstance(other, SortedTaskList):
+            return self._tasks == other._tasks
+        if isinstance(other, list):
+            return self._tasks == other
+
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"SortedTaskList({self._tasks!r})"
+
+    def has_id(self, task_id: str) -> bool:
+        return task_id in self._placed
+
+    def get(self, task_id: str) -> Optional[Task]:
+        """Return the task with the given id, or None."""
+        return self._by_id.get(task_id)
+
+    def add(self, task: Task) -> int:
+        """
+        Insert a task that is not in the list yet, after any with an equal key
+        :return: Its index
+        """
+        key = task.sort_key()
+        index = bisect.bisect_right(self._keys, key)
+        self._tasks.insert(index, task)
+        self._keys.insert(index, key)
+        self._placed[task.id] = key
+        self._by_id[task.id] = task
+        return index
+
+    def add_all(self, tasks: Iterable[Task]) -> None:
+        """Insert several tasks that are not in the list yet, in one merge rather than one insert each."""
+        tasks = list(tasks)
+        if len(tasks) == 1:
+            self.add(tasks[0])
+        elif tasks:
+            # Timsort finds the two sorted runs and merges them in linear time
+            self._reset(sorted(self._tasks + sorted(tasks, key=Task.sort_key), key=Task.sort_key))
+
+    def remove(self, task: Task) -> None:
+        """:raises ValueError: If the task is not in the list"""
+        index = self._index_of(task)
+        del self._tasks[index]
+        del self._keys[index]
+        del self._placed[task.id]
+        del self._by_id[task.id]
+
+    def remove_ids(self, task_ids: Iterable[str]) -> List[Task]:
+        """
+        Remove several tasks in one pass over the list
+        :return: The removed tasks
+        """
+        task_ids = set(task_ids) & self._placed.keys()
+        if not task_ids:
+            return []
+
+        removed = []
+        kept = []
+        keys = []
+        for task, key in zip(self._tasks, self._keys):
+            if task.id in task_ids:
+                removed.append(task)
+                del self._placed[task.id]
+                del self._by_id[task.id]
+            else:
+                kept.append(task)
+                keys.append(key)
+
+        self._tasks = kept
+        self._keys = keys
+        return removed
+
+    def reposition(self, task: Task) -> int:
+        """
+        Move a task whose sort key changed since it was placed; a task whose key did not change stays put
+        :return: Its index
+        :raises ValueError: If the task is not in the list
+        """
+        index = self._index_of(task)
+        if task.sort_key() == self._keys[index]:
+            return index
+
+        del self._tasks[index]
+        del self._keys[index]
+        return self.add(task)
+
+    # ----- Internal helpers -----
+
+    def _index_of(self, task: Task) -> int:
+        key = self._placed.get(task.id)
+        if key is None:
+            raise ValueError(f"Task {task.id} is not in the list")
+
+        # Tasks with equal keys sit next to each other; the first with the same id is the one
+        index = bisect.bisect_left(self._keys, key)
+        while self._tasks[index].id != task.id:
+            index += 1
+
+        return index
+
+    def _reset(self, tasks: Iterable[Task]) -> None:
+        self._tasks = list(tasks)
+        self._keys = [task.sort_key() for task in self._tasks]
+        self._placed = dict(zip((task.id for task in self._tasks), self._keys))
+        self._by_id = {task.id: task for task in self._tasks}
@@ -1,17 +1,69 @@
 import uuid
 from dataclasses import dataclass, field
+from typing import Any, Optional, Tuple
 from models.enums import TaskState
 
-@dataclass
+# Fields stored by the persistence backends; changing one marks the task as modified
+TRACKED_FIELDS = frozenset({"task_id", "title", "state", "importance"})
+# Fields the display order depends on; changing one drops the cached sort key
+SORT_FIELDS = frozenset({"title", "state", "importance"})
+
+# Slotted: no per-instance __dict__, which matters with hundreds of thousands of subtasks loaded. Subclasses
+# must call Task's methods by name rather than through super(), which slots=True classes do not support.
+@dataclass(slots=True)
 class Task:
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
     task_id: str = None
     title: str = ""
+    # Always a TaskState member, so every task shares the same few objects
     state: TaskState = TaskState.NEW
+    # The MainTask whose subTasks hold this subtask, and the ChangeTracker receiving its changes
+    _parent: Optional[Any] = field(default=None, init=False, repr=False, compare=False)
+    _tracker: Optional[Any] = field(default=None, init=False, repr=False, compare=False)
+    # Cached result of sort_key(), None until it is next asked for
+    _sort_key: Optional[Tuple] = field(default=None, init=False, repr=False, compare=False)
+
+    def __setattr__(self, name, value):
+        if name == "state":
+            # Subtasks keep their MainTask's progress counters current
+            parent = getattr(self, "_parent", None)
+            if parent is not None:
+                parent._subtask_state_changed(self.state, value)
+
+        object.__setattr__(self, name, value)
+
+        if name in SORT_FIELDS:
+            object.__setattr__(self, "_sort_key", None)
+
+        if name in TRACKED_FIELDS:
+            tracker = getattr(self, "_tracker", None)
+            if tracker is not None:
+                tracker.mark_modified(self)
+
+    @property
+    def parent(self) -> Optional[Any]:
+        """The MainTask whose loaded subTasks hold this subtask, or None."""
+        return self._parent
+
+    def attach_tracker(self, tracker) -> None:
+        """Report changes of persisted fields to the given ChangeTracker (or stop reporting, if None)."""
+        object.__setattr__(self, "_tracker", tracker)
 
     def is_completed(self) -> bool:
         return self.state == TaskState.COMPLETED
 
+    def sort_key(self) -> Tuple:
+        """Key of the task in display order: open before completed, then by title. Cached until either changes."""
+        key = self._sort_key
+        if key is None:
+            key = self._make_sort_key()
+            object.__setattr__(self, "_sort_key", key)
+
+        return key
+
+    def _make_sort_key(self) -> Tuple:
+        return self.state is TaskState.COMPLETED, self.title
+
     def to_dict(self):
         task_id = self.task_id if self.task_id else None
 
@@ -41,7 +93,8 @@ class Task:
         if not isinstance(other, Task):
             return False
 
-        if self.is_completed() != other.is_completed():
-            return other.is_completed()
+        if type(self) is type(other):
+            return self.sort_key() < other.sort_key()
 
-        return self.title < other.title
+        # A MainTask next to a plain Task: only what both keys have in common counts
+        return Task._make_sort_key(self) < Task._make_sort_key(other)
@@ -1,4 +1,6 @@
+from .ChangeTracker import ChangeSet, ChangeTracker
 from .MainTask import MainTask
+from .SortedTaskList import SortedTaskList
 from .Task import Task
 
-__all__ = ["MainTask", "Task"]
\ No newline at end of file
+__all__ = ["ChangeSet", "ChangeTracker", "MainTask", "SortedTaskList", "Task"]
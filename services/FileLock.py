@@ -0,0 +1,73 @@
+import os
+import pathlib
+import struct
+import threading
+
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: nothing keeps other instances out of the file
+    fcntl = None
+
+# Write counter kept at the start of the lock file
+_STAMP = struct.Struct(">Q")
+
+
+class FileLock:
+    """
+    Exclusive flock on a lock file that instances in this process or others take turns on; sections may nest.
+
+    The lock file also holds a write counter, which writers advance while holding the lock so that readers
+    notice a rewrite even when the file it guards kept its size and modification time.
+    """
+
+    def __init__(self, path: str | pathlib.Path, lock: threading.RLock):
+        """
+        :param path: Lock file, created if missing
+        :param lock: Lock of the owner, held for as long as the file is locked
+        """
+        self._lock = lock
+        self._fd: Optional[int] = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        # How many nested sections hold the lock
+        self._depth = 0
+
+    def __enter__(self) -> "FileLock":
+        self._lock.acquire()
+        try:
+            if self._depth == 0 and fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except BaseException:
+            self._lock.release()
+            raise
+
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        try:
+            self._depth -= 1
+            if self._depth == 0 and fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            self._lock.release()
+
+    def read_stamp(self) -> int:
+        """Return the write counter, 0 if nothing advanced it yet."""
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        data = os.read(self._fd, _STAMP.size)
+        return _STAMP.unpack(data)[0] if len(data) == _STAMP.size else 0
+
+    def advance_stamp(self) -> int:
+        """Advance the write counter, which the caller must hold the lock for, and return it."""
+        stamp = self.read_stamp() + 1
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, _STAMP.pack(stamp))
+        return stamp
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
@@ -0,0 +1,320 @@
+import dataclasses
+import itertools
+import re
+import threading
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models import ChangeSet, MainTask, Task
+from models.enums import TaskImportance, TaskState
+from services.db import ChangedRows, SearchResult, TaskPage
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+class InMemoryTaskRepository:
+    """
+    TaskRepository keeping everything in dictionaries, for tests, benchmarks and throwaway sessions.
+
+    Stores copies of what it is given and hands out copies, so it never shares objects with its callers.
+    """
+
+    def __init__(self, tasks: Optional[Iterable[MainTask]] = None):
+        # Task id -> stored task without subtasks, and its position in insertion order (breaks ties like rowid)
+        self._tasks: Dict[str, MainTask] = {}
+        self._sequence: Dict[str, int] = {}
+        # Task id -> subtask id -> stored subtask, and subtask id -> task id
+        self._subtasks: Dict[str, Dict[str, Task]] = {}
+        self._subtask_owners: Dict[str, str] = {}
+        self._counter = itertools.count()
+        self._lock = threading.RLock()
+        # Advances with every write; each written row records the version it was written at, and each deleted
+        # row leaves a tombstone (id -> id of the owning task or None, version) for load_changes
+        self._version = 0
+        self._row_versions: Dict[str, int] = {}
+        self._tombstones: Dict[str, Tuple[Optional[str], int]] = {}
+
+        if tasks is not None:
+            self._version += 1
+            self._upsert_tasks(tasks)
+
+    def get_generation(self) -> Optional[int]:
+        # Nothing survives the process, so nothing written at a generation can be trusted by a later run
+        return None
+
+    def get_data_version(self) -> int:
+        return self._version
+
+    def get_change_version(self) -> int:
+        return self._version
+
+    def load_changes(self, since: int) -> ChangedRows:
+        with self._lock:
+            tasks = []
+            subtasks = []
+            for row_id, version in self._row_versions.items():
+                if version <= since:
+                    continue
+
+                if row_id in self._tasks:
+                    tasks.append(self._copy_task(self._tasks[row_id], False))
+                else:
+                    subtask = self._subtasks[self._subtask_owners[row_id]][row_id]
+                    subtasks.append(dataclasses.replace(subtask))
+
+            deleted_task_ids = []
+            deleted_subtasks = {}
+            for row_id, (task_id, version) in self._tombstones.items():
+                if version > since:
+                    if task_id is None:
+                        deleted_task_ids.append(row_id)
+                    else:
+                        deleted_subtasks[row_id] = task_id
+
+            return ChangedRows(tasks=tasks, subtasks=subtasks, deleted_task_ids=deleted_task_ids,
+                               deleted_subtasks=deleted_subtasks, version=self._version)
+
+    def load_tasks(self, include_subtasks: bool = True) -> List[MainTask]:
+        with self._lock:
+            return [self._copy_task(task, include_subtasks) for task in self._sorted_tasks()]
+
+    def load_tasks_page(self,
+                        after_key: Optional[Tuple] = None,
+                        limit: int = 200,
+                        states: Optional[Iterable[TaskState]] = None,
+                        importances: Optional[Iterable[TaskImportance]] = None,
+                        include_subtasks: bool = True,
+                        with_open_subtasks: bool = False) -> TaskPage:
+        states = set(states) if states is not None else None
+        importances = set(importances) if importances is not None else None
+
+        with self._lock:
+            page = []
+            next_key = None
+
+            for task in self._sorted_tasks():
+                if after_key is not None and self._sort_key(task) <= after_key:
+                    continue
+                if states is not None and task.state not in states:
+                    continue
+                if importances is not None and task.importance not in importances:
+                    continue
+                if with_open_subtasks and not any(not s.is_completed() for s in self._subtasks[task.id].values()):
+                    continue
+
+                if len(page) == limit:
+                    next_key = self._sort_key(page[-1])
+                    break
+                page.append(task)
+
+            return TaskPage(tasks=[self._copy_task(task, include_subtasks) for task in page], next_key=next_key)
+
+    def load_task(self, task_id: str) -> Optional[MainTask]:
+        if task_id is None or len(task_id.strip()) == 0:
+            raise ValueError("Task ID is required.")
+
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return self._copy_task(task, True) if task is not None else None
+
+    def load_subtasks_for_task(self, task_id: str) -> List[Task]:
+        if task_id is None or len(task_id.strip()) == 0:
+            raise ValueError("Task ID is required.")
+
+        with self._lock:
+            return sorted((dataclasses.replace(s) for s in self._subtasks.get(task_id, {}).values()), key=Task.sort_key)
+
+    def search(self, query: str, limit: int = 50) -> List[SearchResult]:
+        words, phrases = _parse_query(query)
+        if not words and not phrases:
+            return []
+
+        results = []
+        with self._lock:
+            for task in self._sorted_tasks():
+                if _matches(task.title, words, phrases):
+                    results.append(SearchResult(task_id=task.id, subtask_id=None, title=task.title, rank=0.0))
+
+                for subtask in sorted(self._subtasks[task.id].values(), key=Task.sort_key):
+                    if _matches(subtask.title, words, phrases):
+                        results.append(SearchResult(task_id=task.id, subtask_id=subtask.id, title=subtask.title, rank=0.0))
+
+                if len(results) >= limit:
+                    break
+
+        return results[:limit]
+
+    def save_tasks(self, tasks: Iterable[MainTask]) -> Optional[int]:
+        with self._lock:
+            self._version += 1
+            self._upsert_tasks(tasks)
+
+        return None
+
+    def save_changes(self, changes: ChangeSet) -> Optional[int]:
+        if changes.is_empty():
+            return None
+
+        with self._lock:
+            self._version += 1
+
+            # Upserts before deletes, like the SQLite backend
+            for task in changes.created_tasks + changes.modified_tasks:
+                self._upsert_task(task)
+
+            for subtask in changes.created_subtasks + changes.modified_subtasks:
+                self._upsert_subtask(subtask)
+
+            for subtask_id in changes.deleted_subtask_ids:
+                self._delete_subtask(subtask_id)
+
+            for task_id in changes.deleted_task_ids:
+                self._delete_task(task_id)
+
+        return None
+
+    def close(self) -> None:
+        pass
+
+    # ----- Internal helpers -----
+
+    def _upsert_tasks(self, tasks: Iterable[MainTask]) -> None:
+        for task in tasks:
+            self._upsert_task(task)
+            for subtask in task.subTasks:
+                # Subtasks in old JSON files may lack their task id
+                self._upsert_subtask(subtask, subtask.task_id or task.id)
+
+    def _upsert_task(self, task: MainTask) -> None:
+        self._tasks[task.id] = dataclasses.replace(task, subTasks=[])
+        self._sequence.setdefault(task.id, next(self._counter))
+        self._subtasks.setdefault(task.id, {})
+        self._touch(task.id)
+
+    def _delete_task(self, task_id: str) -> None:
+        if self._tasks.pop(task_id, None) is None:
+            return
+
+        self._sequence.pop(task_id, None)
+        for subtask_id in list(self._subtasks.get(task_id, {})):
+            self._delete_subtask(subtask_id)
+        self._subtasks.pop(task_id, None)
+        self._row_versions.pop(task_id, None)
+        self._tombstones[task_id] = (None, self._version)
+
+    def _delete_subtask(self, subtask_id: str) -> None:
+        owner_id = self._subtask_owners.pop(subtask_id, None)
+        if owner_id is None:
+            return
+
+        self._subtasks[owner_id].pop(subtask_id, None)
+        self._row_versions.pop(subtask_id, None)
+        self._tombstones[subtask_id] = (owner_id, self._version)
+        # The owner's counters changed
+        self._touch_task(owner_id)
+
+    def _replace_tasks(self, tasks: Iterable[MainTask]) -> None:
+        """Make the stored tasks and subtasks equal to tasks, giving a new row version only to those that differ."""
+        task_ids = set()
+        subtask_ids = set()
+
+        for task in tasks:
+            task_ids.add(task.id)
+            stored = self._tasks.get(task.id)
+            if stored is None or _task_fields(stored) != _task_fields(task):
+                self._upsert_task(task)
+
+            for subtask in task.subTasks:
+                # Subtasks in old JSON files may lack their task id
+                task_id = subtask.task_id or task.id
+                subtask_ids.add(subtask.id)
+
+                owner_id = self._subtask_owners.get(subtask.id)
+                stored = self._subtasks[owner_id][subtask.id] if owner_id is not None else None
+                if stored is None or _subtask_fields(stored) != (task_id, subtask.title, subtask.state):
+                    self._upsert_subtask(subtask, task_id)
+
+        for subtask_id in [i for i in self._subtask_owners if i not in subtask_ids]:
+            self._delete_subtask(subtask_id)
+
+        for task_id in [i for i in self._tasks if i not in task_ids]:
+            self._delete_task(task_id)
+
+    def _touch(self, row_id: str) -> None:
+        self._row_versions[row_id] = self._version
+        self._tombstones.pop(row_id, None)
+
+    def _touch_task(self, task_id: str) -> None:
+        if task_id in self._tasks:
+            self._row_versions[task_id] = self._version
+
+    def _upsert_subtask(self, subtask: Task, task_id: Optional[str] = None) -> None:
+        task_id = task_id or subtask.task_id
+        # Like the SQLite backend, a subtask of a task that is not stored is not written, nor moved there
+        if task_id not in self._tasks:
+            return
+
+        # A changed task_id moves the subtask to another task
+        owner_id = self._subtask_owners.get(subtask.id)
+        if owner_id is not None and owner_id != task_id:
+            self._subtasks[owner_id].pop(subtask.id, None)
+            self._touch_task(owner_id)
+
+        self._subtask_owners[subtask.id] = task_id
+        self._subtasks.setdefault(task_id, {})[subtask.id] = dataclasses.replace(subtask, task_id=task_id)
+        self._touch(subtask.id)
+        # The owner's counters may have changed
+        self._touch_task(task_id)
+
+    def _sort_key(self, task: MainTask) -> Tuple:
+        # Same shape as the keys of the SQLite backend: (completed, importance code, title, insertion order)
+        return task.sort_key() + (self._sequence[task.id],)
+
+    def _sorted_tasks(self) -> List[MainTask]:
+        return sorted(self._tasks.values(), key=self._sort_key)
+
+    def _copy_task(self, task: MainTask, include_subtasks: bool) -> MainTask:
+        subtasks = self._subtasks.get(task.id, {})
+        copy = dataclasses.replace(task, subTasks=[])
+
+        if include_subtasks:
+            copy.subTasks = sorted((dataclasses.replace(s) for s in subtasks.values()), key=Task.sort_key)
+        else:
+            copy.set_subtask_counts(sum(1 for s in subtasks.values() if s.is_completed()), len(subtasks))
+
+        return copy
+
+
+def _task_fields(task: MainTask) -> Tuple:
+    return task.title, task.state, task.importance
+
+
+def _subtask_fields(subtask: Task) -> Tuple:
+    return subtask.task_id, subtask.title, subtask.state
+
+
+def _tokenize(text: str) -> List[str]:
+    # Like the FTS5 unicode61 tokenizer: runs of letters and digits, case-folded
+    return _TOKEN.findall(text.lower())
+
+
+def _parse_query(query: str) -> Tuple[List[str], List[List[str]]]:
+    """Split a search into word prefixes and double-quoted phrases, like db.search reads it."""
+    words = []
+    phrases = []
+    for index, part in enumerate(query.split('"')):
+        # Odd parts were inside double quotes
+        if index % 2 == 1:
+            if _tokenize(part):
+                phrases.append(_tokenize(part))
+        else:
+            words.extend(_tokenize(part))
+
+    return words, phrases
+
+
+def _matches(title: str, words: List[str], phrases: List[List[str]]) -> bool:
+    tokens = _tokenize(title)
+
+    return (all(any(token.startswith(word) for token in tokens) for word in words)
+            and all(any(tokens[i:i + len(phrase)] == phrase for i in range(len(tokens))) for phrase in phrases))
@@ -0,0 +1,122 @@
+import json
+import os
+import pathlib
+
+from typing import Iterable, Optional, Tuple
+
+from models import ChangeSet, MainTask
+from services.db import ChangedRows
+from services.FileLock import FileLock
+from services.InMemoryTaskRepository import InMemoryTaskRepository
+import tbe_todo_utils
+
+# Kept apart from tbe_todo_utils.TODO_FILE, which the SQLite backend imports its first tasks from: writes here
+# must never look like a newer todo file to import
+JSON_FILE = "todo_store.json"
+
+
+class JsonTaskRepository(InMemoryTaskRepository):
+    """
+    TaskRepository backed by a JSON todo file.
+
+    The file is read once; queries are answered from memory and every write replaces the file atomically.
+    When the file's modification time or size changes under it, or the write counter in the lock file next to
+    it moved (another instance wrote it), it is read again and only the tasks and subtasks that differ get a new
+    row version. Instances in this process or others take turns through an flock on that lock file, held from
+    reading the file again through rewriting it, so no write replaces the file over another instance's edit.
+    The default file starts out as a copy of the legacy todo file, which is never written.
+    """
+
+    def __init__(self, path: str | pathlib.Path | None = None):
+        """:param path: JSON file, JSON_FILE if omitted; the lock file sits next to it with ".lock" appended"""
+        super().__init__()
+        self._path = pathlib.Path(path or JSON_FILE)
+        self._file_lock = FileLock(self._path.with_name(f"{self._path.name}.lock"), self._lock)
+        # (modification time, size, write counter) of the file as last read or written by this repository
+        self._file_stat: Optional[Tuple[int, int, int]] = None
+
+        with self._file_lock:
+            if path is None:
+                self._copy_legacy_file()
+            self._reload_if_changed()
+
+    def get_data_version(self) -> int:
+        self._reload_if_changed()
+        return super().get_data_version()
+
+    def get_change_version(self) -> int:
+        self._reload_if_changed()
+        return super().get_change_version()
+
+    def load_changes(self, since: int) -> ChangedRows:
+        self._reload_if_changed()
+        return super().load_changes(since)
+
+    def save_tasks(self, tasks: Iterable[MainTask]) -> Optional[int]:
+        with self._file_lock:
+            self._reload_if_changed()
+            super().save_tasks(tasks)
+            self._write_file()
+
+        return None
+
+    def save_changes(self, changes: ChangeSet) -> Optional[int]:
+        if changes.is_empty():
+            return None
+
+        with self._file_lock:
+            # Merge what others wrote first, so that rewriting the file does not undo it
+            self._reload_if_changed()
+            super().save_changes(changes)
+            self._write_file()
+
+        return None
+
+    def close(self) -> None:
+        self._file_lock.close()
+
+    # ----- Internal helpers -----
+
+    def _copy_legacy_file(self) -> None:
+        legacy_path = pathlib.Path(tbe_todo_utils.TODO_FILE)
+        if self._path.exists() or not legacy_path.exists():
+            return
+
+        try:
+            tbe_todo_utils.save_tasks(tbe_todo_utils.iter_tasks(legacy_path), self._path)
+        except (json.JSONDecodeError, TypeError, KeyError, ValueError) as err:
+            print(f"Error: {err}. Starting {self._path} without the tasks of {legacy_path}.")
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self._path)
+        except FileNotFoundError:
+            return None
+
+        # A rewrite of the same size within one modification time tick still advances the counter
+        return stat.st_mtime_ns, stat.st_size, self._file_lock.read_stamp()
+
+    def _reload_if_changed(self) -> None:
+        with self._file_lock:
+            stat = self._stat()
+            if stat == self._file_stat:
+                return
+
+            try:
+                tasks = list(tbe_todo_utils.iter_tasks(self._path)) if stat is not None else []
+            except (json.JSONDecodeError, TypeError, KeyError, ValueError) as err:
+                print(f"Error: {err}. Keeping the tasks read before.")
+                self._file_stat = stat
+                return
+
+            self._version += 1
+            self._replace_tasks(tasks)
+            self._file_stat = stat
+
+    def _write_file(self) -> None:
+        # Tasks are built one at a time while the file is streamed out
+        tasks = (self._copy_task(task, True) for task in self._sorted_tasks())
+        tbe_todo_utils.save_tasks(tasks, self._path)
+        self._file_lock.advance_stamp()
+        self._file_stat = self._stat()
+
@@ -0,0 +1,305 @@
+import json
+import os
+import pathlib
+import time
+
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from models import ChangeSet, MainTask, Task
+from models.enums import TaskImportance, TaskState
+from services.db import ChangedRows
+from services.FileLock import FileLock
+from services.InMemoryTaskRepository import InMemoryTaskRepository
+import tbe_todo_utils
+
+LOG_FILE = "todo_list.log"
+
+# Log size in bytes past which it is folded into the snapshot and started afresh
+COMPACT_THRESHOLD = 4 * 1024 * 1024
+
+# Least seconds between fsyncs of the log: a write syncs it if the last sync is older, and close() syncs what is
+# left. None never syncs it, 0 syncs after every write
+FSYNC_INTERVAL = 1.0
+
+# Bytes read from the log at a time while replaying it
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class LogTaskRepository(InMemoryTaskRepository):
+    """
+    TaskRepository backed by an append-only operation log over a JSON snapshot.
+
+    Every write appends one line to the log with a single write() call: a compact JSON list of the operations
+    in the batch, so the I/O of an edit depends on the edit and not on how many tasks there are. A record is
+    applied only if its whole line made it to the file, so a crash mid-write loses that batch and nothing
+    else. Once the log grows past the compaction threshold, the tasks are written to the snapshot and the log
+    is replaced by an empty one. At startup the log is replayed over the snapshot.
+
+    Another instance appending to the log is noticed by the log growing; one compacting it by the log being
+    replaced, after which everything is read again and only what differs gets a new row version. Instances in
+    this process or others take turns through an flock on a lock file next to the log: catching up, appending,
+    dropping a torn record and compacting each run while holding it, so no record is appended to a log being
+    replaced and no record still being written is mistaken for a torn one. Where fcntl is missing (Windows),
+    only one instance may use a log at a time. The default log starts out from the legacy todo file, copied
+    into the snapshot; the legacy file is never written.
+    """
+
+    def __init__(self,
+                 path: str | pathlib.Path | None = None,
+                 fsync_interval: Optional[float] = FSYNC_INTERVAL,
+                 compact_threshold: int = COMPACT_THRESHOLD):
+        """
+        :param path: Log file, LOG_FILE if omitted; the snapshot and the lock file sit next to it with ".snapshot"
+                     and ".lock" appended
+        :param fsync_interval: Seconds between fsyncs of the log; None never syncs it, 0 syncs after every write
+        :param compact_threshold: Log size in bytes past which it is compacted into the snapshot
+        """
+        super().__init__()
+        self._path = pathlib.Path(path or LOG_FILE)
+        self._snapshot_path = self._path.with_name(f"{self._path.name}.snapshot")
+        self._fsync_interval = fsync_interval
+        self._compact_threshold = compact_threshold
+        # Descriptor of the log opened for appending, which file it is, and how far it has been applied
+        self._fd: Optional[int] = None
+        self._log_id: Optional[Tuple[int, int]] = None
+        self._offset = 0
+        # Appended records not synced to disk yet, and when the log was last synced
+        self._unsynced = False
+        self._synced_at = time.monotonic()
+        self._file_lock = FileLock(self._path.with_name(f"{self._path.name}.lock"), self._lock)
+
+        with self._file_lock:
+            if path is None:
+                self._copy_legacy_file()
+            self._recover()
+
+    def get_data_version(self) -> int:
+        self._catch_up()
+        return super().get_data_version()
+
+    def get_change_version(self) -> int:
+        self._catch_up()
+        return super().get_change_version()
+
+    def load_changes(self, since: int) -> ChangedRows:
+        self._catch_up()
+        return super().load_changes(since)
+
+    def save_tasks(self, tasks: Iterable[MainTask]) -> Optional[int]:
+        operations = []
+        for task in tasks:
+            operations.append(_task_operation(task))
+            # Subtasks in old JSON files may lack their task id
+            operations.extend(_subtask_operation(subtask, subtask.task_id or task.id) for subtask in task.subTasks)
+
+        self._append(operations)
+        return None
+
+    def save_changes(self, changes: ChangeSet) -> Optional[int]:
+        if changes.is_empty():
+            return None
+
+        # Upserts before deletes, like the other backends
+        operations = [_task_operation(task) for task in changes.created_tasks + changes.modified_tasks]
+        operations.extend(_subtask_operation(subtask, subtask.task_id)
+                          for subtask in changes.created_subtasks + changes.modified_subtasks)
+        operations.extend(["ds", subtask_id] for subtask_id in changes.deleted_subtask_ids)
+        operations.extend(["dt", task_id] for task_id in changes.deleted_task_ids)
+
+        self._append(operations)
+        return None
+
+    def compact(self) -> None:
+        """Write all tasks to the snapshot and start an empty log."""
+        with self._file_lock:
+            self._catch_up()
+            self._compact()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is None:
+                return
+
+            if self._unsynced:
+                os.fsync(self._fd)
+                self._unsynced = False
+            os.close(self._fd)
+            self._fd = None
+            self._file_lock.close()
+
+    # ----- Internal helpers -----
+
+    def _copy_legacy_file(self) -> None:
+        """Start from the tasks of TODO_FILE, as the snapshot, when there is neither a log nor a snapshot yet."""
+        legacy_path = pathlib.Path(tbe_todo_utils.TODO_FILE)
+        if self._path.exists() or self._snapshot_path.exists() or not legacy_path.exists():
+            return
+
+        try:
+            tbe_todo_utils.save_tasks(tbe_todo_utils.iter_tasks(legacy_path), self._snapshot_path)
+        except (json.JSONDecodeError, TypeError, KeyError, ValueError) as err:
+            print(f"Error: {err}. Starting {self._path} without the tasks of {legacy_path}.")
+
+    def _recover(self) -> None:
+        """Load the snapshot, replay the log over it, and drop a record left half-written by a crash."""
+        self._open_log()
+        super().save_tasks(self._read_snapshot())
+        self._offset = self._replay(super().save_changes, 0)
+        self._drop_torn_tail()
+
+        if self._offset >= self._compact_threshold:
+            self._compact()
+
+    def _open_log(self) -> None:
+        if self._fd is not None:
+            if self._unsynced:
+                os.fsync(self._fd)
+                self._unsynced = False
+            os.close(self._fd)
+
+        self._fd = os.open(self._path, os.O_RDWR | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        stat = os.fstat(self._fd)
+        self._log_id = (stat.st_dev, stat.st_ino)
+
+    def _read_snapshot(self) -> List[MainTask]:
+        if not self._snapshot_path.exists():
+            return []
+
+        try:
+            return list(tbe_todo_utils.iter_tasks(self._snapshot_path))
+        except (json.JSONDecodeError, TypeError, KeyError, ValueError) as err:
+            print(f"Error: {err}. Replaying the log without the snapshot {self._snapshot_path}.")
+            return []
+
+    def _catch_up(self) -> None:
+        """Apply what other instances appended since the last look, or read everything again after they compacted."""
+        with self._file_lock:
+            try:
+                stat = os.stat(self._path)
+            except FileNotFoundError:
+                stat = None
+
+            if stat is None or (stat.st_dev, stat.st_ino) != self._log_id:
+                self._reload()
+            elif stat.st_size > self._offset:
+                self._offset = self._replay(super().save_changes, self._offset)
+
+    def _reload(self) -> None:
+        """Read the snapshot and the new log into a scratch repository and take over only what differs."""
+        self._open_log()
+        scratch = InMemoryTaskRepository(self._read_snapshot())
+        self._offset = self._replay(scratch.save_changes, 0)
+
+        self._version += 1
+        self._replace_tasks(scratch.load_tasks())
+
+    def _replay(self, apply: Callable[[ChangeSet], Optional[int]], offset: int) -> int:
+        """
+        Apply the complete records of the log after an offset, one ChangeSet each
+        :param apply: save_changes of the in-memory repository to apply them to
+        :return: Offset after the last complete record; a partial last line is left for a later look
+        """
+        with open(self._path, "rb") as f:
+            f.seek(offset)
+            pending = b""
+
+            while chunk := f.read(READ_CHUNK_SIZE):
+                lines = (pending + chunk).split(b"\n")
+                pending = lines.pop()
+
+                for line in lines:
+                    offset += len(line) + 1
+                    try:
+                        changes = _changes_from_record(json.loads(line))
+                    except (json.JSONDecodeError, TypeError, KeyError, ValueError) as err:
+                        print(f"Error: {err}. Skipping a damaged record in {self._path}.")
+                        continue
+
+                    apply(changes)
+
+        return offset
+
+    def _drop_torn_tail(self) -> None:
+        # Bytes past the last complete record were left by a write that never finished; the next record
+        # would be glued to them
+        size = os.fstat(self._fd).st_size
+        if size > self._offset:
+            print(f"Error: Discarding {size - self._offset} bytes of an unfinished record in {self._path}.")
+            os.truncate(self._path, self._offset)
+
+    def _append(self, operations: List[list]) -> None:
+        record = json.dumps(operations, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+        with self._file_lock:
+            self._catch_up()
+            self._drop_torn_tail()
+
+            os.write(self._fd, record)
+            self._unsynced = True
+            # Applied the way a replay applies it
+            super().save_changes(_changes_from_record(operations))
+
+            # If another instance appended in between, its record and this one are read back on the next look
+            if os.fstat(self._fd).st_size == self._offset + len(record):
+                self._offset += len(record)
+
+            if self._offset >= self._compact_threshold:
+                self._compact()
+            else:
+                self._sync_if_due()
+
+    def _sync_if_due(self) -> None:
+        if self._fsync_interval is None or time.monotonic() - self._synced_at < self._fsync_interval:
+            return
+
+        os.fsync(self._fd)
+        self._unsynced = False
+        self._synced_at = time.monotonic()
+
+    def _compact(self) -> None:
+        # The snapshot is replaced atomically before the log, so a crash in between leaves a snapshot that
+        # already holds the log's records; replaying them again ends in the same state
+        tasks = (self._copy_task(task, True) for task in self._sorted_tasks())
+        tbe_todo_utils.save_tasks(tasks, self._snapshot_path)
+
+        temp_path = self._path.with_name(f".{self._path.name}.tmp")
+        with open(temp_path, "wb") as f:
+            os.fsync(f.fileno())
+        os.replace(temp_path, self._path)
+
+        self._unsynced = False
+        self._open_log()
+        self._offset = 0
+        self._synced_at = time.monotonic()
+
+
+def _changes_from_record(operations: List[list]) -> ChangeSet:
+    """
+    Read the operations of one log record
+    :raises ValueError: If an operation is unknown or malformed
+    """
+    changes = ChangeSet()
+    for operation in operations:
+        match operation:
+            case ["t", task_id, title, state, importance]:
+                changes.created_tasks.append(MainTask(id=task_id, title=title, state=TaskState(state),
+                                                      importance=TaskImportance(importance)))
+            case ["s", subtask_id, task_id, title, state]:
+                changes.created_subtasks.append(Task(id=subtask_id, task_id=task_id, title=title,
+                                                     state=TaskState(state)))
+            case ["ds", subtask_id]:
+                changes.deleted_subtask_ids.append(subtask_id)
+            case ["dt", task_id]:
+                changes.deleted_task_ids.append(task_id)
+            case _:
+                raise ValueError(f"Unknown log operation {operation!r}")
+
+    return changes
+
+
+def _task_operation(task: MainTask) -> list:
+    return ["t", task.id, task.title, task.state.value, task.importance.value]
+
+
+def _subtask_operation(subtask: Task, task_id: str) -> list:
+    return ["s", subtask.id, task_id, subtask.title, subtask.state.value]
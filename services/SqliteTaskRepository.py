@@ -0,0 +1,53 @@
+from typing import Iterable, List, Optional, Tuple
+
+from models import ChangeSet, MainTask, Task
+from models.enums import TaskImportance, TaskState
+from services import db
+from services.connection import close_connection
+from services.db import ChangedRows, SearchResult, TaskPage
+
+
+class SqliteTaskRepository:
+    """TaskRepository backed by the SQLite database in services.db."""
+
+    def get_generation(self) -> Optional[int]:
+        return db.get_generation()
+
+    def get_data_version(self) -> int:
+        return db.get_data_version()
+
+    def get_change_version(self) -> int:
+        return db.get_generation()
+
+    def load_changes(self, since: int) -> ChangedRows:
+        return db.load_changes(since)
+
+    def load_tasks(self, include_subtasks: bool = True) -> List[MainTask]:
+        return db.load_tasks(include_subtasks)
+
+    def load_tasks_page(self,
+                        after_key: Optional[Tuple] = None,
+                        limit: int = 200,
+                        states: Optional[Iterable[TaskState]] = None,
+                        importances: Optional[Iterable[TaskImportance]] = None,
+                        include_subtasks: bool = True,
+                        with_open_subtasks: bool = False) -> TaskPage:
+        return db.load_tasks_page(after_key, limit, states, importances, include_subtasks, with_open_subtasks)
+
+    def load_task(self, task_id: str) -> Optional[MainTask]:
+        return db.load_task(task_id)
+
+    def load_subtasks_for_task(self, task_id: str) -> List[Task]:
+        return db.load_subtasks_for_task(task_id)
+
+    def search(self, query: str, limit: int = 50) -> List[SearchResult]:
+        return db.search(query, limit)
+
+    def save_tasks(self, tasks: Iterable[MainTask]) -> Optional[int]:
+        return db.save_tasks(tasks)
+
+    def save_changes(self, changes: ChangeSet) -> Optional[int]:
+        return db.save_changes(changes)
+
+    def close(self) -> None:
+        close_connection(db.db_name)
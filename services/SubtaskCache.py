@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from typing import List, Optional
+
+from models import MainTask, Task
+
+
+class SubtaskCache:
+    """
+    Keeps the subtasks of the most recently used tasks loaded, up to capacity tasks.
+
+    Tasks start out with only their subtask counts. Once their owner has read a task's subtasks into task.subTasks,
+    put() records it; once more than capacity tasks are loaded, the least recently used one drops its subtasks
+    again and keeps its counts.
+    """
+
+    def __init__(self, capacity: int = 64):
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1.")
+
+        self._capacity = capacity
+        # Task id -> task whose subTasks are loaded, least recently used first
+        self._tasks: OrderedDict[str, MainTask] = OrderedDict()
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._tasks
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def loaded_tasks(self) -> List[MainTask]:
+        """Return the tasks whose subtasks are loaded, least recently used first."""
+        return list(self._tasks.values())
+
+    def lookup(self, task: MainTask) -> Optional[List[Task]]:
+        """Return the subtasks of a task if they are loaded, without loading them; None if they are not."""
+        if self._tasks.get(task.id) is not task:
+            return None
+
+        self._tasks.move_to_end(task.id)
+        return task.subTasks
+
+    def put(self, task: MainTask) -> None:
+        """Record that a task's subTasks are complete, e.g. for a new task or one loaded with its subtasks."""
+        self._tasks[task.id] = task
+        self._tasks.move_to_end(task.id)
+
+        while len(self._tasks) > self._capacity:
+            _, evicted = self._tasks.popitem(last=False)
+            self._unload(evicted)
+
+    def invalidate(self, task_id: str) -> None:
+        """Drop a task's subtasks, so that lookup() misses until they are read and put() again."""
+        task = self._tasks.pop(task_id, None)
+        if task is not None:
+            self._unload(task)
+
+    def clear(self) -> None:
+        for task in self._tasks.values():
+            self._unload(task)
+
+        self._tasks = OrderedDict()
+
+    # ----- Internal helpers -----
+
+    @staticmethod
+    def _unload(task: MainTask) -> None:
+        completed, total = task.completed_subtask_count, task.subtask_count
+        task.subTasks = []
+        task.set_subtask_counts(completed, total)
@@ -0,0 +1,107 @@
+from typing import Iterable, List, Optional, Protocol, Tuple
+
+from models import ChangeSet, MainTask, Task
+from models.enums import TaskImportance, TaskState
+from services.db import ChangedRows, SearchResult, TaskPage
+
+
+class TaskRepository(Protocol):
+    """
+    Storage backend holding the tasks and subtasks of the application.
+
+    Tasks are returned in display order (see MainTask.__lt__) as new objects, so callers own what they load.
+    """
+
+    def get_generation(self) -> Optional[int]:
+        """
+        Get the data generation, which increases with every committed write
+        :return: The generation, or None if the backend cannot tell whether someone else wrote in between
+        """
+        ...
+
+    def get_data_version(self) -> int:
+        """
+        Get a value that changes whenever anyone, in this process or another, writes; cheap enough to poll, and
+        comparable between calls from different threads.
+        """
+        ...
+
+    def get_change_version(self) -> int:
+        """Get the version of the latest write, to pass to load_changes later. Take it before loading tasks."""
+        ...
+
+    def load_changes(self, since: int) -> ChangedRows:
+        """
+        Load the tasks and subtasks written or deleted after a version
+        :param since: get_change_version() from before the caller loaded its tasks, or a previous ChangedRows.version
+        """
+        ...
+
+    def load_tasks(self, include_subtasks: bool = True) -> List[MainTask]:
+        ...
+
+    def load_tasks_page(self,
+                        after_key: Optional[Tuple] = None,
+                        limit: int = 200,
+                        states: Optional[Iterable[TaskState]] = None,
+                        importances: Optional[Iterable[TaskImportance]] = None,
+                        include_subtasks: bool = True,
+                        with_open_subtasks: bool = False) -> TaskPage:
+        """Load one page of tasks in display order; see db.load_tasks_page for the parameters."""
+        ...
+
+    def load_task(self, task_id: str) -> Optional[MainTask]:
+        ...
+
+    def load_subtasks_for_task(self, task_id: str) -> List[Task]:
+        ...
+
+    def search(self, query: str, limit: int = 50) -> List[SearchResult]:
+        """Search task and subtask titles; see db.search for the query syntax."""
+        ...
+
+    def save_tasks(self, tasks: Iterable[MainTask]) -> Optional[int]:
+        """
+        Insert or update tasks together with their subtasks, in one batch
+        :return: The data generation after the write
+        """
+        ...
+
+    def save_changes(self, changes: ChangeSet) -> Optional[int]:
+        """
+        Write only the tasks and subtasks in a ChangeSet, in one batch
+        :return: The data generation after the write
+        """
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+# Names accepted by create_repository, e.g. from the --backend option or the TBE_TODO_BACKEND variable
+BACKENDS = ["sqlite", "json", "log", "memory"]
+DEFAULT_BACKEND = "sqlite"
+
+
+def create_repository(backend: Optional[str] = None) -> TaskRepository:
+    """
+    Create the repository for a backend name
+    :param backend: One of BACKENDS, DEFAULT_BACKEND if omitted
+    :raises ValueError: If the backend is unknown
+    """
+    # Backends are imported on first use, so startup only loads the one it runs on
+    match backend or DEFAULT_BACKEND:
+        case "sqlite":
+            from services.SqliteTaskRepository import SqliteTaskRepository
+            return SqliteTaskRepository()
+        case "json":
+            from services.JsonTaskRepository import JsonTaskRepository
+            return JsonTaskRepository()
+        case "log":
+            from services.LogTaskRepository import LogTaskRepository
+            return LogTaskRepository()
+        case "memory":
+            from services.InMemoryTaskRepository import InMemoryTaskRepository
+            return InMemoryTaskRepository()
+
+    raise ValueError(f"Unknown backend '{backend}'. Choose one of: {', '.join(BACKENDS)}.")
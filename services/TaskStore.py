@@ -0,0 +1,604 @@
+import asyncio
+import concurrent.futures
+import functools
+
+from typing import Awaitable, Callable, Dict, FrozenSet, Iterable, List, Optional, Protocol, Set, Tuple, TypeVar
+
+from models import ChangeSet, ChangeTracker, MainTask, SortedTaskList, Task
+from services import snapshot
+from services.SubtaskCache import SubtaskCache
+from services.TaskRepository import TaskRepository
+from services.WriteBehindPersister import WriteBehindPersister
+from services.db import ChangedRows, SearchResult, TaskPage
+from tbe_todo_utils import sort_subtasks
+
+T = TypeVar("T")
+
+
+class TaskStoreView(Protocol):
+    """A session showing the tasks of a TaskStore; told about every change, whichever session made it."""
+
+    def show_tasks(self, moved: Optional[Tuple[MainTask, int]], deleted_ids: Set[str]) -> None:
+        """
+        Show the tasks again after they changed
+        :param moved: The one task that moved in (or was added to) the tasks, and its new index, when nothing
+                      else changed in their order
+        :param deleted_ids: Ids of the tasks that were deleted
+        """
+        ...
+
+    def show_subtasks(self, task_ids: Set[str]) -> None:
+        """Show the subtasks of these tasks again, if one of them is selected."""
+        ...
+
+    def show_error(self, error: Exception) -> None:
+        ...
+
+
+class TaskStore:
+    """
+    The tasks of one repository, loaded once and shared by every session (TodoApp) showing them.
+
+    All sessions live on one event loop; the store changes its tasks only there and then tells every view,
+    so an edit in one session shows in the others at once. Each view keeps only its own view state: its
+    selection, its list items and the list of the selected task's subtasks. The repository is only used from
+    one thread of the store, so the process holds a single connection to it however many sessions there are;
+    the persister writes through that thread too. Writes by other processes are polled for and merged.
+
+    Tasks are kept in display order (only the subtask counts; the subtasks themselves come in through the
+    cache when a task is selected), and every change keeps tasks and each subTasks list sorted.
+    """
+
+    # Tasks fetched from the database at a time, when there is no current snapshot holding all of them
+    PAGE_SIZE = 200
+    # Tasks shown as soon as the database answers, about a screenful; the rest streams in after them
+    FIRST_PAINT_SIZE = 50
+    # Tasks added to the list at a time while the rest of a snapshot streams in
+    LOAD_CHUNK_SIZE = 1000
+    # Tasks whose subtasks stay loaded after they were last selected; the others only keep their counts
+    SUBTASK_CACHE_SIZE = 64
+    # Seconds between checks for changes written by other processes
+    CHANGE_POLL_INTERVAL = 1.0
+
+    def __init__(self, repository: TaskRepository):
+        self.tasks = SortedTaskList()
+        self._repository = repository
+        self._changes = ChangeTracker()
+        self._persister = WriteBehindPersister(self._save_changes)
+        self._subtask_cache = SubtaskCache(self.SUBTASK_CACHE_SIZE)
+        # The one thread the repository is used from
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-store")
+        self._views: List[TaskStoreView] = []
+        # Running reads, cancelled on close
+        self._jobs: Set[asyncio.Task] = set()
+        self._started = False
+        self._closed = False
+
+        # Nothing is read until start(), so the UI can mount at once
+        self._loading = True
+        self._first_page_loaded = False
+        self._first_paint = asyncio.Event()
+        self._generation: Optional[int] = None
+        # Rows changed after this version are merged in when another process writes
+        self._change_version = 0
+        self._data_version: Optional[int] = None
+        # A check for changes by other processes is running
+        self._checking_changes = False
+        # Batches of edits handed to the persister; merged rows read before an edit may be older than it
+        self._submit_count = 0
+        self._next_page_key = None
+        self._loading_page = False
+        # Tasks deleted here or by another process since startup; a page of tasks read before a delete reached
+        # the storage may still hold them
+        self._deleted_task_ids: Set[str] = set()
+        # Advances whenever subtasks of tasks without loaded subtasks may have changed in memory (merged changes,
+        # moves); subtasks read before that are read again
+        self._subtask_epoch = 0
+        # Task whose subtasks each view waits for, and the ids among them, for the store's thread to read
+        self._wanted_subtasks: Dict[TaskStoreView, str] = {}
+        self._wanted_task_ids: FrozenSet[str] = frozenset()
+        self._reading_subtasks: Set[str] = set()
+
+    @property
+    def loading(self) -> bool:
+        """Whether the tasks are still being read at startup."""
+        return self._loading
+
+    @property
+    def first_page_loaded(self) -> bool:
+        """Whether the first screenful of tasks has been read."""
+        return self._first_page_loaded
+
+    @property
+    def fully_loaded(self) -> bool:
+        """Whether every stored task is loaded, rather than the pages read so far."""
+        return not self._loading and self._next_page_key is None
+
+    @property
+    def pending_count(self) -> int:
+        """Number of changes not written yet."""
+        return self._persister.pending_count
+
+    def start(self) -> None:
+        """Start reading the tasks and polling for changes by other processes; later calls do nothing."""
+        if self._started:
+            return
+
+        self._started = True
+        self._persister.start()
+        self._run(self._load_tasks())
+        self._run(self._poll_changes())
+
+    def add_view(self, view: TaskStoreView) -> None:
+        self._views.append(view)
+
+    def remove_view(self, view: TaskStoreView) -> None:
+        if view in self._views:
+            self._views.remove(view)
+        self._want_subtasks(view, None)
+
+    def mark_painted(self) -> None:
+        """Tell the store that the first screenful reached a terminal, so the rest may load."""
+        self._first_paint.set()
+
+    def close(self) -> None:
+        """Write what is still pending (and a snapshot, if every task is loaded) and close the repository."""
+        if self._closed:
+            return
+
+        self._closed = True
+        for job in list(self._jobs):
+            job.cancel()
+
+        # The persister writes through the store's thread, which is still there
+        self._persister.stop()
+
+        if self.fully_loaded and self._generation is not None:
+            self._executor.submit(snapshot.write_snapshot, list(self.tasks), self._generation,
+                                  include_subtasks=False).result()
+
+        self._executor.submit(self._repository.close).result()
+        self._executor.shutdown()
+
+    # ----- Public API -----
+
+    def get(self, task_id: str) -> Optional[MainTask]:
+        return self.tasks.get(task_id)
+
+    def lookup_subtasks(self, task: MainTask) -> Optional[List[Task]]:
+        """Return the subtasks of a task if they are loaded; None if they are not, see fetch_subtasks."""
+        return self._subtask_cache.lookup(task)
+
+    def fetch_subtasks(self, task_id: str, view: TaskStoreView) -> None:
+        """Read the subtasks of a task in the background; the view is shown them once they are loaded."""
+        # A newer selection in the same view supersedes the read for the previous one
+        self._want_subtasks(view, task_id)
+        if task_id in self._reading_subtasks:
+            return
+
+        self._reading_subtasks.add(task_id)
+        self._run(self._fetch_subtasks(task_id, self._subtask_epoch))
+
+    async def fetch_task(self, task_id: str) -> Optional[MainTask]:
+        """Return a task, reading it and adding it to the tasks if it is not loaded; None if it does not exist."""
+        task = self.tasks.get(task_id)
+        if task is not None:
+            return task
+
+        # Not loaded yet; a later page load skips it as already in memory
+        task = await self._read(self._repository.load_task, task_id)
+        if task is None or self._closed:
+            return None
+        if self.tasks.has_id(task_id):
+            return self.tasks.get(task_id)
+
+        self._changes.track(task)
+        self._subtask_cache.put(task)
+        self._show_tasks(moved=(task, self.tasks.add(task)))
+        return task
+
+    def flush(self) -> None:
+        """
+        Block until every change made so far is written. Call it from a worker thread: waiting on the event
+        loop would freeze every session. Changes are handed to the persister as they are made, so none are
+        left on the loop to pass on first.
+        """
+        self._persister.flush()
+
+    def search(self, query: str, limit: int = 50) -> List[SearchResult]:
+        """Search task and subtask titles in the storage, on the store's thread; see db.search for the query syntax."""
+        return self._executor.submit(self._repository.search, query, limit).result()
+
+    def load_more(self) -> None:
+        """Read the next page of tasks, if some are not loaded and no page is being read."""
+        if self._loading or self._loading_page or self._next_page_key is None:
+            return
+
+        self._loading_page = True
+        self._run(self._load_page(self._next_page_key))
+
+    def add_task(self, task: MainTask) -> None:
+        self._changes.mark_created(task)
+        self._subtask_cache.put(task)
+        self._show_tasks(moved=(task, self.tasks.add(task)))
+
+    def add_subtask(self, task: MainTask, subtask: Task) -> None:
+        self._changes.mark_created(subtask)
+        task.add_subtask(subtask)
+        self._show_tasks()
+        self._show_subtasks({task.id})
+
+    def delete_tasks(self, tasks: Iterable[MainTask]) -> None:
+        deleted_ids = set()
+        for task in tasks:
+            deleted_ids.add(task.id)
+            self._changes.mark_deleted(task)
+            self._subtask_cache.invalidate(task.id)
+
+        self._deleted_task_ids.update(deleted_ids)
+        self.tasks.remove_ids(deleted_ids)
+        self._show_tasks(deleted_ids=deleted_ids)
+
+    def delete_subtasks(self, task: MainTask, subtask_ids: Iterable[str]) -> None:
+        for subtask in task.remove_subtasks(subtask_ids):
+            self._changes.mark_deleted(subtask)
+
+        self._show_tasks()
+        self._show_subtasks({task.id})
+
+    def tasks_changed(self, changed: Iterable[MainTask]) -> None:
+        """Save and show tasks whose fields were set; only they move, the rest of the tasks stay in order."""
+        changed = list(changed)
+        moved = None
+        for task in changed:
+            index = self.tasks.reposition(task)
+            if len(changed) == 1:
+                moved = (task, index)
+
+        self._show_tasks(moved=moved)
+
+    def subtasks_changed(self, task: MainTask) -> None:
+        """Save and show subtasks of a task whose fields were set."""
+        task.subTasks = sort_subtasks(task.subTasks)
+        self._show_tasks()
+        self._show_subtasks({task.id})
+
+    def move_subtasks(self, source: MainTask, subtask_ids: Iterable[str], target: MainTask) -> List[Task]:
+        """Move subtasks of one task to another and return them."""
+        moved = source.remove_subtasks(subtask_ids)
+        for subtask in moved:
+            subtask.task_id = target.id
+
+        if self._subtask_cache.lookup(target) is not None:
+            target.subTasks = sort_subtasks(target.subTasks + moved)
+        else:
+            # The moved subtasks are read with the others when the target is selected
+            completed = sum(1 for subtask in moved if subtask.is_completed())
+            target.set_subtask_counts(target.completed_subtask_count + completed, target.subtask_count + len(moved))
+            self._subtask_epoch += 1
+
+        self._show_tasks()
+        self._show_subtasks({source.id, target.id})
+        return moved
+
+    # ----- Internal helpers -----
+
+    def _run(self, job: Awaitable) -> None:
+        task = asyncio.ensure_future(job)
+        self._jobs.add(task)
+        task.add_done_callback(self._job_done)
+
+    def _job_done(self, job: asyncio.Task) -> None:
+        self._jobs.discard(job)
+        if job.cancelled() or job.exception() is None:
+            return
+
+        print(f"Error: {job.exception()}.")
+        for view in list(self._views):
+            view.show_error(job.exception())
+
+    async def _read(self, read: Callable[..., T], *args, **kwargs) -> T:
+        """Run a call to the repository on the store's thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor,
+                                                                functools.partial(read, *args, **kwargs))
+
+    def _commit(self) -> None:
+        if self._changes.has_changes():
+            self._persister.submit(self._changes.flush())
+            self._submit_count += 1
+
+    def _show_tasks(self, moved: Optional[Tuple[MainTask, int]] = None, deleted_ids: Iterable[str] = ()) -> None:
+        self._commit()
+        deleted_ids = set(deleted_ids)
+        for view in list(self._views):
+            view.show_tasks(moved, deleted_ids)
+
+    def _show_subtasks(self, task_ids: Set[str]) -> None:
+        self._commit()
+        for view in list(self._views):
+            view.show_subtasks(task_ids)
+
+    def _want_subtasks(self, view: TaskStoreView, task_id: Optional[str]) -> None:
+        if task_id is None:
+            self._wanted_subtasks.pop(view, None)
+        else:
+            self._wanted_subtasks[view] = task_id
+        # Replaced rather than changed, as the store's thread reads it
+        self._wanted_task_ids = frozenset(self._wanted_subtasks.values())
+
+    async def _load_tasks(self) -> None:
+        """Show the first screenful of tasks, then stream in the rest of the snapshot when there is a current one."""
+        # Opening the database may migrate it or import the JSON file first
+        generation = await self._read(self._repository.get_generation)
+        change_version = await self._read(self._repository.get_change_version)
+
+        page = await self._read(self._repository.load_tasks_page, limit=self.FIRST_PAINT_SIZE, include_subtasks=False)
+        self._first_page_loaded = True
+        if not self._add_loaded_tasks(page.tasks):
+            # Still takes down the loading indicator, and lets the views paint
+            self._show_tasks()
+
+        # Let the first screenful reach the terminal before the next chunk keeps the event loop busy
+        await self._first_paint.wait()
+
+        tasks = await self._read(snapshot.read_snapshot, generation=generation) if generation is not None else None
+        if tasks is None:
+            next_page_key = page.next_key
+            if next_page_key is not None:
+                # The rest of the first page; later pages load on demand as the user scrolls
+                page = await self._read(self._repository.load_tasks_page, next_page_key,
+                                        self.PAGE_SIZE - self.FIRST_PAINT_SIZE, include_subtasks=False)
+                next_page_key = page.next_key
+                self._add_loaded_tasks(page.tasks)
+        else:
+            next_page_key = None
+            for start in range(0, len(tasks), self.LOAD_CHUNK_SIZE):
+                self._add_loaded_tasks(tasks[start:start + self.LOAD_CHUNK_SIZE])
+                await asyncio.sleep(0)
+
+        self._finish_loading(generation, change_version, next_page_key)
+
+    def _add_loaded_tasks(self, tasks: List[MainTask]) -> bool:
+        # Tasks already in memory (the first screenful, or found through search) may be newer than these
+        new_tasks = [task for task in tasks if not self.tasks.has_id(task.id)]
+        if not new_tasks:
+            return False
+
+        self._changes.track_all(new_tasks)
+        self.tasks.add_all(new_tasks)
+        self._show_tasks()
+        return True
+
+    def _finish_loading(self, generation: Optional[int], change_version: int, next_page_key: Optional[Tuple]) -> None:
+        self._loading = False
+        self._next_page_key = next_page_key
+        self._generation = generation
+        self._change_version = change_version
+
+        # Merge whatever was written while loading, by this process or another; this also drops snapshot
+        # tasks deleted in the meantime
+        self._data_version = None
+        self._check_external_changes()
+        # Lets the lists ask for the next page again, if they asked while loading
+        self._show_tasks()
+
+    async def _load_page(self, page_key: Tuple) -> None:
+        try:
+            page = await self._read(self._repository.load_tasks_page, page_key, self.PAGE_SIZE, include_subtasks=False)
+        finally:
+            self._loading_page = False
+
+        self._add_page(page)
+
+    def _add_page(self, page: TaskPage) -> None:
+        self._next_page_key = page.next_key
+
+        # Tasks edited past the end of the loaded window are already in memory, in a newer version, and tasks
+        # deleted here may not be deleted in the storage yet; unsaved changes need not be flushed first
+        new_tasks = [task for task in page.tasks
+                     if not self.tasks.has_id(task.id) and task.id not in self._deleted_task_ids]
+        self._changes.track_all(new_tasks)
+        self.tasks.add_all(new_tasks)
+        # Also lets the lists ask again when nothing was new
+        self._show_tasks()
+
+    async def _fetch_subtasks(self, task_id: str, epoch: int) -> None:
+        try:
+            subtasks = await self._read(self._read_wanted_subtasks, task_id)
+        finally:
+            self._reading_subtasks.discard(task_id)
+
+        if subtasks is not None:
+            self._add_subtasks(task_id, subtasks, epoch)
+
+    def _read_wanted_subtasks(self, task_id: str) -> Optional[List[Task]]:
+        """Runs on the store's thread: read the subtasks of a task, unless no view waits for them any more."""
+        if task_id not in self._wanted_task_ids:
+            return None
+
+        return self._load_subtasks(task_id)
+
+    def _add_subtasks(self, task_id: str, subtasks: List[Task], epoch: int) -> None:
+        task = self.tasks.get(task_id)
+        if task is None or task_id in self._subtask_cache:
+            return
+
+        if epoch != self._subtask_epoch:
+            # They may have changed in memory while being read
+            if task_id in self._wanted_task_ids:
+                self._reading_subtasks.add(task_id)
+                self._run(self._fetch_subtasks(task_id, self._subtask_epoch))
+            return
+
+        # Subtasks added while these were read are kept
+        loaded_ids = {subtask.id for subtask in subtasks}
+        subtasks += [subtask for subtask in task.subTasks if subtask.id not in loaded_ids]
+
+        self._changes.track_all(subtasks)
+        task.subTasks = sort_subtasks(subtasks)
+        self._subtask_cache.put(task)
+        self._show_subtasks({task_id})
+
+    def _load_subtasks(self, task_id: str) -> List[Task]:
+        """Read the subtasks of a task, with the changes still waiting for the persister laid over them."""
+        # Taken before the read: each pending change is either still pending or stored by the time of the read
+        pending = self._persister.pending_changes()
+        subtasks = {subtask.id: subtask for subtask in self._repository.load_subtasks_for_task(task_id)}
+
+        for subtask_id in pending.deleted_subtask_ids:
+            subtasks.pop(subtask_id, None)
+        for subtask in pending.created_subtasks:
+            if subtask.task_id == task_id:
+                subtasks[subtask.id] = subtask
+            else:
+                # Moved to another task
+                subtasks.pop(subtask.id, None)
+
+        return sort_subtasks(subtasks.values())
+
+    def _save_changes(self, changes: ChangeSet) -> None:
+        # Runs on the persister thread, and writes on the store's thread. The in-memory tasks only match the
+        # database (and can be written to the snapshot on close) as long as no other process has written in between.
+        generation = self._executor.submit(self._repository.save_changes, changes).result()
+        if self._generation is not None and generation == self._generation + 1:
+            self._generation = generation
+        else:
+            self._generation = None
+
+        # Nothing to merge back from our own write, unless someone else wrote before it
+        if generation is not None and generation == self._change_version + 1:
+            self._change_version = generation
+
+    async def _poll_changes(self) -> None:
+        while True:
+            await asyncio.sleep(self.CHANGE_POLL_INTERVAL)
+            self._check_external_changes()
+
+    def _check_external_changes(self) -> None:
+        if self._loading or self._checking_changes:
+            return
+
+        self._checking_changes = True
+        self._run(self._read_external_changes(self._data_version, self._change_version, self._submit_count))
+
+    async def _read_external_changes(self, data_version: Optional[int], change_version: int, submit_count: int) -> None:
+        """Poll the data version, and only if it moved from data_version, merge the rows written after change_version."""
+        try:
+            version = await self._read(self._repository.get_data_version)
+            if version == data_version:
+                return
+
+            # Our own writes are not waited for: rows with changes still pending here are older than those
+            # changes, so they are left out. Taken before the read, like in _load_subtasks.
+            pending = self._persister.pending_changes()
+            changes = await self._read(self._repository.load_changes, change_version)
+            has_generation = await self._read(self._repository.get_generation) is not None
+        finally:
+            self._checking_changes = False
+
+        if self._changes.has_changes() or submit_count != self._submit_count:
+            # Edits made while the rows were read may be newer than them; read again on the next tick
+            return
+
+        self._data_version = version
+        # The persister moves it past our own writes, which may already be beyond what was read
+        self._change_version = max(self._change_version, changes.version)
+
+        changes = self._without_pending(changes, pending)
+        if changes.is_empty():
+            return
+
+        self._merge_changes(changes)
+
+        # The loaded tasks match the stored ones again
+        if has_generation:
+            self._generation = changes.version
+
+    def _merge_changes(self, changes: ChangedRows) -> None:
+        # Only tasks with loaded subtasks get their subtask rows below
+        self._subtask_epoch += 1
+        deleted_ids = set(changes.deleted_task_ids)
+        new_tasks = []
+        modified = []
+
+        with self._changes.paused():
+            for row in changes.tasks:
+                task = self.tasks.get(row.id)
+                if task is None:
+                    # Tasks past the end of the loaded window arrive with a later page
+                    if self._next_page_key is None or not self.tasks or row < self.tasks[-1]:
+                        self._changes.track(row)
+                        new_tasks.append(row)
+                    continue
+
+                task.title = row.title
+                task.state = row.state
+                task.importance = row.importance
+                modified.append(task)
+                if task.id not in self._subtask_cache:
+                    task.set_subtask_counts(row.completed_subtask_count, row.subtask_count)
+
+            # Only tasks with loaded subtasks need their lists updated; the others got new counts above
+            loaded = {task.id: task for task in self._subtask_cache.loaded_tasks() if self.tasks.get(task.id) is task}
+            owners = {subtask.id: task for task in loaded.values() for subtask in task.subTasks}
+            changed = set()
+
+            for subtask_id, task_id in changes.deleted_subtasks.items():
+                task = owners.get(subtask_id)
+                if task is not None:
+                    task.remove_subtasks([subtask_id])
+                    changed.add(task.id)
+
+            for row in changes.subtasks:
+                old_owner = owners.get(row.id)
+                new_owner = loaded.get(row.task_id)
+
+                if old_owner is not None and old_owner is new_owner:
+                    subtask = old_owner.get_subtask(row.id)
+                    subtask.title = row.title
+                    subtask.state = row.state
+                else:
+                    if old_owner is not None:
+                        old_owner.remove_subtasks([row.id])
+                        changed.add(old_owner.id)
+                    if new_owner is not None:
+                        self._changes.track(row)
+                        new_owner.add_subtask(row)
+
+                if new_owner is not None:
+                    changed.add(new_owner.id)
+
+            for task_id in changed:
+                loaded[task_id].subTasks = sort_subtasks(loaded[task_id].subTasks)
+
+        self._deleted_task_ids.update(deleted_ids)
+        for task_id in deleted_ids:
+            self._subtask_cache.invalidate(task_id)
+
+        # The lists keep their highlight by id, so the selection survives the refresh
+        self.tasks.remove_ids(deleted_ids)
+        for task in modified:
+            if task.id not in deleted_ids:
+                self.tasks.reposition(task)
+        self.tasks.add_all(new_tasks)
+
+        self._show_tasks(deleted_ids=deleted_ids)
+        if changed:
+            self._show_subtasks(changed)
+
+    @staticmethod
+    def _without_pending(changes: ChangedRows, pending: ChangeSet) -> ChangedRows:
+        """Leave out the rows of changes that have changes of our own still waiting to be written."""
+        task_ids = {task.id for task in pending.created_tasks}.union(pending.deleted_task_ids)
+        subtask_ids = {subtask.id for subtask in pending.created_subtasks}.union(pending.deleted_subtask_ids)
+        if not task_ids and not subtask_ids:
+            return changes
+
+        return ChangedRows(
+            tasks=[task for task in changes.tasks if task.id not in task_ids],
+            subtasks=[subtask for subtask in changes.subtasks if subtask.id not in subtask_ids],
+            deleted_task_ids=[task_id for task_id in changes.deleted_task_ids if task_id not in task_ids],
+            deleted_subtasks={subtask_id: task_id for subtask_id, task_id in changes.deleted_subtasks.items()
+                              if subtask_id not in subtask_ids},
+            version=changes.version,
+        )
@@ -0,0 +1,243 @@
+import atexit
+import dataclasses
+import threading
+import time
+
+from typing import Callable, Dict, Optional
+
+from models import ChangeSet, MainTask, Task
+
+
+class WriteBehindPersister:
+    """
+    Persists ChangeSets on a background thread.
+
+    Submitted changes are coalesced per task id and written in one batch once the oldest pending change
+    is flush_interval seconds old or max_batch entities are pending. submit() blocks while max_pending
+    entities are waiting, so a stalled disk slows the caller down instead of growing the queue forever.
+
+    The owner should call stop() when it is done. If the interpreter exits first, stop() still runs from an
+    atexit hook, so pending changes are written before the (daemon) thread is killed.
+    """
+
+    def __init__(self,
+                 save: Callable[[ChangeSet], None],
+                 flush_interval: float = 0.5,
+                 max_batch: int = 500,
+                 max_pending: int = 20000):
+        self._save = save
+        self._flush_interval = flush_interval
+        self._max_batch = max_batch
+        self._max_pending = max_pending
+
+        self._condition = threading.Condition()
+        self._upserted_tasks: Dict[str, MainTask] = {}
+        self._upserted_subtasks: Dict[str, Task] = {}
+        self._deleted_task_ids: Dict[str, None] = {}
+        self._deleted_subtask_ids: Dict[str, None] = {}
+        self._first_pending_at: Optional[float] = None
+        # The batch being written, and how many entities it holds
+        self._batch: Optional[ChangeSet] = None
+        self._writing = 0
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def pending_count(self) -> int:
+        """Number of entities waiting to be written, including the batch currently being written."""
+        with self._condition:
+            return self._pending_count_locked() + self._writing
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="write-behind-persister", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Write everything still pending and stop the background thread."""
+        if self._thread is None:
+            return
+
+        atexit.unregister(self.stop)
+
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+
+        self._thread.join()
+        self._thread = None
+
+    def flush(self) -> None:
+        """Block until everything submitted so far has been written."""
+        with self._condition:
+            if self._thread is None:
+                if self._pending_count_locked() > 0:
+                    self._save(self._take_batch_locked())
+                return
+
+            self._first_pending_at = 0.0 if self._pending_count_locked() else None
+            self._condition.notify_all()
+
+            while self._pending_count_locked() + self._writing > 0 and self._thread.is_alive():
+                self._condition.wait(self._flush_interval)
+
+    def pending_changes(self) -> ChangeSet:
+        """
+        Return copies of the changes not written yet, including the batch being written, without waiting.
+
+        Take this before reading the storage and lay it over what was read: whatever was pending then is
+        either still pending or already stored by the time of the read. Upserts are returned as created_tasks
+        and created_subtasks, one per id with its latest submitted fields.
+        """
+        with self._condition:
+            queued = ChangeSet(created_tasks=list(self._upserted_tasks.values()),
+                               created_subtasks=list(self._upserted_subtasks.values()),
+                               deleted_task_ids=list(self._deleted_task_ids),
+                               deleted_subtask_ids=list(self._deleted_subtask_ids))
+            batches = [self._batch, queued] if self._batch is not None else [queued]
+
+        upserted_tasks: Dict[str, MainTask] = {}
+        upserted_subtasks: Dict[str, Task] = {}
+        deleted_task_ids: Dict[str, None] = {}
+        deleted_subtask_ids: Dict[str, None] = {}
+        for batch in batches:
+            _coalesce(batch, upserted_tasks, upserted_subtasks, deleted_task_ids, deleted_subtask_ids)
+
+        return ChangeSet(created_tasks=list(upserted_tasks.values()),
+                         created_subtasks=list(upserted_subtasks.values()),
+                         deleted_task_ids=list(deleted_task_ids),
+                         deleted_subtask_ids=list(deleted_subtask_ids))
+
+    def submit(self, changes: ChangeSet) -> None:
+        """Queue changes for writing. Field values are captured now, so later edits are picked up by later submits."""
+        if changes.is_empty():
+            return
+
+        with self._condition:
+            while self._pending_count_locked() >= self._max_pending and not self._stopping:
+                self._condition.wait()
+
+            _coalesce(changes, self._upserted_tasks, self._upserted_subtasks,
+                      self._deleted_task_ids, self._deleted_subtask_ids)
+
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+
+            self._condition.notify_all()
+
+    # ----- Internal helpers -----
+
+    def _pending_count_locked(self) -> int:
+        return (len(self._upserted_tasks) + len(self._upserted_subtasks)
+                + len(self._deleted_task_ids) + len(self._deleted_subtask_ids))
+
+    def _take_batch_locked(self) -> ChangeSet:
+        # Upserts are applied before deletes by the backends, so a subtask queued for a task that was
+        # deleted later is still removed by the task's delete.
+        batch = ChangeSet(
+            created_tasks=list(self._upserted_tasks.values()),
+            created_subtasks=list(self._upserted_subtasks.values()),
+            deleted_task_ids=list(self._deleted_task_ids),
+            deleted_subtask_ids=list(self._deleted_subtask_ids),
+        )
+
+        self._upserted_tasks = {}
+        self._upserted_subtasks = {}
+        self._deleted_task_ids = {}
+        self._deleted_subtask_ids = {}
+        self._first_pending_at = None
+
+        return batch
+
+    def _requeue_locked(self, batch: ChangeSet) -> None:
+        # Anything submitted while the batch was being written is newer and wins
+        for task in batch.created_tasks:
+            if task.id not in self._upserted_tasks and task.id not in self._deleted_task_ids:
+                self._upserted_tasks[task.id] = task
+
+        for subtask in batch.created_subtasks:
+            if subtask.id not in self._upserted_subtasks and subtask.id not in self._deleted_subtask_ids:
+                self._upserted_subtasks[subtask.id] = subtask
+
+        for task_id in batch.deleted_task_ids:
+            if task_id not in self._upserted_tasks:
+                self._deleted_task_ids[task_id] = None
+
+        for subtask_id in batch.deleted_subtask_ids:
+            if subtask_id not in self._upserted_subtasks:
+                self._deleted_subtask_ids[subtask_id] = None
+
+        if self._first_pending_at is None:
+            self._first_pending_at = time.monotonic()
+
+    def _is_due_locked(self) -> bool:
+        if self._first_pending_at is None:
+            return False
+
+        return (self._stopping
+                or self._pending_count_locked() >= self._max_batch
+                or time.monotonic() - self._first_pending_at >= self._flush_interval)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._is_due_locked():
+                    if self._stopping:
+                        return
+
+                    timeout = None
+                    if self._first_pending_at is not None:
+                        timeout = max(0.0, self._first_pending_at + self._flush_interval - time.monotonic())
+                    self._condition.wait(timeout)
+
+                batch = self._take_batch_locked()
+                self._batch = batch
+                self._writing = (len(batch.created_tasks) + len(batch.created_subtasks)
+                                 + len(batch.deleted_task_ids) + len(batch.deleted_subtask_ids))
+
+            try:
+                self._save(batch)
+                failed = False
+            except Exception as err:
+                print(f"Error: {err}. Retrying write of {self._writing} pending changes.")
+                failed = True
+
+            with self._condition:
+                if failed:
+                    self._requeue_locked(batch)
+                self._batch = None
+                self._writing = 0
+                self._condition.notify_all()
+
+            if failed:
+                if self._stopping:
+                    # The disk keeps failing; do not spin forever on shutdown
+                    return
+                time.sleep(self._flush_interval)
+
+
+def _coalesce(changes: ChangeSet,
+              upserted_tasks: Dict[str, MainTask],
+              upserted_subtasks: Dict[str, Task],
+              deleted_task_ids: Dict[str, None],
+              deleted_subtask_ids: Dict[str, None]) -> None:
+    """Fold copies of changes into pending upserts and deletes by id; a later change of an id replaces an earlier one."""
+    for task in changes.created_tasks + changes.modified_tasks:
+        deleted_task_ids.pop(task.id, None)
+        upserted_tasks[task.id] = dataclasses.replace(task, subTasks=[])
+
+    for subtask in changes.created_subtasks + changes.modified_subtasks:
+        deleted_subtask_ids.pop(subtask.id, None)
+        upserted_subtasks[subtask.id] = dataclasses.replace(subtask)
+
+    for task_id in changes.deleted_task_ids:
+        upserted_tasks.pop(task_id, None)
+        deleted_task_ids[task_id] = None
+
+    for subtask_id in changes.deleted_subtask_ids:
+        upserted_subtasks.pop(subtask_id, None)
+        deleted_subtask_ids[subtask_id] = None
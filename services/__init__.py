@@ -0,0 +1,7 @@
+from .TaskRepository import BACKENDS, DEFAULT_BACKEND, create_repository
+
+__all__ = [
+    "BACKENDS",
+    "DEFAULT_BACKEND",
+    "create_repository",
+]
@@ -0,0 +1,79 @@
+import sqlite3
+import threading
+
+from typing import Dict, List
+
+# Statements cached per connection by the sqlite3 module. The storage layer uses a
+# small, fixed set of queries, so this keeps every one of them prepared.
+CACHED_STATEMENTS = 256
+
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+]
+
+_local = threading.local()
+_all_connections: List[sqlite3.Connection] = []
+_all_connections_lock = threading.Lock()
+
+
+def get_connection(db_path: str) -> sqlite3.Connection:
+    """Return the long-lived connection to db_path owned by the calling thread, opening it if needed."""
+    connections: Dict[str, sqlite3.Connection] = getattr(_local, "connections", None)
+    if connections is None:
+        connections = {}
+        _local.connections = connections
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = open_connection(db_path)
+        connections[db_path] = conn
+
+        with _all_connections_lock:
+            _all_connections.append(conn)
+
+    return conn
+
+
+def open_connection(db_path: str) -> sqlite3.Connection:
+    """Open a new connection to db_path with the tuned pragmas applied."""
+    conn = sqlite3.connect(db_path, cached_statements=CACHED_STATEMENTS)
+
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+
+    return conn
+
+
+def close_connection(db_path: str) -> None:
+    """Close the calling thread's connection to db_path, if any."""
+    connections: Dict[str, sqlite3.Connection] = getattr(_local, "connections", None)
+    if connections is None or db_path not in connections:
+        return
+
+    conn = connections.pop(db_path)
+    with _all_connections_lock:
+        if conn in _all_connections:
+            _all_connections.remove(conn)
+
+    conn.close()
+
+
+def close_all_connections() -> None:
+    """Close every connection opened through this module, in all threads."""
+    with _all_connections_lock:
+        connections = list(_all_connections)
+        _all_connections.clear()
+
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.ProgrammingError:
+            # Connections owned by another thread can only be closed there; they are
+            # released when that thread exits.
+            pass
+
+    _local.connections = {}
@@ -1,107 +1,556 @@
+import hashlib
+import json
+import pathlib
 import sqlite3
+import threading
 
-from typing import List
+from dataclasses import dataclass
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from models import MainTask, Task
-from tbe_todo_utils import load_tasks as load_tasks_from_json
+from models import ChangeSet, MainTask, Task
+from models.enums import TaskImportance, TaskState
+from services import migrations
+from services.connection import get_connection
+import tbe_todo_utils
 
 db_name = "todo_list.db"
 
+# Rows per executemany call when importing or saving in bulk
+IMPORT_CHUNK_SIZE = 1000
+
+# Rows fetched per round trip when streaming rows out
+STREAM_BATCH_SIZE = 1000
+
+# table_versions entry recording the last imported JSON file
+JSON_IMPORT_RECORD = "json_import"
+
+# table_versions entry counting committed writes to tasks and subtasks
+GENERATION_RECORD = "data_generation"
+
+# table_versions entry holding a random id of this database, set when it is created
+DATABASE_ID_RECORD = "database_id"
+
+# Integer codes stored for states and importances. A code never changes meaning; new members get new codes.
+# Importance codes are in display order, so the display order index can use the column itself.
+STATE_CODES = {TaskState.NEW: 0, TaskState.STARTED: 1, TaskState.FINALISING: 2, TaskState.COMPLETED: 3}
+IMPORTANCE_CODES = {TaskImportance.CRITICAL: 0, TaskImportance.HIGH: 1, TaskImportance.MEDIUM: 2,
+                    TaskImportance.LOW: 3, TaskImportance.NEGLIGIBLE: 4}
+# The members by code
+STATES_BY_CODE = tuple(sorted(STATE_CODES, key=STATE_CODES.get))
+IMPORTANCES_BY_CODE = tuple(sorted(IMPORTANCE_CODES, key=IMPORTANCE_CODES.get))
+
+# Display order, served by the idx_tasks_display_order and idx_subtasks_display_order indexes (the latter
+# after s.task_key, for subtasks aliased as s). Ties keep insertion order, like the stable sorts in Python did.
+TASK_ORDER = "completed, importance, title, key"
+SUBTASK_ORDER = "s.completed, s.title, s.key"
+
+# Columns read by _task_from_row
+TASK_COLUMNS = "id, title, state, importance, subtask_count, completed_subtask_count"
+
+# Subtask columns read by _subtask_from_row, for subtasks aliased as s joined to their task as t. Loaders that
+# know the tasks' keys already read SUBTASK_KEY_COLUMNS and skip the join.
+SUBTASK_COLUMNS = "s.id, t.id, s.title, s.state"
+SUBTASK_KEY_COLUMNS = "s.id, s.task_key, s.title, s.state"
+SUBTASKS_WITH_TASK = "subtasks s JOIN tasks t ON t.key = s.task_key"
+
+# Row version of everything written in the current transaction: the generation it commits as (see _bump_generation)
+NEXT_GENERATION = f"(SELECT version + 1 FROM table_versions WHERE table_name = '{GENERATION_RECORD}')"
+
+# Upserts update rows in place, unlike INSERT OR REPLACE, so keys stay stable and update triggers fire. They
+# take the rows of _task_row and _subtask_row. A subtask whose task is not stored is not written.
+TASK_UPSERT = f"""
+    INSERT INTO tasks (id, title, state, importance, version) VALUES (?, ?, ?, ?, {NEXT_GENERATION})
+    ON CONFLICT (id) DO UPDATE SET title=excluded.title, state=excluded.state, importance=excluded.importance,
+                                   version=excluded.version
+"""
+SUBTASK_UPSERT = f"""
+    INSERT INTO subtasks (id, task_key, title, state, version)
+    SELECT ?1, key, ?3, ?4, {NEXT_GENERATION} FROM tasks WHERE id = ?2
+    ON CONFLICT (id) DO UPDATE SET task_key=excluded.task_key, title=excluded.title, state=excluded.state,
+                                   version=excluded.version
+"""
+
+# Deletes the subtasks of a task by its id; they go before the task, whose id their tombstones record
+SUBTASKS_OF_TASK_DELETE = "DELETE FROM subtasks WHERE task_key = (SELECT key FROM tasks WHERE id = ?)"
+
+_init_lock = threading.RLock()
+_initialized_db_name: Optional[str] = None
+_initializing = False
+
+def _connection() -> sqlite3.Connection:
+    """Return the calling thread's long-lived connection to the application database, initializing it on first use."""
+    global _initialized_db_name, _initializing
+
+    if _initialized_db_name != db_name:
+        with _init_lock:
+            # The lock is reentrant, so the initialization below can use this function itself
+            if _initialized_db_name != db_name and not _initializing:
+                _initializing = True
+                try:
+                    init_db()
+                    migrate_from_json()
+                finally:
+                    _initializing = False
+                _initialized_db_name = db_name
+
+    return get_connection(db_name)
+
 def init_db() -> None:
-    """Initialize the SQLite database for the application."""
+    """Initialize the SQLite database for the application, applying any pending migrations."""
+    migrations.run_migrations(_connection())
+
+def migrate_from_json() -> bool:
+    """
+    Import the JSON todo file into an empty SQLite database. The database is the store of record, so the file
+    is imported at most once: not after any earlier import, and not over tasks already stored, since its rows
+    would overwrite newer ones.
+    :return: True if the file was imported
+    """
+    path = pathlib.Path(tbe_todo_utils.TODO_FILE)
+    if not path.exists() or _get_json_import_hash() is not None or _has_tasks():
+        return False
+
+    source_hash = _hash_file(path)
+
+    task_count = 0
+    subtask_count = 0
+
+    try:
+        with _connection() as conn:
+            cursor = conn.cursor()
+
+            for chunk in _chunked(tbe_todo_utils.iter_tasks(path), IMPORT_CHUNK_SIZE):
+                for task in chunk:
+                    for subtask in task.subTasks:
+                        if subtask.task_id is None or len(subtask.task_id.strip()) == 0:
+                            subtask.task_id = task.id
+
+                cursor.executemany(TASK_UPSERT, [_task_row(t.id, t.title, t.state, t.importance) for t in chunk])
+                cursor.executemany(SUBTASK_UPSERT, [_subtask_row(s.id, s.task_id, s.title, s.state)
+                                                    for t in chunk for s in t.subTasks])
+
+                task_count += len(chunk)
+                subtask_count += sum(len(t.subTasks) for t in chunk)
+
+            _bump_generation(cursor)
+            cursor.execute("""
+                INSERT OR REPLACE INTO table_versions (table_name, version, source_hash, task_count, subtask_count)
+                VALUES (?, ?, ?, ?, ?)
+            """, (JSON_IMPORT_RECORD, 1, source_hash, task_count, subtask_count))
+    except (json.JSONDecodeError, TypeError, KeyError, ValueError) as err:
+        print(f"Error: {err}. Unable to import {path}.")
+        return False
+
+    return True
+
+def _get_json_import_hash() -> Optional[str]:
+    with _connection() as conn:
+        row = conn.execute("SELECT source_hash FROM table_versions WHERE table_name=?", (JSON_IMPORT_RECORD,)).fetchone()
+
+        return row[0] if row else None
+
+def _has_tasks() -> bool:
+    with _connection() as conn:
+        return conn.execute("SELECT 1 FROM tasks LIMIT 1").fetchone() is not None
+
+def _hash_file(path: pathlib.Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+def _chunked(rows: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(rows)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+def load_tasks(include_subtasks: bool = True) -> List[MainTask]:
+    """Load tasks from the SQLite database, in display order (see MainTask.__lt__)."""
+    with _connection() as conn:
+        cursor = conn.cursor()
 
-    with sqlite3.connect(db_name) as conn:
+        cursor.execute(f"SELECT {TASK_COLUMNS}, key FROM tasks ORDER BY {TASK_ORDER}")
+        tasks_by_key = {row[6]: _task_from_row(row) for row in cursor}
+
+        if include_subtasks:
+            _attach_subtasks(cursor, tasks_by_key)
+
+        return list(tasks_by_key.values())
+
+@dataclass
+class TaskPage:
+    """One page of tasks in display order, as returned by load_tasks_page."""
+    tasks: List[MainTask]
+    # Pass as after_key to get the following page; None on the last page
+    next_key: Optional[Tuple]
+
+def load_tasks_page(after_key: Optional[Tuple] = None,
+                    limit: int = 200,
+                    states: Optional[Iterable[TaskState]] = None,
+                    importances: Optional[Iterable[TaskImportance]] = None,
+                    include_subtasks: bool = True,
+                    with_open_subtasks: bool = False) -> TaskPage:
+    """
+    Load one page of tasks in display order, seeking past after_key through the display order index
+    :param after_key: next_key of the previous page, or None for the first page
+    :param limit: Maximum number of tasks in the page
+    :param states: Only include tasks in one of these states
+    :param importances: Only include tasks with one of these importances
+    :param include_subtasks: Attach subtask lists; the progress counters are set either way
+    :param with_open_subtasks: Only include tasks with at least one subtask that is not completed
+    """
+    conditions = []
+    params: List = []
+
+    if after_key is not None:
+        conditions.append("(completed, importance, title, key) > (?, ?, ?, ?)")
+        params.extend(after_key)
+
+    for column, values, codes in [("state", states, STATE_CODES), ("importance", importances, IMPORTANCE_CODES)]:
+        if values is not None:
+            values = [codes[value] for value in values]
+            conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+
+    if with_open_subtasks:
+        # Matches the idx_tasks_open_subtasks partial index
+        conditions.append("subtask_count > completed_subtask_count")
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with _connection() as conn:
+        cursor = conn.cursor()
+
+        # One extra row tells whether there is a next page
+        cursor.execute(f"""
+            SELECT {TASK_COLUMNS}, completed, key FROM tasks
+            {where} ORDER BY {TASK_ORDER} LIMIT ?
+        """, params + [limit + 1])
+        rows = cursor.fetchall()
+
+        next_key = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_key = (rows[-1][6], rows[-1][3], rows[-1][1], rows[-1][7])
+
+        tasks_by_key = {row[7]: _task_from_row(row) for row in rows}
+
+        if tasks_by_key and include_subtasks:
+            placeholders = ", ".join("?" * len(tasks_by_key))
+            cursor.execute(f"""
+                SELECT {SUBTASK_KEY_COLUMNS} FROM subtasks s
+                WHERE s.task_key IN ({placeholders}) ORDER BY s.task_key, {SUBTASK_ORDER}
+            """, list(tasks_by_key))
+            _assign_subtasks(cursor, tasks_by_key)
+
+        return TaskPage(tasks=list(tasks_by_key.values()), next_key=next_key)
+
+@dataclass
+class SearchResult:
+    """A task or subtask whose title matched a search."""
+    # The owning MainTask
+    task_id: str
+    # The matching subtask, or None if the task itself matched
+    subtask_id: Optional[str]
+    title: str
+    # bm25 score; lower is a better match
+    rank: float
+
+def search(query: str, limit: int = 50) -> List[SearchResult]:
+    """
+    Full-text search over task and subtask titles, best matches first.
+    Words match as prefixes ("rep" finds "report"); text in double quotes matches as a phrase.
+    """
+    match = _to_fts_query(query)
+    if match is None:
+        return []
+
+    with _connection() as conn:
         cursor = conn.cursor()
 
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS table_versions (
-                table_name TEXT PRIMARY KEY,
-                version INTEGER NOT NULL
+            SELECT * FROM (
+                SELECT t.id, NULL, t.title, tasks_fts.rank FROM tasks_fts
+                JOIN tasks t ON t.key = tasks_fts.rowid
+                WHERE tasks_fts MATCH ? ORDER BY tasks_fts.rank LIMIT ?
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT t.id, s.id, s.title, subtasks_fts.rank FROM subtasks_fts
+                JOIN subtasks s ON s.key = subtasks_fts.rowid
+                JOIN tasks t ON t.key = s.task_key
+                WHERE subtasks_fts MATCH ? ORDER BY subtasks_fts.rank LIMIT ?
             )
-        """)
+            ORDER BY 4 LIMIT ?
+        """, (match, limit, match, limit, limit))
+
+        return [SearchResult(task_id=row[0], subtask_id=row[1], title=row[2], rank=row[3]) for row in cursor]
+
+def _to_fts_query(query: str) -> Optional[str]:
+    """Turn user input into an FTS5 query: quoted parts become phrases, other words prefix searches."""
+    terms = []
+    for index, part in enumerate(query.split('"')):
+        # Odd parts were inside double quotes
+        if index % 2 == 1:
+            if part.strip():
+                terms.append(f'"{part.strip()}"')
+        else:
+            terms.extend(f'"{word}"*' for word in part.split())
+
+    return " ".join(terms) if terms else None
+
+@dataclass
+class ChangedRows:
+    """Tasks and subtasks written or deleted after some version, as returned by load_changes."""
+    # Tasks come without subtasks, with their counters set
+    tasks: List[MainTask]
+    subtasks: List[Task]
+    deleted_task_ids: List[str]
+    # Subtask id -> id of the task it belonged to
+    deleted_subtasks: Dict[str, str]
+    # Pass as since to the next load_changes
+    version: int
+
+    def is_empty(self) -> bool:
+        return not (self.tasks or self.subtasks or self.deleted_task_ids or self.deleted_subtasks)
+
+def get_data_version() -> int:
+    """
+    Get the data generation, which changes whenever anyone commits a write, and is cheap enough to poll. Unlike
+    SQLite's PRAGMA data_version, which is kept per connection, values read on different threads compare.
+    """
+    return get_generation()
+
+def load_changes(since: int) -> ChangedRows:
+    """Load the tasks and subtasks written or deleted in data generations after since."""
+    with _connection() as conn:
+        cursor = conn.cursor()
 
-        # Create or migrate tasks table
-        tasks_table_version = get_table_version("tasks")
-        if tasks_table_version < 1:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id TEXT PRIMARY KEY,
-                    title TEXT NOT NULL,
-                    state TEXT NOT NULL,
-                    importance TEXT NOT NULL
-                )
-            """)
-            set_table_version("tasks", 1)
-
-        # Create or migrate subtasks table
-        subtasks_table_version = get_table_version("subtasks")
-        if subtasks_table_version < 1:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS subtasks (
-                    id TEXT PRIMARY KEY,
-                    task_id TEXT NOT NULL,
-                    title TEXT NOT NULL,
-                    state TEXT NOT NULL
-                )
-            """)
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_subtasks_task_id ON subtasks (task_id)")
-            set_table_version("subtasks", 1)
-
-def migrate_from_json() -> None:
-    """Migrate data from JSON to SQLite database."""
-    json_tasks = load_tasks_from_json()
-
-    for task in json_tasks:
-        for subtask in task.subTasks:
-            if subtask.task_id is None or len(subtask.task_id.strip()) == 0:
-                subtask.task_id = task.id
-
-        save_task(task)
+        # Read first: rows committed in the meantime have higher versions and are simply seen again next time
+        version = _get_generation(cursor)
 
-def load_tasks(include_subtasks: bool = True) -> List[MainTask]:
-    """Load tasks from the SQLite database."""
-    with sqlite3.connect(db_name) as conn:
+        cursor.execute(f"SELECT {TASK_COLUMNS} FROM tasks WHERE version > ?", (since,))
+        tasks = [_task_from_row(row) for row in cursor]
+
+        cursor.execute(f"SELECT {SUBTASK_COLUMNS} FROM {SUBTASKS_WITH_TASK} WHERE s.version > ?", (since,))
+        subtasks = [_subtask_from_row(row) for row in cursor]
+
+        # Rows written again after they were deleted are not deleted
+        cursor.execute("""
+            SELECT d.id, d.task_id FROM deleted_rows d
+            WHERE d.version > ?
+              AND NOT EXISTS (SELECT 1 FROM tasks t WHERE t.id = d.id)
+              AND NOT EXISTS (SELECT 1 FROM subtasks s WHERE s.id = d.id)
+        """, (since,))
+        deleted_task_ids = []
+        deleted_subtasks = {}
+        for row_id, task_id in cursor:
+            if task_id is None:
+                deleted_task_ids.append(row_id)
+            else:
+                deleted_subtasks[row_id] = task_id
+
+        return ChangedRows(tasks=tasks, subtasks=subtasks, deleted_task_ids=deleted_task_ids,
+                           deleted_subtasks=deleted_subtasks, version=version)
+
+def load_task(task_id: str) -> Optional[MainTask]:
+    """Load a single task with its subtasks from the SQLite database."""
+    if task_id is None or len(task_id.strip()) == 0:
+        raise ValueError("Task ID is required.")
+
+    with _connection() as conn:
         cursor = conn.cursor()
 
-        cursor.execute("SELECT id, title, state, importance FROM tasks")
-        db_tasks = cursor.fetchall()
+        cursor.execute(f"SELECT {TASK_COLUMNS} FROM tasks WHERE id=?", (task_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+
+        task = _task_from_row(row)
+        task.subTasks = load_subtasks_for_task(task.id)
+
+        return task
+
+def _task_from_row(row: Tuple) -> MainTask:
+    """Build a MainTask, without its subtasks, from a row starting with TASK_COLUMNS."""
+    task = MainTask(id=row[0], title=row[1], state=STATES_BY_CODE[row[2]], importance=IMPORTANCES_BY_CODE[row[3]])
+    task.set_subtask_counts(row[5], row[4])
+    return task
+
+def _subtask_from_row(row: Tuple, task_id: Optional[str] = None) -> Task:
+    """Build a Task from a row of SUBTASK_COLUMNS, sharing the task_id string if given."""
+    return Task(id=row[0], task_id=task_id or row[1], title=row[2], state=STATES_BY_CODE[row[3]])
 
-        tasks = []
-        for row in db_tasks:
-            main_task = MainTask(id=row[0], title=row[1], state=row[2], importance=row[3])
-            main_task.subTasks = load_subtasks_for_task(main_task.id) if include_subtasks else []
-            tasks.append(main_task)
+def _task_row(task_id: str, title: str, state: str, importance: str) -> Tuple:
+    """The TASK_UPSERT parameters of a task."""
+    return task_id, title, STATE_CODES[state], IMPORTANCE_CODES[importance]
 
-        return tasks
+def _subtask_row(subtask_id: str, task_id: str, title: str, state: str) -> Tuple:
+    """The SUBTASK_UPSERT parameters of a subtask."""
+    return subtask_id, task_id, title, STATE_CODES[state]
+
+def _attach_subtasks(cursor: sqlite3.Cursor, tasks_by_key: Dict[int, MainTask]) -> None:
+    """Fill in the subtasks of all given tasks, in display order, from a single scan of the subtasks table."""
+    cursor.execute(f"SELECT {SUBTASK_KEY_COLUMNS} FROM subtasks s ORDER BY s.task_key, {SUBTASK_ORDER}")
+    _assign_subtasks(cursor, tasks_by_key)
+
+def _assign_subtasks(rows: Iterable[Tuple], tasks_by_key: Dict[int, MainTask]) -> None:
+    """Give each task the subtasks among rows of SUBTASK_KEY_COLUMNS that belong to it, keeping row order."""
+    subtasks_by_key: Dict[int, List[Task]] = {key: [] for key in tasks_by_key}
+
+    for row in rows:
+        subtasks = subtasks_by_key.get(row[1])
+        if subtasks is not None:
+            # Subtasks share their task's id string rather than each holding its own copy
+            subtasks.append(_subtask_from_row(row, tasks_by_key[row[1]].id))
+
+    # Assigning whole lists links the subtasks to their task and recounts its progress
+    for key, task in tasks_by_key.items():
+        task.subTasks = subtasks_by_key[key]
 
 def load_subtasks_for_task(task_id: str) -> List[Task]:
-    """Load subtasks for a task from the SQLite database."""
+    """Load subtasks for a task from the SQLite database, in display order (see Task.__lt__)."""
     if task_id is None or len(task_id.strip()) == 0:
         raise ValueError("Task ID is required.")
 
-    with sqlite3.connect(db_name) as conn:
+    with _connection() as conn:
         cursor = conn.cursor()
 
-        cursor.execute("SELECT id, task_id, title, state FROM subtasks WHERE task_id=?", (task_id,))
+        cursor.execute(f"SELECT {SUBTASK_COLUMNS} FROM {SUBTASKS_WITH_TASK} WHERE t.id=? ORDER BY {SUBTASK_ORDER}",
+                       (task_id,))
         subtasks = cursor.fetchall()
 
-        return [Task(id=row[0], task_id=row[1], title=row[2], state=row[3]) for row in subtasks]
+        return [_subtask_from_row(row, task_id) for row in subtasks]
 
 def save_task(task: MainTask) -> None:
     """Save tasks to the SQLite database."""
     if task.id is None:
         raise ValueError("Task ID is required.")
 
-    with sqlite3.connect(db_name) as conn:
+    with _connection() as conn:
         cursor = conn.cursor()
 
-        main_task_query = "INSERT OR REPLACE INTO tasks (id, title, state, importance) VALUES (?, ?, ?, ?)"
-        params = (task.id, task.title, task.state, task.importance)
-        cursor.execute(main_task_query, params)
+        params = _task_row(task.id, task.title, task.state, task.importance)
+        cursor.execute(TASK_UPSERT, params)
+
+        params = [_subtask_row(t.id, t.task_id, t.title, t.state) for t in task.subTasks]
+        cursor.executemany(SUBTASK_UPSERT, params)
+        _bump_generation(cursor)
 
-        sub_task_query = "INSERT OR REPLACE INTO subtasks (id, task_id, title, state) VALUES (?, ?, ?, ?)"
-        params = [(t.id, t.task_id, t.title, t.state) for t in task.subTasks]
-        cursor.executemany(sub_task_query, params)
+def save_tasks(tasks: Iterable[MainTask]) -> int:
+    """
+    Save many tasks with their subtasks to the SQLite database, in one transaction.
+    :return: The data generation after the write
+    """
+    with _connection() as conn:
+        cursor = conn.cursor()
+
+        for chunk in _chunked(tasks, IMPORT_CHUNK_SIZE):
+            cursor.executemany(TASK_UPSERT, [_task_row(t.id, t.title, t.state, t.importance) for t in chunk])
+            cursor.executemany(SUBTASK_UPSERT, [_subtask_row(s.id, s.task_id, s.title, s.state)
+                                                for t in chunk for s in t.subTasks])
+
+        return _bump_generation(cursor)
+
+def save_changes(changes: ChangeSet) -> int:
+    """
+    Write only the rows touched since the last flush of a ChangeTracker, in one transaction.
+    :return: The data generation after the write
+    """
+    if changes.is_empty():
+        return get_generation()
+
+    with _connection() as conn:
+        cursor = conn.cursor()
+
+        tasks = changes.created_tasks + changes.modified_tasks
+        if tasks:
+            cursor.executemany(TASK_UPSERT, [_task_row(t.id, t.title, t.state, t.importance) for t in tasks])
+
+        # Subtasks of a task deleted by someone else in the meantime are not written; they went with it
+        subtasks = changes.created_subtasks + changes.modified_subtasks
+        if subtasks:
+            cursor.executemany(SUBTASK_UPSERT, [_subtask_row(t.id, t.task_id, t.title, t.state) for t in subtasks])
+
+        if changes.deleted_subtask_ids:
+            cursor.executemany("DELETE FROM subtasks WHERE id=?", [(i,) for i in changes.deleted_subtask_ids])
+
+        if changes.deleted_task_ids:
+            params = [(i,) for i in changes.deleted_task_ids]
+            cursor.executemany(SUBTASKS_OF_TASK_DELETE, params)
+            cursor.executemany("DELETE FROM tasks WHERE id=?", params)
+
+        return _bump_generation(cursor)
+
+def iter_task_rows() -> Iterator[Tuple[str, str, str, str]]:
+    """Stream (id, title, state, importance) of every task in display order, without building MainTask objects."""
+    cursor = _connection().cursor()
+    cursor.execute(f"SELECT id, title, state, importance FROM tasks ORDER BY {TASK_ORDER}")
+
+    while rows := cursor.fetchmany(STREAM_BATCH_SIZE):
+        for row in rows:
+            yield row[0], row[1], STATES_BY_CODE[row[2]], IMPORTANCES_BY_CODE[row[3]]
+
+def iter_subtask_rows() -> Iterator[Tuple[str, str, str, str]]:
+    """
+    Stream (id, task_id, title, state) of every subtask, grouped by task in the tasks' display order, without
+    building Task objects
+    """
+    cursor = _connection().cursor()
+    # Walks both display order indexes without sorting. Following the tasks' order rather than their keys
+    # means exporting an import of an export gives the same file.
+    cursor.execute(f"""
+        SELECT {SUBTASK_COLUMNS} FROM {SUBTASKS_WITH_TASK}
+        ORDER BY t.completed, t.importance, t.title, t.key, {SUBTASK_ORDER}
+    """)
+
+    while rows := cursor.fetchmany(STREAM_BATCH_SIZE):
+        for row in rows:
+            yield row[0], row[1], row[2], STATES_BY_CODE[row[3]]
+
+def import_rows(records: Iterable[Tuple[str, Tuple]],
+                chunk_size: int = IMPORT_CHUNK_SIZE,
+                progress: Optional[Callable[[int, int], None]] = None) -> Tuple[int, int]:
+    """
+    Upsert a stream of task and subtask rows, committing every chunk_size rows, so memory use does not grow
+    with the stream and an interrupted import keeps the chunks written so far.
+    :param records: ("task", (id, title, state, importance)) and ("subtask", (id, task_id, title, state)) pairs;
+                    a subtask's task comes before it, or is stored already
+    :param progress: Called with the number of tasks and subtasks written after every committed chunk
+    :return: Number of tasks and subtasks written
+    :raises ValueError: If a subtask's task is neither stored nor earlier in the stream; the chunks before the
+                        one holding it stay written
+    """
+    task_count = 0
+    subtask_count = 0
+
+    for chunk in _chunked(records, chunk_size):
+        task_rows = [_task_row(*row) for kind, row in chunk if kind == "task"]
+        subtask_rows = [_subtask_row(*row) for kind, row in chunk if kind == "subtask"]
+
+        with _connection() as conn:
+            cursor = conn.cursor()
+            # Tasks first, so their subtasks in the same chunk find them
+            cursor.executemany(TASK_UPSERT, task_rows)
+            cursor.executemany(SUBTASK_UPSERT, subtask_rows)
+            if cursor.rowcount < len(subtask_rows):
+                _raise_for_orphan(cursor, subtask_rows)
+            _bump_generation(cursor)
+
+        task_count += len(task_rows)
+        subtask_count += len(subtask_rows)
+        if progress is not None:
+            progress(task_count, subtask_count)
+
+    return task_count, subtask_count
+
+def _raise_for_orphan(cursor: sqlite3.Cursor, subtask_rows: List[Tuple]) -> None:
+    for subtask_id, task_id, _, _ in subtask_rows:
+        if cursor.execute("SELECT 1 FROM tasks WHERE id=?", (task_id,)).fetchone() is None:
+            raise ValueError(f"Subtask {subtask_id} belongs to task {task_id}, which is not stored")
 
 def save_subtask(subtask: Task) -> None:
     """Save subtasks to the SQLite database."""
@@ -111,36 +560,58 @@ def save_subtask(subtask: Task) -> None:
     if subtask.task_id is None or len(subtask.task_id.strip()) == 0:
         raise ValueError("Task ID is required.")
 
-    with sqlite3.connect(db_name) as conn:
+    with _connection() as conn:
         cursor = conn.cursor()
 
-        cursor.execute("INSERT OR REPLACE INTO subtasks (id, task_id, title, state) VALUES (?, ?, ?, ?)",
-                       (subtask.id, subtask.task_id, subtask.title, subtask.state))
+        cursor.execute(SUBTASK_UPSERT, _subtask_row(subtask.id, subtask.task_id, subtask.title, subtask.state))
+        if cursor.rowcount == 0:
+            raise ValueError(f"Task {subtask.task_id} is not stored.")
+        _bump_generation(cursor)
 
 def delete_task(task_id: str) -> None:
     """Delete a task from the SQLite database."""
     if task_id is None or len(task_id.strip()) == 0:
         raise ValueError("Task ID is required.")
 
-    with sqlite3.connect(db_name) as conn:
+    with _connection() as conn:
         cursor = conn.cursor()
 
+        cursor.execute(SUBTASKS_OF_TASK_DELETE, (task_id,))
         cursor.execute("DELETE FROM tasks WHERE id=?", (task_id,))
-        cursor.execute("DELETE FROM subtasks WHERE task_id=?", (task_id,))
+        _bump_generation(cursor)
 
 def delete_subtask(subtask_id: str) -> None:
     """Delete a subtask from the SQLite database."""
     if subtask_id is None or len(subtask_id.strip()) == 0:
         raise ValueError("Subtask ID is required.")
 
-    with sqlite3.connect(db_name) as conn:
+    with _connection() as conn:
         cursor = conn.cursor()
 
         cursor.execute("DELETE FROM subtasks WHERE id=?", (subtask_id,))
+        _bump_generation(cursor)
+
+def get_generation() -> int:
+    """Get the data generation, which increases with every committed write to tasks or subtasks."""
+    return get_table_version(GENERATION_RECORD)
+
+def get_database_id() -> int:
+    """Get the random id of the database, which tells it apart from another created in its place."""
+    return get_table_version(DATABASE_ID_RECORD)
+
+def _get_generation(cursor: sqlite3.Cursor) -> int:
+    cursor.execute("SELECT version FROM table_versions WHERE table_name=?", (GENERATION_RECORD,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def _bump_generation(cursor: sqlite3.Cursor) -> int:
+    cursor.execute("UPDATE table_versions SET version = version + 1 WHERE table_name=? RETURNING version",
+                   (GENERATION_RECORD,))
+    return cursor.fetchone()[0]
 
 def get_table_version(table_name: str) -> int:
     """Get the version of a table in the SQLite database."""
-    with sqlite3.connect(db_name) as conn:
+    with _connection() as conn:
         cursor = conn.cursor()
 
         cursor.execute("SELECT version FROM table_versions WHERE table_name=?", (table_name,))
@@ -150,10 +621,7 @@ def get_table_version(table_name: str) -> int:
 
 def set_table_version(table_name: str, version: int) -> None:
     """Set the version of a table in the SQLite database."""
-    with sqlite3.connect(db_name) as conn:
+    with _connection() as conn:
         cursor = conn.cursor()
 
         cursor.execute("INSERT OR REPLACE INTO table_versions (table_name, version) VALUES (?, ?)", (table_name, version))
-
-init_db()
-migrate_from_json()
\ No newline at end of file
@@ -0,0 +1,392 @@
+import sqlite3
+
+from typing import Callable, List, Optional, Tuple
+
+# table_versions entry holding the number of the last applied migration
+SCHEMA_RECORD = "schema"
+
+
+def _create_tasks_table(cursor: sqlite3.Cursor) -> None:
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            state TEXT NOT NULL,
+            importance TEXT NOT NULL
+        )
+    """)
+
+
+def _create_subtasks_table(cursor: sqlite3.Cursor) -> None:
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS subtasks (
+            id TEXT PRIMARY KEY,
+            task_id TEXT NOT NULL,
+            title TEXT NOT NULL,
+            state TEXT NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_subtasks_task_id ON subtasks (task_id)")
+
+
+def _add_json_import_record(cursor: sqlite3.Cursor) -> None:
+    cursor.execute("ALTER TABLE table_versions ADD COLUMN source_hash TEXT")
+    cursor.execute("ALTER TABLE table_versions ADD COLUMN task_count INTEGER")
+    cursor.execute("ALTER TABLE table_versions ADD COLUMN subtask_count INTEGER")
+
+
+def _add_data_generation(cursor: sqlite3.Cursor) -> None:
+    cursor.execute("INSERT OR IGNORE INTO table_versions (table_name, version) VALUES ('data_generation', 0)")
+
+
+def _add_display_order(cursor: sqlite3.Cursor) -> None:
+    # Same order as MainTask.__lt__ and Task.__lt__: open before completed, then importance, then title.
+    # The columns are virtual, so writers do not have to maintain them.
+    cursor.execute("ALTER TABLE tasks ADD COLUMN completed INTEGER GENERATED ALWAYS AS (state = 'completed') VIRTUAL")
+    cursor.execute("""
+        ALTER TABLE tasks ADD COLUMN importance_rank INTEGER GENERATED ALWAYS AS (
+            CASE importance
+                WHEN 'critical' THEN 0
+                WHEN 'high' THEN 1
+                WHEN 'medium' THEN 2
+                WHEN 'low' THEN 3
+                ELSE 4
+            END
+        ) VIRTUAL
+    """)
+    cursor.execute("CREATE INDEX idx_tasks_display_order ON tasks (completed, importance_rank, title)")
+
+    cursor.execute("ALTER TABLE subtasks ADD COLUMN completed INTEGER GENERATED ALWAYS AS (state = 'completed') VIRTUAL")
+    cursor.execute("CREATE INDEX idx_subtasks_display_order ON subtasks (task_id, completed, title)")
+    # Covered by the new index, which starts with task_id
+    cursor.execute("DROP INDEX IF EXISTS idx_subtasks_task_id")
+
+
+def _add_full_text_search(cursor: sqlite3.Cursor) -> None:
+    # External content tables index the titles without storing a second copy; the triggers keep them in sync
+    for table in ["tasks", "subtasks"]:
+        cursor.execute(f"CREATE VIRTUAL TABLE {table}_fts USING fts5(title, content='{table}', content_rowid='rowid')")
+        cursor.execute(f"""
+            CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {table}_fts (rowid, title) VALUES (new.rowid, new.title);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {table}_fts ({table}_fts, rowid, title) VALUES ('delete', old.rowid, old.title);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER {table}_fts_update AFTER UPDATE OF title ON {table} BEGIN
+                INSERT INTO {table}_fts ({table}_fts, rowid, title) VALUES ('delete', old.rowid, old.title);
+                INSERT INTO {table}_fts (rowid, title) VALUES (new.rowid, new.title);
+            END
+        """)
+        cursor.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+
+
+def _add_subtask_counters(cursor: sqlite3.Cursor) -> None:
+    # Progress counters of each task, maintained by triggers so that readers never have to scan subtasks
+    cursor.execute("ALTER TABLE tasks ADD COLUMN subtask_count INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE tasks ADD COLUMN completed_subtask_count INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("""
+        CREATE TRIGGER subtasks_count_insert AFTER INSERT ON subtasks BEGIN
+            UPDATE tasks SET subtask_count = subtask_count + 1,
+                             completed_subtask_count = completed_subtask_count + (new.state = 'completed')
+            WHERE id = new.task_id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER subtasks_count_delete AFTER DELETE ON subtasks BEGIN
+            UPDATE tasks SET subtask_count = subtask_count - 1,
+                             completed_subtask_count = completed_subtask_count - (old.state = 'completed')
+            WHERE id = old.task_id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER subtasks_count_update AFTER UPDATE OF task_id, state ON subtasks BEGIN
+            UPDATE tasks SET subtask_count = subtask_count - 1,
+                             completed_subtask_count = completed_subtask_count - (old.state = 'completed')
+            WHERE id = old.task_id;
+            UPDATE tasks SET subtask_count = subtask_count + 1,
+                             completed_subtask_count = completed_subtask_count + (new.state = 'completed')
+            WHERE id = new.task_id;
+        END
+    """)
+    cursor.execute("""
+        UPDATE tasks SET (subtask_count, completed_subtask_count) = (
+            SELECT COUNT(*), COALESCE(SUM(completed), 0) FROM subtasks WHERE subtasks.task_id = tasks.id
+        )
+    """)
+    # Serves "tasks with open subtasks"; most tasks have none and stay out of the index
+    cursor.execute("""
+        CREATE INDEX idx_tasks_open_subtasks ON tasks (completed, importance_rank, title)
+        WHERE subtask_count > completed_subtask_count
+    """)
+
+
+def _add_row_versions(cursor: sqlite3.Cursor) -> None:
+    # Every written row carries the data generation its write commits as, so readers can ask for the rows
+    # changed since a generation they have seen. Deleted rows leave a tombstone with the same kind of version.
+    next_generation = "(SELECT version + 1 FROM table_versions WHERE table_name = 'data_generation')"
+
+    for table in ["tasks", "subtasks"]:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        cursor.execute(f"UPDATE {table} SET version = {next_generation} - 1")
+        cursor.execute(f"CREATE INDEX idx_{table}_version ON {table} (version)")
+
+    cursor.execute("""
+        CREATE TABLE deleted_rows (
+            id TEXT PRIMARY KEY,
+            -- The owning task of a deleted subtask; NULL for a deleted task
+            task_id TEXT,
+            version INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX idx_deleted_rows_version ON deleted_rows (version)")
+    cursor.execute(f"""
+        CREATE TRIGGER tasks_tombstone AFTER DELETE ON tasks BEGIN
+            INSERT OR REPLACE INTO deleted_rows (id, task_id, version) VALUES (old.id, NULL, {next_generation});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER subtasks_tombstone AFTER DELETE ON subtasks BEGIN
+            INSERT OR REPLACE INTO deleted_rows (id, task_id, version) VALUES (old.id, old.task_id, {next_generation});
+        END
+    """)
+
+    # A task's counters change with its subtasks, so the counter triggers advance the task's version as well
+    cursor.execute("DROP TRIGGER subtasks_count_insert")
+    cursor.execute("DROP TRIGGER subtasks_count_delete")
+    cursor.execute("DROP TRIGGER subtasks_count_update")
+    cursor.execute(f"""
+        CREATE TRIGGER subtasks_count_insert AFTER INSERT ON subtasks BEGIN
+            UPDATE tasks SET subtask_count = subtask_count + 1,
+                             completed_subtask_count = completed_subtask_count + (new.state = 'completed'),
+                             version = {next_generation}
+            WHERE id = new.task_id;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER subtasks_count_delete AFTER DELETE ON subtasks BEGIN
+            UPDATE tasks SET subtask_count = subtask_count - 1,
+                             completed_subtask_count = completed_subtask_count - (old.state = 'completed'),
+                             version = {next_generation}
+            WHERE id = old.task_id;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER subtasks_count_update AFTER UPDATE OF task_id, state ON subtasks BEGIN
+            UPDATE tasks SET subtask_count = subtask_count - 1,
+                             completed_subtask_count = completed_subtask_count - (old.state = 'completed'),
+                             version = {next_generation}
+            WHERE id = old.task_id;
+            UPDATE tasks SET subtask_count = subtask_count + 1,
+                             completed_subtask_count = completed_subtask_count + (new.state = 'completed'),
+                             version = {next_generation}
+            WHERE id = new.task_id;
+        END
+    """)
+
+
+def _add_integer_keys(cursor: sqlite3.Cursor) -> None:
+    # Rebuild both tables around INTEGER PRIMARY KEY rowids: subtasks point at their task by its integer key,
+    # and state and importance are stored as the small integer codes of db.STATE_CODES and db.IMPORTANCE_CODES.
+    # The UUIDs stay as unique columns, for everything outside the database. Keys are the old rowids, so the
+    # full-text indexes (keyed by rowid) stay valid and ties in display order keep their insertion order.
+    def state_code(column: str) -> str:
+        return f"CASE {column} WHEN 'new' THEN 0 WHEN 'started' THEN 1 WHEN 'finalising' THEN 2 ELSE 3 END"
+
+    importance_code = """
+        CASE importance WHEN 'critical' THEN 0 WHEN 'high' THEN 1 WHEN 'medium' THEN 2 WHEN 'low' THEN 3 ELSE 4 END
+    """
+    next_generation = "(SELECT version + 1 FROM table_versions WHERE table_name = 'data_generation')"
+
+    cursor.execute("""
+        CREATE TABLE tasks_new (
+            key INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            title TEXT NOT NULL,
+            state INTEGER NOT NULL,
+            -- Codes are in display order, most important first
+            importance INTEGER NOT NULL,
+            subtask_count INTEGER NOT NULL DEFAULT 0,
+            completed_subtask_count INTEGER NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER GENERATED ALWAYS AS (state = 3) VIRTUAL
+        )
+    """)
+    cursor.execute(f"""
+        INSERT INTO tasks_new (key, id, title, state, importance, subtask_count, completed_subtask_count, version)
+        SELECT rowid, id, title, {state_code('state')}, {importance_code}, subtask_count, completed_subtask_count, version
+        FROM tasks
+    """)
+
+    cursor.execute("""
+        CREATE TABLE subtasks_new (
+            key INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            -- key of the owning task
+            task_key INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            state INTEGER NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER GENERATED ALWAYS AS (state = 3) VIRTUAL
+        )
+    """)
+    # Subtasks of tasks that no longer exist were never shown, and have no task key to point at
+    cursor.execute(f"""
+        INSERT INTO subtasks_new (key, id, task_key, title, state, version)
+        SELECT s.rowid, s.id, t.rowid, s.title, {state_code('s.state')}, s.version
+        FROM subtasks s JOIN tasks t ON t.id = s.task_id
+    """)
+
+    # Takes the old tables' indexes and triggers with them
+    cursor.execute("DROP TABLE subtasks")
+    cursor.execute("DROP TABLE tasks")
+    cursor.execute("ALTER TABLE tasks_new RENAME TO tasks")
+    cursor.execute("ALTER TABLE subtasks_new RENAME TO subtasks")
+
+    cursor.execute("CREATE INDEX idx_tasks_display_order ON tasks (completed, importance, title)")
+    cursor.execute("""
+        CREATE INDEX idx_tasks_open_subtasks ON tasks (completed, importance, title)
+        WHERE subtask_count > completed_subtask_count
+    """)
+    cursor.execute("CREATE INDEX idx_subtasks_display_order ON subtasks (task_key, completed, title)")
+    for table in ["tasks", "subtasks"]:
+        cursor.execute(f"CREATE INDEX idx_{table}_version ON {table} (version)")
+
+        cursor.execute(f"""
+            CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {table}_fts (rowid, title) VALUES (new.key, new.title);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {table}_fts ({table}_fts, rowid, title) VALUES ('delete', old.key, old.title);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER {table}_fts_update AFTER UPDATE OF title ON {table} BEGIN
+                INSERT INTO {table}_fts ({table}_fts, rowid, title) VALUES ('delete', old.key, old.title);
+                INSERT INTO {table}_fts (rowid, title) VALUES (new.key, new.title);
+            END
+        """)
+
+    # Tombstones keep the UUIDs, which is what other instances know the rows by. A subtask's task must still
+    # exist when the subtask is deleted, so deleting a task deletes its subtasks first.
+    cursor.execute(f"""
+        CREATE TRIGGER tasks_tombstone AFTER DELETE ON tasks BEGIN
+            INSERT OR REPLACE INTO deleted_rows (id, task_id, version) VALUES (old.id, NULL, {next_generation});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER subtasks_tombstone AFTER DELETE ON subtasks BEGIN
+            INSERT OR REPLACE INTO deleted_rows (id, task_id, version)
+            VALUES (old.id, (SELECT id FROM tasks WHERE key = old.task_key), {next_generation});
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER subtasks_count_insert AFTER INSERT ON subtasks BEGIN
+            UPDATE tasks SET subtask_count = subtask_count + 1,
+                             completed_subtask_count = completed_subtask_count + new.completed,
+                             version = {next_generation}
+            WHERE key = new.task_key;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER subtasks_count_delete AFTER DELETE ON subtasks BEGIN
+            UPDATE tasks SET subtask_count = subtask_count - 1,
+                             completed_subtask_count = completed_subtask_count - old.completed,
+                             version = {next_generation}
+            WHERE key = old.task_key;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER subtasks_count_update AFTER UPDATE OF task_key, state ON subtasks BEGIN
+            UPDATE tasks SET subtask_count = subtask_count - 1,
+                             completed_subtask_count = completed_subtask_count - old.completed,
+                             version = {next_generation}
+            WHERE key = old.task_key;
+            UPDATE tasks SET subtask_count = subtask_count + 1,
+                             completed_subtask_count = completed_subtask_count + new.completed,
+                             version = {next_generation}
+            WHERE key = new.task_key;
+        END
+    """)
+
+
+def _add_database_id(cursor: sqlite3.Cursor) -> None:
+    # A random id telling this database apart from one deleted or recreated in its place, which may reach the
+    # same data generation; copies of the file keep it, as they hold the same data
+    cursor.execute("""
+        INSERT OR IGNORE INTO table_versions (table_name, version)
+        VALUES ('database_id', random() & 9223372036854775807)
+    """)
+
+
+# Ordered, numbered migrations. Never change or renumber an entry once released; add a new one instead.
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, "Create tasks table", _create_tasks_table),
+    (2, "Create subtasks table", _create_subtasks_table),
+    (3, "Record JSON imports in table_versions", _add_json_import_record),
+    (4, "Add data generation counter", _add_data_generation),
+    (5, "Add display order columns and indexes", _add_display_order),
+    (6, "Add full-text search over titles", _add_full_text_search),
+    (7, "Add subtask progress counters", _add_subtask_counters),
+    (8, "Add row versions and tombstones", _add_row_versions),
+    (9, "Use integer keys and integer-coded states and importances", _add_integer_keys),
+    (10, "Add database id", _add_database_id),
+]
+
+
+def run_migrations(conn: sqlite3.Connection, target: Optional[int] = None) -> int:
+    """
+    Apply every migration newer than the database's schema version, each in its own transaction
+    :param target: Stop after this migration, e.g. to build an older schema for comparison; all if omitted
+    :return: The schema version after migrating
+    """
+    with conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS table_versions (
+                table_name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+        """)
+
+    current_version = _get_schema_version(conn)
+
+    for number, description, migrate in MIGRATIONS:
+        if number <= current_version:
+            continue
+        if target is not None and number > target:
+            break
+
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            migrate(cursor)
+            cursor.execute("INSERT OR REPLACE INTO table_versions (table_name, version) VALUES (?, ?)",
+                           (SCHEMA_RECORD, number))
+
+        current_version = number
+
+    return current_version
+
+
+def _get_schema_version(conn: sqlite3.Connection) -> int:
+    versions = dict(conn.execute("SELECT table_name, version FROM table_versions").fetchall())
+
+    if SCHEMA_RECORD in versions:
+        return versions[SCHEMA_RECORD]
+
+    # Databases created before migrations were numbered kept one entry per table or record instead, added in
+    # the same order as migrations 1 to 4
+    legacy_version = 0
+    for table_name in ["tasks", "subtasks", "table_versions", "data_generation"]:
+        if table_name not in versions:
+            break
+        legacy_version += 1
+
+    return legacy_version
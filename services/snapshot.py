@@ -0,0 +1,125 @@
+import os
+import pathlib
+import struct
+import uuid
+import zlib
+
+from typing import List, Optional
+
+import msgpack
+
+from models import MainTask, Task
+from models.enums import TaskImportance, TaskState
+from services import db
+
+SNAPSHOT_FILE = "todo_list.snapshot"
+
+# magic, format version, database id, data generation, payload length, payload CRC-32
+HEADER = struct.Struct(">4sHQQQI")
+MAGIC = b"TBES"
+FORMAT_VERSION = 3
+
+_STATES = list(TaskState)
+_IMPORTANCES = list(TaskImportance)
+_STATE_CODES = {state: code for code, state in enumerate(_STATES)}
+_IMPORTANCE_CODES = {importance: code for code, importance in enumerate(_IMPORTANCES)}
+
+
+def read_snapshot(path: str | pathlib.Path | None = None,
+                  generation: Optional[int] = None,
+                  database_id: Optional[int] = None) -> Optional[List[MainTask]]:
+    """
+    Read tasks from a snapshot file
+    :param path: Snapshot file, SNAPSHOT_FILE if omitted
+    :param generation: Data generation the snapshot must have been written at, or None to accept any
+    :param database_id: Id of the database the snapshot must have been written from, when a generation is
+                        given; db.get_database_id() if omitted
+    :return: The tasks, or None if the snapshot is missing, stale, damaged or written in another format version
+    """
+    try:
+        with open(path or SNAPSHOT_FILE, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) != HEADER.size:
+                return None
+
+            magic, format_version, snapshot_database_id, snapshot_generation, length, checksum = HEADER.unpack(header)
+            if magic != MAGIC or format_version != FORMAT_VERSION:
+                return None
+
+            if generation is not None:
+                if database_id is None:
+                    database_id = db.get_database_id()
+
+                # A database created in place of the one the snapshot was written from can reach the same generation
+                if snapshot_generation != generation or snapshot_database_id != database_id:
+                    return None
+
+            payload = f.read(length)
+    except FileNotFoundError:
+        return None
+
+    if len(payload) != length or zlib.crc32(payload) != checksum:
+        return None
+
+    try:
+        rows = msgpack.unpackb(payload, use_list=False)
+    except (ValueError, msgpack.UnpackException):
+        return None
+
+    states = _STATES
+    importances = _IMPORTANCES
+    tasks = []
+    for task_id, title, state, importance, completed_count, subtask_count, subtask_rows in rows:
+        task = MainTask(id=task_id, title=title, state=states[state], importance=importances[importance])
+        if subtask_rows is None:
+            task.set_subtask_counts(completed_count, subtask_count)
+        else:
+            task.subTasks = [Task(id=row[0], task_id=task_id, title=row[1], state=states[row[2]]) for row in subtask_rows]
+        tasks.append(task)
+
+    return tasks
+
+
+def write_snapshot(tasks: List[MainTask],
+                   generation: int,
+                   path: str | pathlib.Path | None = None,
+                   include_subtasks: bool = True,
+                   database_id: Optional[int] = None) -> None:
+    """
+    Write tasks to a snapshot file, replacing it atomically
+    :param include_subtasks: Store the subtasks, or only their counts (for readers that load subtasks on demand)
+    :param database_id: Id of the database the tasks come from, db.get_database_id() if omitted
+    """
+    if database_id is None:
+        database_id = db.get_database_id()
+
+    state_codes = _STATE_CODES
+    importance_codes = _IMPORTANCE_CODES
+    rows = [
+        (
+            task.id,
+            task.title,
+            state_codes[task.state],
+            importance_codes[task.importance],
+            task.completed_subtask_count,
+            task.subtask_count,
+            [(subtask.id, subtask.title, state_codes[subtask.state]) for subtask in task.subTasks] if include_subtasks else None,
+        )
+        for task in tasks
+    ]
+    payload = msgpack.packb(rows)
+
+    path = pathlib.Path(path or SNAPSHOT_FILE)
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+
+    try:
+        with open(temp_path, "xb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, database_id, generation, len(payload), zlib.crc32(payload)))
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
@@ -0,0 +1,142 @@
+import csv
+import json
+import pathlib
+
+from typing import Callable, Iterable, Iterator, Optional, TextIO, Tuple
+
+from models.enums import TaskImportance, TaskState
+from services import db
+
+FORMATS = ["ndjson", "csv"]
+
+# One header row, then one row per task or subtask. Tasks leave task_id empty, subtasks importance.
+CSV_COLUMNS = ["type", "id", "task_id", "title", "state", "importance"]
+
+_STATES = frozenset(TaskState)
+_IMPORTANCES = frozenset(TaskImportance)
+
+
+def guess_format(path: str | pathlib.Path) -> str:
+    """Pick the format from a file extension: .csv is CSV, anything else NDJSON."""
+    return "csv" if pathlib.Path(path).suffix.lower() == ".csv" else "ndjson"
+
+
+def export_tasks(out: TextIO, fmt: str = "ndjson") -> Tuple[int, int]:
+    """
+    Write every task, then every subtask, straight from database cursors, one row at a time
+    :param out: Text stream to write to
+    :param fmt: One of FORMATS
+    :return: Number of tasks and subtasks written
+    """
+    task_count = 0
+    subtask_count = 0
+
+    if fmt == "csv":
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(CSV_COLUMNS)
+
+        for task_id, title, state, importance in db.iter_task_rows():
+            writer.writerow(("task", task_id, "", title, state, importance))
+            task_count += 1
+
+        for subtask_id, task_id, title, state in db.iter_subtask_rows():
+            writer.writerow(("subtask", subtask_id, task_id, title, state, ""))
+            subtask_count += 1
+    else:
+        for task_id, title, state, importance in db.iter_task_rows():
+            out.write(json.dumps({"type": "task", "id": task_id, "title": title, "state": state,
+                                  "importance": importance}, ensure_ascii=False))
+            out.write("\n")
+            task_count += 1
+
+        for subtask_id, task_id, title, state in db.iter_subtask_rows():
+            out.write(json.dumps({"type": "subtask", "id": subtask_id, "task_id": task_id, "title": title,
+                                  "state": state}, ensure_ascii=False))
+            out.write("\n")
+            subtask_count += 1
+
+    return task_count, subtask_count
+
+
+def import_tasks(source: TextIO,
+                 fmt: str = "ndjson",
+                 progress: Optional[Callable[[int, int], None]] = None) -> Tuple[int, int]:
+    """
+    Upsert the tasks and subtasks of an export into the database, in chunked transactions
+    :param source: Text stream in the given format
+    :param fmt: One of FORMATS
+    :param progress: Called with the number of tasks and subtasks written after every committed chunk
+    :return: Number of tasks and subtasks written
+    :raises ValueError: On the first malformed line, or the first subtask whose task is neither stored nor
+                        earlier in the source; the chunks before it stay written
+    """
+    return db.import_rows(read_records(source, fmt), progress=progress)
+
+
+def read_records(source: TextIO, fmt: str = "ndjson") -> Iterator[Tuple[str, Tuple]]:
+    """
+    Parse an export one line at a time into the ("task", row) and ("subtask", row) pairs of db.import_rows
+    :raises ValueError: If a line is malformed
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(source)
+        if reader.fieldnames is None:
+            return
+
+        missing = [column for column in CSV_COLUMNS if column not in reader.fieldnames]
+        if missing:
+            raise ValueError(f"Missing CSV columns: {', '.join(missing)}")
+
+        lines: Iterable[Tuple[int, dict]] = ((reader.line_num, fields) for fields in reader)
+    else:
+        lines = _parse_ndjson(source)
+
+    for line_number, fields in lines:
+        try:
+            yield _to_record(fields)
+        except (KeyError, TypeError, ValueError) as err:
+            raise ValueError(f"Line {line_number}: {err}") from None
+
+
+# ----- Internal helpers -----
+
+def _parse_ndjson(source: TextIO) -> Iterator[Tuple[int, dict]]:
+    for line_number, line in enumerate(source, start=1):
+        if not line.strip():
+            continue
+
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as err:
+            raise ValueError(f"Line {line_number}: {err}") from None
+
+
+def _to_record(fields: dict) -> Tuple[str, Tuple]:
+    kind = fields["type"]
+    row_id = _required(fields, "id")
+    title = fields["title"]
+    if not isinstance(title, str):
+        raise ValueError("title must be a string")
+    state = _checked(fields["state"], _STATES, "state")
+
+    match kind:
+        case "task":
+            importance = _checked(fields.get("importance") or TaskImportance.MEDIUM, _IMPORTANCES, "importance")
+            return kind, (row_id, title, state, importance)
+        case "subtask":
+            return kind, (row_id, _required(fields, "task_id"), title, state)
+        case _:
+            raise ValueError(f"Unknown type {kind!r}")
+
+
+def _required(fields: dict, name: str) -> str:
+    value = fields.get(name)
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"{name} is required")
+    return value
+
+
+def _checked(value: str, allowed: frozenset, name: str) -> str:
+    if value not in allowed:
+        raise ValueError(f"Invalid {name} {value!r}")
+    return str(value)
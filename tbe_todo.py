@@ -1,14 +1,32 @@
-from typing import List
+import time
+
+# Startup milestones are measured from here, i.e. before Textual and the app's own modules are imported
+_MODULE_START = time.perf_counter()
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import signal
+import sys
+
+from typing import Dict, List, Optional, Set, Tuple
 
 from textual.app import App, ComposeResult
 from textual.containers import Horizontal, Vertical
 from textual.reactive import reactive
 from textual.widgets import Footer, Header, Label
 
-from tbe_todo_utils import load_tasks, save_tasks, sort_subtasks, sort_tasks
-from models import MainTask, Task
-from components import AddSubtaskScreen, AddTaskScreen, DeleteScreen, MainTodoList, SubTasksScreen, SubTodoList
-from services import db
+import tbe_todo_cli
+from models import MainTask, SortedTaskList, Task
+from models.enums import TaskImportance
+from components import AddSubtaskScreen, AddTaskScreen, DeleteScreen, ImportanceScreen, MainTodoList, SearchScreen, SubTasksScreen, SubTodoList
+from services import BACKENDS, DEFAULT_BACKEND, create_repository
+from services.TaskRepository import TaskRepository
+from services.TaskStore import TaskStore
+
+_IMPORTS_DONE = time.perf_counter()
 
 
 class TodoApp(App):
@@ -18,16 +36,42 @@ class TodoApp(App):
         ("s", "add_subtask", "Add Subtask"),
         ("e", "edit_task", "Edit (Sub)Task"),
         ("delete", "delete_task", "Delete Task"),
+        ("/", "search", "Search"),
         ("t", "test", "Test"),
         ("q", "quit", "Quit")
     ]
 
     is_editing: reactive[bool] = reactive(False)
+    unsaved_changes: reactive[int] = reactive(0)
     subtasks: reactive[List[Task]] = reactive([])
     selected_subtask_id: reactive[str] = reactive("")
     selected_task_id: reactive[str] = reactive("")
     selected_task_title: reactive[str] = reactive("[No task selected]")
-    tasks: reactive[List[MainTask]] = reactive(sort_tasks(load_tasks()))
+    # Kept in display order in place, so a changed task moves without the list being sorted again
+    tasks: reactive[SortedTaskList] = reactive(SortedTaskList)
+
+    def __init__(self,
+                 repository: Optional[TaskRepository] = None,
+                 profile_startup: bool = False,
+                 store: Optional[TaskStore] = None,
+                 **kwargs):
+        """
+        :param repository: Where tasks are stored, the default backend if omitted; unused when a store is given
+        :param profile_startup: Quit as soon as the tasks are loaded, with startup_times filled in
+        :param store: Tasks shared with the other sessions of this process, left open when this one quits; by
+                      default the app opens a store of its own and closes it when it quits
+        """
+        super().__init__(**kwargs)
+        # Seconds from the start of this module's import to each startup milestone reached so far
+        self.startup_times: Dict[str, float] = {"imports": _IMPORTS_DONE - _MODULE_START}
+        self._profile_startup = profile_startup
+        self._owns_store = store is None
+        self._store = store or TaskStore(repository or create_repository())
+        # The store's own list, so a session holds no tasks of its own
+        self.set_reactive(TodoApp.tasks, self._store.tasks)
+        # The one task that moved in (or was added to) self.tasks, and its new index, when nothing else changed
+        # in its order; the list then moves only that task's item
+        self._moved_task: Optional[Tuple[MainTask, int]] = None
 
     def compose(self) -> ComposeResult:
         yield Header()
@@ -39,27 +83,62 @@ class TodoApp(App):
                     yield SubTodoList(self.subtasks, id="todo_subitems")
         yield Footer()
 
+    def on_mount(self) -> None:
+        self.startup_times["mounted"] = time.perf_counter() - _MODULE_START
+        self._store.add_view(self)
+        # Reads the tasks in the background, unless another session already started it
+        self._store.start()
+        self.show_tasks(None, set())
+        self.set_interval(0.25, self._refresh_unsaved_changes)
+
+        if not self._owns_store:
+            # The host of the shared store handles signals
+            return
+
+        try:
+            # A terminated app shuts down like a quit one, so on_unmount writes what is still queued
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self.exit)
+        except (NotImplementedError, RuntimeError):
+            # Not available on Windows event loops
+            pass
+
     async def watch_subtasks(self) -> None:
-        await self._get_subtasks_list().set_tasks(self.subtasks)
+        await self._get_subtasks_list().set_tasks(self.subtasks, presorted=True)
 
     def watch_selected_task_title(self) -> None:
         self._get_subtasks_title().update(content=self.selected_task_title, layout=False)
 
-    async def watch_tasks(self, updated_tasks: List[MainTask]) -> None:
-        await self._get_tasks_list().set_tasks(self.tasks)
-        save_tasks(updated_tasks)
+    async def watch_tasks(self) -> None:
+        moved, self._moved_task = self._moved_task, None
+        tasks_list = self._get_tasks_list()
+
+        # Other changes made since the move are caught up with by the full refresh of their own watch call
+        if moved is None or not await tasks_list.move_task(*moved):
+            await tasks_list.set_tasks(self.tasks, presorted=True)
+
+    def watch_unsaved_changes(self) -> None:
+        self.sub_title = f"Unsaved changes: {self.unsaved_changes}" if self.unsaved_changes > 0 else ""
+
+    def on_unmount(self) -> None:
+        # Runs however the app ends (quit binding, exit(), SIGTERM, an exception in a handler, a closed
+        # browser session), so queued writes are never left behind
+        self._store.remove_view(self)
+        if self._owns_store:
+            self._store.close()
+
+    def action_quit(self) -> None:
+        self.exit()
 
     def action_test(self) -> None:
         self.push_screen(SubTasksScreen())
-        print(db.load_tasks())
+        print(self.tasks)
 
     def action_add_task(self):
         def handle_add_task(task: MainTask|None) -> None:
             if task is None:
                 return
 
-            self.tasks = sort_tasks(self.tasks + [task])
-            self.mutate_reactive(TodoApp.tasks)
+            self._store.add_task(task)
 
         self.push_screen(AddTaskScreen(), handle_add_task)
 
@@ -74,29 +153,34 @@ class TodoApp(App):
             if task is None:
                 return
 
-            t.subTasks = sort_subtasks(t.subTasks + [Task(title=task.title)])
-            self.mutate_reactive(TodoApp.tasks)
-            self.subtasks = t.subTasks
+            self._store.add_subtask(t, Task(task_id=t.id, title=task.title))
 
         self.push_screen(AddSubtaskScreen(), handle_add_subtask)
 
     def action_delete_task(self):
-        t = self._get_task_by_id(self.selected_task_id)
-        if t is None:
-            self.notify("No task selected", severity="error", title="Unable to edit task")
+        tasks = self._get_tasks_list().get_marked_tasks()
+        if not tasks:
+            self.notify("No task selected", severity="error", title="Unable to delete task")
             return
 
         def check_delete(confirmed: bool|None) -> None:
             if confirmed:
-                t = self._get_task_by_id(self.selected_task_id)
-                if t is None:
-                    return
-
-                self.tasks.remove(t)
-                self.mutate_reactive(TodoApp.tasks)
+                self._store.delete_tasks(tasks)
 
         self.push_screen(DeleteScreen(), check_delete)
 
+    def action_search(self):
+        async def handle_search(task_id: str|None) -> None:
+            if task_id is None or await self._store.fetch_task(task_id) is None:
+                return
+
+            tasks_list = self._get_tasks_list()
+            await tasks_list.set_tasks(self.tasks, presorted=True)
+            tasks_list.select_task_by_id(task_id)
+            tasks_list.focus()
+
+        self.push_screen(SearchScreen(self._store), handle_search)
+
     def action_edit_task(self):
         t = self._get_task_by_id(self.selected_task_id)
         if t is None:
@@ -111,8 +195,7 @@ class TodoApp(App):
                     return
 
                 subtask.title = task.title
-                self.mutate_reactive(TodoApp.subtasks)
-                self.mutate_reactive(TodoApp.tasks)
+                self._store.subtasks_changed(t)
 
             self.push_screen(AddSubtaskScreen(subtask), handle_edit_subtask)
             return
@@ -123,10 +206,13 @@ class TodoApp(App):
 
             t.title = task.title
             t.importance = task.importance
-            self.mutate_reactive(TodoApp.tasks)
+            self._store.tasks_changed([t])
 
         self.push_screen(AddTaskScreen(t), handle_edit_task)
 
+    def on_main_todo_list_load_more(self, message: MainTodoList.LoadMore) -> None:
+        self._store.load_more()
+
     def on_main_todo_list_task_selected(self, message: MainTodoList.TaskSelected) -> None:
         t = self._get_task_by_id(message.task_id)
         if t is None:
@@ -136,61 +222,149 @@ class TodoApp(App):
 
         self.selected_task_id = t.id
         self.selected_task_title = t.title
-        self.subtasks = sort_subtasks(t.subTasks)
+
+        subtasks = self._store.lookup_subtasks(t)
+        if subtasks is not None:
+            self.subtasks = subtasks
+        else:
+            # Shown once they are read in the background
+            self.subtasks = []
+            self._store.fetch_subtasks(t.id, self)
+
+    def on_main_todo_list_set_importance(self, message: MainTodoList.SetImportance) -> None:
+        def handle_importance(importance: TaskImportance|None) -> None:
+            if importance is None:
+                return
+
+            changed = []
+            for task_id in message.task_ids:
+                task = self.tasks.get(task_id)
+                if task is not None:
+                    task.importance = importance
+                    changed.append(task)
+
+            self._store.tasks_changed(changed)
+
+        self.push_screen(ImportanceScreen(len(message.task_ids)), handle_importance)
 
     def on_main_todo_list_update_task_state(self, message: MainTodoList.UpdateTaskState) -> None:
-        t = self._get_task_by_id(message.task_id)
-        if t is None:
-            return
+        # However many tasks change, they are redrawn and saved (in one transaction) once
+        changed = []
+        for task_id, task_state in message.task_states.items():
+            task = self.tasks.get(task_id)
+            if task is not None:
+                task.state = task_state
+                changed.append(task)
 
-        t.state = message.task_state
-        sorted_tasks = sort_tasks(self.tasks)
-        if sorted_tasks == self.tasks:
-            self.mutate_reactive(TodoApp.tasks)
-        else:
-            self.tasks = sorted_tasks
+        self._store.tasks_changed(changed)
 
     def on_sub_todo_list_delete_task(self, message: SubTodoList.DeleteTask) -> None:
         def check_delete(confirmed: bool|None) -> None:
             if confirmed:
-                subtask = self._get_subtask_by_id(message.task_id)
-                if subtask is None:
-                    return
-
                 task = self._get_task_by_id(self.selected_task_id)
                 if task is None:
                     return
 
-                task.subTasks.remove(subtask)
-                self.mutate_reactive(TodoApp.tasks)
-                self.subtasks = task.subTasks
-                self.mutate_reactive(TodoApp.subtasks)
+                self._store.delete_subtasks(task, message.task_ids)
 
         self.push_screen(DeleteScreen(), check_delete)
 
+    def on_sub_todo_list_move_tasks(self, message: SubTodoList.MoveTasks) -> None:
+        source = self._get_task_by_id(self.selected_task_id)
+        if source is None:
+            return
+
+        async def handle_target(task_id: str|None) -> None:
+            if task_id is None or task_id == source.id:
+                return
+
+            target = await self._store.fetch_task(task_id)
+            if target is None:
+                return
+
+            moved = self._store.move_subtasks(source, message.task_ids, target)
+            self.notify(f"Moved {len(moved)} subtask(s) to {target.title}", title="Subtasks moved")
+
+        self.push_screen(SearchScreen(self._store), handle_target)
+
     def on_sub_todo_list_task_selected(self, message: SubTodoList.TaskSelected) -> None:
         self.selected_subtask_id = message.task_id
 
     def on_sub_todo_list_update_task_state(self, message: SubTodoList.UpdateTaskState) -> None:
-        t = self._get_subtask_by_id(message.task_id)
-        if t is None:
+        task = self._get_task_by_id(self.selected_task_id)
+        if task is None:
             return
 
-        t.state = message.task_state
-        self.mutate_reactive(TodoApp.subtasks)
+        for subtask_id in message.task_ids:
+            subtask = task.get_subtask(subtask_id)
+            if subtask is not None:
+                subtask.state = message.task_state
+
+        self._store.subtasks_changed(task)
+
+    # ----- TaskStoreView -----
+
+    def show_tasks(self, moved: Optional[Tuple[MainTask, int]], deleted_ids: Set[str]) -> None:
+        self._moved_task = moved
         self.mutate_reactive(TodoApp.tasks)
+        self._refresh_unsaved_changes()
+        self._get_tasks_list().loading = not self._store.first_page_loaded
+
+        if self.selected_task_id in deleted_ids:
+            self.selected_task_id = ""
+            self.selected_task_title = ""
+            self.subtasks = []
+        elif self.tasks.has_id(self.selected_task_id):
+            self.selected_task_title = self.tasks.get(self.selected_task_id).title
+
+        if self._store.first_page_loaded and "first_paint" not in self.startup_times:
+            self.startup_times["first_paint"] = 0.0
+            self.call_after_refresh(self._record_startup_time, "first_paint")
+            # The rest of the tasks load once a first screenful is shown
+            self.call_after_refresh(self._store.mark_painted)
+
+        if not self._store.loading and "loaded" not in self.startup_times:
+            self.startup_times["loaded"] = 0.0
+            self.call_after_refresh(self._record_startup_time, "loaded")
+
+        if self._store.fully_loaded and "all_loaded" not in self.startup_times:
+            self.startup_times["all_loaded"] = 0.0
+            self.call_after_refresh(self._record_startup_time, "all_loaded")
+        elif self._profile_startup:
+            # Read every page, as scrolling to the end would
+            self._store.load_more()
+
+    def show_subtasks(self, task_ids: Set[str]) -> None:
+        if self.selected_task_id not in task_ids:
+            return
+
+        task = self.tasks.get(self.selected_task_id)
+        if task is not None:
+            # One refresh, whether or not the list is the one shown already
+            self.set_reactive(TodoApp.subtasks, task.subTasks)
+            self.mutate_reactive(TodoApp.subtasks)
+
+    def show_error(self, error: Exception) -> None:
+        self.notify(str(error), severity="error", title="Unable to read tasks")
 
     # ----- Internal helpers -----
 
+    async def _record_startup_time(self, milestone: str) -> None:
+        self.startup_times[milestone] = time.perf_counter() - _MODULE_START
+
+        if milestone == "all_loaded" and self._profile_startup:
+            self.exit()
+
+    def _refresh_unsaved_changes(self) -> None:
+        self.unsaved_changes = self._store.pending_count
+
     def _get_subtask_by_id(self, task_id: str) -> Task | None:
-        if self.subtasks is None or len(self.subtasks) == 0:
+        # The subtasks shown are those of the selected task
+        task = self.tasks.get(self.selected_task_id)
+        if task is None:
             return None
 
-        for subtask in self.subtasks:
-            if subtask.id == task_id:
-                return subtask
-
-        return None
+        return task.get_subtask(task_id)
 
     def _get_subtasks_list(self) -> SubTodoList:
         return self.query_one("#todo_subitems", SubTodoList)
@@ -199,16 +373,45 @@ class TodoApp(App):
         return self.query_one("#subtasks_title", Label)
 
     def _get_task_by_id(self, task_id: str) -> MainTask | None:
-        for task in self.tasks:
-            if task.id == task_id:
-                return task
-
-        return None
+        return self.tasks.get(task_id)
 
     def _get_tasks_list(self) -> MainTodoList:
         return self.query_one("#todo_items", MainTodoList)
 
 
 if __name__ == "__main__":
-    app = TodoApp()
-    app.run()
+    parser = argparse.ArgumentParser(description="Simple ToDo TUI")
+    parser.add_argument("--backend", choices=BACKENDS, default=os.environ.get("TBE_TODO_BACKEND"),
+                        help="Where tasks are stored (default: $TBE_TODO_BACKEND, or sqlite)")
+    parser.add_argument("--serve", action="store_true",
+                        help="Serve the app in the browser, each page load a session sharing this process's tasks")
+    parser.add_argument("--host", default="localhost", help="Host to serve on (with --serve)")
+    parser.add_argument("--port", type=int, default=8000, help="Port to serve on (with --serve)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Start headless, quit once the tasks are loaded and print the startup times as JSON")
+    parser.add_argument("command", nargs="?", choices=tbe_todo_cli.COMMANDS,
+                        help="Run a command of tbe_todo_cli.py instead of the app (that script starts faster)")
+    parser.add_argument("arguments", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.command is not None:
+        backend = ["--backend", args.backend] if args.backend else []
+        sys.exit(tbe_todo_cli.main(backend + [args.command] + args.arguments))
+    elif args.serve:
+        # Imported here, so only serving needs textual-serve
+        import tbe_todo_serve
+
+        # Every browser session runs in this process, on the one store
+        store = TaskStore(create_repository(args.backend))
+        tbe_todo_serve.serve(functools.partial(TodoApp, store=store), store, host=args.host, port=args.port)
+    elif args.profile_startup:
+        app = TodoApp(create_repository(args.backend), profile_startup=True)
+        app.run(headless=True)
+        # Seconds since this module started importing; interpreter startup comes before that
+        report = {f"{milestone}_s": round(seconds, 6) for milestone, seconds in app.startup_times.items()}
+        report.update(backend=args.backend or DEFAULT_BACKEND, tasks=len(app.tasks),
+                      fully_loaded=app._store.fully_loaded)
+        print(json.dumps(report))
+    else:
+        app = TodoApp(create_repository(args.backend))
+        app.run()
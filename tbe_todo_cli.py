@@ -0,0 +1,258 @@
+"""
+Headless command line for scripts, cron jobs and shell pipelines.
+
+Imports only the models and the storage layer, never Textual or the components, so each command finishes in
+tens of milliseconds. Tasks are named by id or exact title; subtasks likewise, with --in naming their task.
+
+    python tbe_todo_cli.py add "Water the plants" --importance high
+    python tbe_todo_cli.py list --state new | cut -f1
+    python tbe_todo_cli.py done "Water the plants"
+"""
+import argparse
+import contextlib
+import os
+import sys
+
+from typing import Iterator, List, Optional
+
+from models import ChangeSet, MainTask, Task
+from models.enums import TaskImportance, TaskState
+from services import BACKENDS, create_repository, transfer
+from services.TaskRepository import TaskRepository
+
+COMMANDS = ["add", "list", "done", "set-state", "set-importance", "rm", "export", "import"]
+
+# Tasks read at a time while listing or looking up a title
+PAGE_SIZE = 500
+
+
+class CliError(Exception):
+    """A command could not be carried out; the message is shown to the user."""
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run one command
+    :param argv: Arguments without the program name, sys.argv[1:] if omitted
+    :return: Exit status
+    """
+    args = _parser().parse_args(argv)
+
+    if args.command in ("export", "import"):
+        # Both work on the SQLite database directly, whatever the --backend
+        return _transfer(args)
+
+    repository = create_repository(args.backend)
+    try:
+        args.run(repository, args)
+    except CliError as err:
+        print(f"Error: {err}", file=sys.stderr)
+        return 1
+    finally:
+        repository.close()
+
+    return 0
+
+
+# ----- Commands -----
+
+def add(repository: TaskRepository, args: argparse.Namespace) -> None:
+    if args.parent is not None:
+        task = _find_task(repository, args.parent)
+        subtask = Task(task_id=task.id, title=args.title)
+        repository.save_changes(ChangeSet(created_subtasks=[subtask]))
+        print(subtask.id)
+    else:
+        task = MainTask(title=args.title, importance=TaskImportance(args.importance))
+        repository.save_changes(ChangeSet(created_tasks=[task]))
+        print(task.id)
+
+
+def list_tasks(repository: TaskRepository, args: argparse.Namespace) -> None:
+    # Tab-separated, one line per row: id, state, then importance and progress for tasks, then the title
+    if args.parent is not None:
+        task = _find_task(repository, args.parent)
+        for subtask in repository.load_subtasks_for_task(task.id):
+            if args.state is None or subtask.state in args.state:
+                print(f"{subtask.id}\t{subtask.state}\t{subtask.title}")
+        return
+
+    for task in _iter_tasks(repository, args.state, args.importance):
+        print(f"{task.id}\t{task.state}\t{task.importance}\t"
+              f"{task.completed_subtask_count}/{task.subtask_count}\t{task.title}")
+
+
+def done(repository: TaskRepository, args: argparse.Namespace) -> None:
+    args.state = TaskState.COMPLETED
+    set_state(repository, args)
+
+
+def set_state(repository: TaskRepository, args: argparse.Namespace) -> None:
+    if args.parent is not None:
+        subtask = _find_subtask(repository, args.parent, args.ref)
+        subtask.state = TaskState(args.state)
+        repository.save_changes(ChangeSet(modified_subtasks=[subtask]))
+    else:
+        task = _find_task(repository, args.ref)
+        task.state = TaskState(args.state)
+        repository.save_changes(ChangeSet(modified_tasks=[task]))
+
+
+def set_importance(repository: TaskRepository, args: argparse.Namespace) -> None:
+    task = _find_task(repository, args.ref)
+    task.importance = TaskImportance(args.importance)
+    repository.save_changes(ChangeSet(modified_tasks=[task]))
+
+
+def rm(repository: TaskRepository, args: argparse.Namespace) -> None:
+    if args.parent is not None:
+        subtask = _find_subtask(repository, args.parent, args.ref)
+        repository.save_changes(ChangeSet(deleted_subtask_ids=[subtask.id]))
+    else:
+        task = _find_task(repository, args.ref)
+        repository.save_changes(ChangeSet(deleted_task_ids=[task.id]))
+
+
+# ----- Internal helpers -----
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Simple ToDo command line")
+    parser.add_argument("--backend", choices=BACKENDS, default=os.environ.get("TBE_TODO_BACKEND"),
+                        help="Where tasks are stored (default: $TBE_TODO_BACKEND, or sqlite)")
+    commands = parser.add_subparsers(dest="command", metavar="command", required=True)
+
+    parent_help = "Work on the subtasks of this task (id or exact title)"
+    states = [state.value for state in TaskState]
+    importances = [importance.value for importance in TaskImportance]
+
+    command = commands.add_parser("add", help="Add a task, or a subtask with --in; prints its id")
+    command.add_argument("title")
+    command.add_argument("--importance", choices=importances, default=TaskImportance.MEDIUM.value)
+    command.add_argument("--in", dest="parent", metavar="TASK", help=parent_help)
+    command.set_defaults(run=add)
+
+    command = commands.add_parser("list", help="List tasks in display order, or a task's subtasks with --in")
+    command.add_argument("--state", choices=states, action="append", help="Only this state; repeatable")
+    command.add_argument("--importance", choices=importances, action="append",
+                         help="Only this importance; repeatable")
+    command.add_argument("--in", dest="parent", metavar="TASK", help=parent_help)
+    command.set_defaults(run=list_tasks)
+
+    command = commands.add_parser("done", help="Mark a task or subtask completed")
+    command.add_argument("ref", metavar="TASK", help="Id or exact title")
+    command.add_argument("--in", dest="parent", metavar="TASK", help=parent_help)
+    command.set_defaults(run=done)
+
+    command = commands.add_parser("set-state", help="Set the state of a task or subtask")
+    command.add_argument("ref", metavar="TASK", help="Id or exact title")
+    command.add_argument("state", choices=states)
+    command.add_argument("--in", dest="parent", metavar="TASK", help=parent_help)
+    command.set_defaults(run=set_state)
+
+    command = commands.add_parser("set-importance", help="Set the importance of a task")
+    command.add_argument("ref", metavar="TASK", help="Id or exact title")
+    command.add_argument("importance", choices=importances)
+    command.set_defaults(run=set_importance)
+
+    command = commands.add_parser("rm", help="Delete a task with its subtasks, or a subtask with --in")
+    command.add_argument("ref", metavar="TASK", help="Id or exact title")
+    command.add_argument("--in", dest="parent", metavar="TASK", help=parent_help)
+    command.set_defaults(run=rm)
+
+    command = commands.add_parser("export", help="Stream the tasks in the database out as NDJSON or CSV")
+    command.add_argument("file", nargs="?", default="-", help="File to write (default: standard output)")
+    command.add_argument("--format", choices=transfer.FORMATS,
+                         help="Output format (default: from the file extension, else ndjson)")
+
+    command = commands.add_parser("import", help="Upsert tasks from an NDJSON or CSV export into the database")
+    command.add_argument("file", help="File to read, or - for standard input")
+    command.add_argument("--format", choices=transfer.FORMATS,
+                         help="Input format (default: from the file extension, else ndjson)")
+
+    return parser
+
+
+def _iter_tasks(repository: TaskRepository,
+                states: Optional[List[str]] = None,
+                importances: Optional[List[str]] = None) -> Iterator[MainTask]:
+    """Page through the tasks without their subtasks, so memory use does not grow with the list."""
+    after_key = None
+    while True:
+        page = repository.load_tasks_page(after_key, PAGE_SIZE, states, importances, include_subtasks=False)
+        yield from page.tasks
+
+        if page.next_key is None:
+            return
+        after_key = page.next_key
+
+
+def _find_task(repository: TaskRepository, ref: str) -> MainTask:
+    if not ref.strip():
+        raise CliError("A task id or title is required.")
+
+    task = repository.load_task(ref)
+    if task is not None:
+        return task
+
+    matches = [task for task in _iter_tasks(repository) if task.title == ref]
+    if len(matches) > 1:
+        raise CliError(f"{len(matches)} tasks are titled {ref!r}; use the id instead.")
+    if not matches:
+        raise CliError(f"No task with the id or title {ref!r}.")
+
+    return matches[0]
+
+
+def _find_subtask(repository: TaskRepository, task_ref: str, ref: str) -> Task:
+    task = _find_task(repository, task_ref)
+    subtasks = repository.load_subtasks_for_task(task.id)
+
+    for subtask in subtasks:
+        if subtask.id == ref:
+            return subtask
+
+    matches = [subtask for subtask in subtasks if subtask.title == ref]
+    if len(matches) > 1:
+        raise CliError(f"{len(matches)} subtasks of {task.title!r} are titled {ref!r}; use the id instead.")
+    if not matches:
+        raise CliError(f"{task.title!r} has no subtask with the id or title {ref!r}.")
+
+    return matches[0]
+
+
+def _transfer(args: argparse.Namespace) -> int:
+    fmt = args.format or transfer.guess_format(args.file)
+    if args.file == "-":
+        stream = contextlib.nullcontext(sys.stdout if args.command == "export" else sys.stdin)
+    else:
+        stream = open(args.file, "w" if args.command == "export" else "r", encoding="utf-8", newline="")
+
+    with stream as stream:
+        if args.command == "export":
+            task_count, subtask_count = transfer.export_tasks(stream, fmt)
+            print(f"Exported {task_count} tasks and {subtask_count} subtasks.", file=sys.stderr)
+            return 0
+
+        def report(tasks_done: int, subtasks_done: int) -> None:
+            print(f"\rImported {tasks_done} tasks and {subtasks_done} subtasks...", end="", file=sys.stderr)
+
+        try:
+            task_count, subtask_count = transfer.import_tasks(stream, fmt, report)
+        except ValueError as err:
+            print(f"\nError: {err}. Rows before it were imported.", file=sys.stderr)
+            return 1
+
+        print(f"\rImported {task_count} tasks and {subtask_count} subtasks.   ", file=sys.stderr)
+        return 0
+
+
+if __name__ == "__main__":
+    try:
+        status = main()
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader went away, e.g. `list | head`. Quietly stop, as other command line tools do.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        status = 1
+
+    sys.exit(status)
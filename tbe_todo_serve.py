@@ -0,0 +1,237 @@
+"""
+Serves the app in the browser with every session in this one process, sharing one TaskStore.
+
+textual-serve starts a process per browser session. Here its web server hands each websocket to a TodoApp
+running on the server's own event loop instead, through a driver that writes to the websocket, so all
+sessions show the same loaded tasks, use the same connection to the storage and see each other's edits at
+once. A session adds only its view state to the process.
+
+    python tbe_todo.py --serve --port 8000
+"""
+import asyncio
+import functools
+import sys
+
+from codecs import getincrementaldecoder
+from typing import Any, Callable, List, Optional
+
+from aiohttp import web
+from rich.console import Console
+from textual import constants, events, messages
+from textual._xterm_parser import XTermParser
+from textual.app import App
+from textual.driver import Driver
+from textual.geometry import Size
+from textual_serve.server import Server, log, to_int
+
+from services.TaskStore import TaskStore
+
+
+class SessionDriver(Driver):
+    """Driver of an app running in this process for one browser session; output and input go through a Session."""
+
+    def __init__(self, app: App, *, session: "Session", debug: bool = False, mouse: bool = True,
+                 size: Optional[tuple[int, int]] = None):
+        super().__init__(app, debug=debug, mouse=mouse, size=size)
+        self._session = session
+        self._parser = XTermParser(debug=debug)
+        self._decode = getincrementaldecoder("utf-8")().decode
+        # Pending check for a lone escape key, which the parser only reports once nothing follows it
+        self._tick: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def is_web(self) -> bool:
+        return True
+
+    def write(self, data: str) -> None:
+        self._session.send(data.encode("utf-8"))
+
+    def start_application_mode(self) -> None:
+        # Like textual's WebDriver, without the process around it
+        self.write("\x1b[?1049h")  # Alt screen
+        self.write("\x1b[?1000h\x1b[?1003h\x1b[?1015h\x1b[?1006h")  # Mouse reporting
+        self.write("\x1b[?25l")  # Hide cursor
+        self.write("\x1b[?2026$p")  # Ask whether synchronized output is supported
+        self.write("\x1b[?2004h")  # Bracketed paste
+
+        size = Size(*self._size) if self._size is not None else Size(80, 24)
+        self._app.post_message(events.Resize(size, size))
+        self._app.call_later(self._app.post_message, events.AppBlur())
+        self._session.attach(self)
+
+    def disable_input(self) -> None:
+        pass
+
+    def stop_application_mode(self) -> None:
+        if self._tick is not None:
+            self._tick.cancel()
+        self._session.close()
+
+    def feed(self, data: bytes) -> None:
+        """Handle what the terminal in the browser sent."""
+        for event in self._parser.feed(self._decode(data)):
+            self.process_message(event)
+
+        if self._tick is not None:
+            self._tick.cancel()
+        self._tick = self._loop.call_later(constants.ESCAPE_DELAY, self._flush_input)
+
+    def resize(self, width: int, height: int) -> None:
+        self._size = (width, height)
+        size = Size(width, height)
+        self._app.post_message(events.Resize(size, size))
+
+    # ----- Internal helpers -----
+
+    def _flush_input(self) -> None:
+        self._tick = None
+        for event in self._parser.tick():
+            self.process_message(event)
+
+
+class Session:
+    """
+    One browser session: an app on the shared store, and its websocket.
+
+    Offers the methods of textual-serve's AppService that its Server calls with what the browser sent.
+    """
+
+    def __init__(self, app_factory: Callable[..., App], websocket: web.WebSocketResponse):
+        """:param app_factory: Creates the app, given the driver_class to pass on to App"""
+        self._app = app_factory(driver_class=functools.partial(SessionDriver, session=self))
+        self._websocket = websocket
+        self._driver: Optional[SessionDriver] = None
+        # What the browser sent before the app started
+        self._input: List[Any] = []
+        # Output for the websocket, in order; None once the app stopped
+        self._output: asyncio.Queue[Optional[bytes]] = asyncio.Queue()
+        self._run_task: Optional[asyncio.Task] = None
+        self._send_task: Optional[asyncio.Task] = None
+
+    def attach(self, driver: SessionDriver) -> None:
+        """Called by the driver once the app started."""
+        self._driver = driver
+        for replay in self._input:
+            replay()
+        self._input = []
+
+    def send(self, data: bytes) -> None:
+        self._output.put_nowait(data)
+
+    def close(self) -> None:
+        self._output.put_nowait(None)
+
+    async def start(self, width: int, height: int) -> None:
+        self._send_task = asyncio.create_task(self._send_output())
+        self._run_task = asyncio.create_task(self._run(width, height))
+
+    async def stop(self) -> None:
+        if self._run_task is None:
+            return
+
+        run_task, self._run_task = self._run_task, None
+        if not run_task.done():
+            self._app.post_message(messages.ExitApp())
+        await run_task
+        await self._send_task
+
+    async def send_bytes(self, data: bytes) -> bool:
+        self._to_driver(lambda: self._driver.feed(data))
+        return True
+
+    async def set_terminal_size(self, width: int, height: int) -> None:
+        self._to_driver(lambda: self._driver.resize(width, height))
+
+    async def blur(self) -> None:
+        self._app.post_message(events.AppBlur())
+
+    async def focus(self) -> None:
+        self._app.post_message(events.AppFocus())
+
+    # ----- Internal helpers -----
+
+    def _to_driver(self, call: Callable[[], None]) -> None:
+        if self._driver is None:
+            self._input.append(call)
+        else:
+            call()
+
+    async def _run(self, width: int, height: int) -> None:
+        try:
+            await self._app.run_async(size=(width, height))
+        finally:
+            # Apps redirect stdout and stderr while they run, and sessions do not end in the order they began
+            sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+            self.close()
+
+    async def _send_output(self) -> None:
+        try:
+            while (data := await self._output.get()) is not None:
+                # Everything written since the last send goes out as one message
+                chunks = [data]
+                while not self._output.empty() and (data := self._output.get_nowait()) is not None:
+                    chunks.append(data)
+
+                await self._websocket.send_bytes(b"".join(chunks))
+                if data is None:
+                    break
+        except ConnectionResetError:
+            # The browser went away; the server stops the app
+            pass
+
+        await self._websocket.close()
+
+
+class SessionServer(Server):
+    """textual-serve's Server, running the app for each browser session as a Session in this process."""
+
+    def __init__(self, app_factory: Callable[..., App], store: TaskStore, title: str, **kwargs):
+        """
+        :param app_factory: Creates a session's app on the store, given the driver_class to pass on to App
+        :param store: Store of the sessions, closed when the server stops
+        """
+        super().__init__(title, title=title, **kwargs)
+        self._app_factory = app_factory
+        self._store = store
+        # Sessions redirect stdout while they run
+        self.console = Console(file=sys.__stdout__)
+
+    async def _make_app(self) -> web.Application:
+        app = await super()._make_app()
+        app.on_cleanup.append(self._close_store)
+        return app
+
+    async def handle_websocket(self, request: web.Request) -> web.WebSocketResponse:
+        websocket = web.WebSocketResponse(heartbeat=15)
+        width = to_int(request.query.get("width", "80"), 80)
+        height = to_int(request.query.get("height", "24"), 24)
+
+        session: Optional[Session] = None
+        try:
+            await websocket.prepare(request)
+            session = Session(self._app_factory, websocket)
+            await session.start(width, height)
+            await self._process_messages(websocket, session)
+        except asyncio.CancelledError:
+            await websocket.close()
+        except Exception as error:
+            log.exception(error)
+        finally:
+            if session is not None:
+                await session.stop()
+
+        return websocket
+
+    async def _close_store(self, app: web.Application) -> None:
+        # Every session has stopped by now; what they left pending is written
+        self._store.close()
+
+
+def serve(app_factory: Callable[..., App], store: TaskStore, host: str = "localhost", port: int = 8000,
+          title: str = "TBE Todo") -> None:
+    """
+    Serve sessions of an app until interrupted
+    :param app_factory: Creates a session's app on the store, given the driver_class to pass on to App
+    :param store: Store shared by the sessions, closed when the server stops
+    """
+    SessionServer(app_factory, store, title, host=host, port=port).serve()
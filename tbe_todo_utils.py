@@ -1,7 +1,9 @@
 import json
+import os
 import pathlib
+import uuid
 
-from typing import List
+from typing import Iterable, Iterator, List
 
 from models import MainTask, Task
 from models.enums import TaskImportance, TaskState
@@ -9,6 +11,9 @@ from models.enums import TaskImportance, TaskState
 
 TODO_FILE = "todo_list.json"
 
+# Characters read from the JSON file at a time while streaming
+STREAM_CHUNK_SIZE = 64 * 1024
+
 
 def format_task_title(task: Task):
     marker = "\\[ ]"
@@ -33,14 +38,72 @@ def format_task_title(task: Task):
     if isinstance(task, MainTask):
         suffix = f" ({task.importance.value[0].upper()})"
 
-        if task.subTasks is not None and len(task.subTasks) > 0:
-            task_count = len(task.subTasks)
-            completed_task_count = sum(1 for subtask in task.subTasks if subtask.state == TaskState.COMPLETED)
-            suffix += f" [{completed_task_count}/{task_count}]"
+        if task.subtask_count > 0:
+            suffix += f" [{task.completed_subtask_count}/{task.subtask_count}]"
 
     return f"{marker} {wrapper}{task.title}{wrapper_end}{suffix}"
 
 
+def iter_tasks(path: str | pathlib.Path | None = None) -> Iterator[MainTask]:
+    """
+    Parses tasks from a JSON file one at a time, so memory use does not grow with the file size
+    :param path: JSON file containing a list of tasks, TODO_FILE if omitted
+    :return: Generator of tasks
+    :raises json.JSONDecodeError: If the file is not a valid todo file
+    """
+    decoder = json.JSONDecoder()
+
+    with open(path or TODO_FILE, "r", encoding="utf-8") as f:
+        buffer = ""
+        position = 0
+        at_eof = False
+        expect_start = True
+
+        while True:
+            # Skip whitespace and separators between items
+            while True:
+                while position < len(buffer) and buffer[position] in " \t\r\n":
+                    position += 1
+                if position < len(buffer) or at_eof:
+                    break
+                buffer = f.read(STREAM_CHUNK_SIZE)
+                position = 0
+                at_eof = buffer == ""
+
+            if position >= len(buffer):
+                raise json.JSONDecodeError("Unexpected end of file", buffer, position)
+
+            if expect_start:
+                if buffer[position] != "[":
+                    raise json.JSONDecodeError("Expected a list of tasks", buffer, position)
+                position += 1
+                expect_start = False
+                continue
+
+            if buffer[position] == "]":
+                return
+
+            if buffer[position] == ",":
+                position += 1
+                continue
+
+            try:
+                data, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if at_eof:
+                    raise
+
+                # The item continues past the end of the buffer
+                more = f.read(STREAM_CHUNK_SIZE)
+                buffer = buffer[position:] + more
+                position = 0
+                at_eof = more == ""
+                continue
+
+            position = end
+            yield MainTask.from_dict(data)
+
+
 def load_tasks() -> List[MainTask]:
     """
     Loads tasks from JSON file
@@ -52,31 +115,42 @@ def load_tasks() -> List[MainTask]:
         return []
 
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-            if not isinstance(data, list):
-                print(f"Warning: {TODO_FILE} is not a valid todo file. Starting with an empty list.")
-                return []
-            return [MainTask.from_dict(t) for t in data]
-    except (json.JSONDecodeError, FileNotFoundError, TypeError) as err:
+        return list(iter_tasks(path))
+    except (json.JSONDecodeError, FileNotFoundError, TypeError, KeyError, ValueError) as err:
         print(f"Error: {err}. Starting with an empty list.")
         return []
 
 
-def save_tasks(tasks: List[MainTask]) -> None:
-    """Saves tasks to JSON file"""
-    path = pathlib.Path(TODO_FILE)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump([t.to_dict() for t in tasks], f, indent=2)
-
-
-def sort_subtasks(tasks: List[Task]) -> List[Task]:
-    return sorted(tasks)
+def save_tasks(tasks: Iterable[MainTask], path: str | pathlib.Path | None = None) -> None:
+    """Saves tasks to JSON file (TODO_FILE if omitted), one task at a time, replacing the file only once everything is written"""
+    path = pathlib.Path(path or TODO_FILE)
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
 
-
-def sort_tasks(tasks: List[MainTask]) -> List[MainTask]:
-    return sorted(tasks)
+    try:
+        with open(temp_path, "x", encoding="utf-8") as f:
+            separator = "[\n  "
+            for task in tasks:
+                f.write(separator)
+                # Same layout as json.dump(list_of_tasks, indent=2)
+                f.write(json.dumps(task.to_dict(), indent=2).replace("\n", "\n  "))
+                separator = ",\n  "
+            f.write("[]" if separator == "[\n  " else "\n]")
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+def sort_subtasks(tasks: Iterable[Task]) -> List[Task]:
+    # Each task computes its key once, rather than once per comparison
+    return sorted(tasks, key=Task.sort_key)
+
+
+def sort_tasks(tasks: Iterable[MainTask]) -> List[MainTask]:
+    return sorted(tasks, key=MainTask.sort_key)
 
 
 def uuid_to_id(uuid_to_convert: str) -> str: